@@ -1,25 +1,177 @@
-import re
-from typing import List
+import json, os, re
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
 
-SUSPICIOUS_DIRS = [
-    "/.git", "/.svn", "/.hg", "/backup", "/backups", "/.env", "/config", "/configs",
-    "/admin", "/phpmyadmin", "/wp-admin", "/server-status", "/.idea", "/.vscode"
-]
-BACKUP_PAT = re.compile(r"\.(zip|tar|tar\.gz|tgz|bak|old|rar)$", re.I)
+# Detection rules are data: backend/rules.json, or the file named by $DIRGRAPH_RULES.
+RULES_FILE = Path(__file__).resolve().parent / "rules.json"
+RULES_ENV = "DIRGRAPH_RULES"
+
+SMALL_SET = 24  # below this many literals, C-level substring checks beat any single-pass matcher
+
+def _trie_regex(literals: Iterable[str]) -> str:
+    """Alternation factored into a trie (shared prefixes), so the regex engine never backtracks
+    across siblings; optional groups are greedy, so each match is the longest literal there."""
+    trie: Dict = {}
+    for lit in literals:
+        node = trie
+        for ch in lit:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        end = "" in node
+        branches = [re.escape(ch) + build(sub) for ch, sub in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        alt = branches[0] if len(branches) == 1 and not end else "(?:" + "|".join(branches) + ")"
+        return f"(?:{alt})?" if end else alt
+
+    return build(trie)
+
+class LiteralSet:
+    """
+    Many case-insensitive literals matched in one pass over a text: a trie-shaped regex
+    finds the longest literal at each hit position and every literal that is a prefix of
+    it is credited too, which yields exactly the set of literals present. Small sets use
+    plain substring checks instead.
+    """
+
+    def __init__(self, literals: Iterable[str]):
+        self.literals = sorted({l.lower() for l in literals if l}, key=len, reverse=True)
+        self._implies: Dict[str, Tuple[str, ...]] = {
+            l: tuple(x for x in self.literals if l.startswith(x)) for l in self.literals
+        }
+        self._re = re.compile(_trie_regex(self.literals)) if len(self.literals) > SMALL_SET else None
+
+    def search(self, text: str) -> Set[str]:
+        """Literals occurring anywhere in (lowercased) text."""
+        if self._re is None:
+            return {l for l in self.literals if l in text}
+        hits: Set[str] = set()
+        pos, search = 0, self._re.search
+        while True:
+            m = search(text, pos)
+            if not m:
+                return hits
+            hits.update(self._implies[m.group(0)])
+            pos = m.start() + 1
+
+    def prefixes(self, text: str) -> Set[str]:
+        """Literals (lowercased) text starts with."""
+        if self._re is None:
+            return {l for l in self.literals if text.startswith(l)}
+        m = self._re.match(text)
+        return set(self._implies[m.group(0)]) if m else set()
+
+class Rule:
+    __slots__ = ("id", "issue", "statuses", "path_prefix", "path_contains", "body_any", "body_all", "path_regex")
+
+    def __init__(self, spec: Dict):
+        self.id = spec.get("id") or spec["issue"]
+        self.issue = spec["issue"]
+        self.statuses: Optional[FrozenSet[int]] = frozenset(spec["status"]) if spec.get("status") else None
+        self.path_prefix = frozenset(x.lower() for x in spec.get("path_prefix", ()))
+        self.path_contains = frozenset(x.lower() for x in spec.get("path_contains", ()))
+        self.body_any = frozenset(x.lower() for x in spec.get("body_any", ()))
+        self.body_all = frozenset(x.lower() for x in spec.get("body_all", ()))
+        self.path_regex = re.compile(spec["path_regex"], re.I) if spec.get("path_regex") else None
+
+    @property
+    def literals(self) -> FrozenSet[str]:
+        return self.path_prefix | self.path_contains | self.body_any | self.body_all
+
+    def needs_body(self) -> bool:
+        return bool(self.body_any or self.body_all)
+
+    def matches(self, status: int, prefixes: Set[str], contains: Set[str], body: Set[str], path: str) -> bool:
+        if self.statuses is not None and status not in self.statuses:
+            return False
+        if self.path_prefix and not (self.path_prefix & prefixes):
+            return False
+        if self.path_contains and not (self.path_contains & contains):
+            return False
+        if self.body_any and not (self.body_any & body):
+            return False
+        if self.body_all and not self.body_all <= body:
+            return False
+        if self.path_regex and not self.path_regex.search(path):
+            return False
+        return True
+
+class RuleSet:
+    """
+    Compiled detection rules. All path prefixes, path substrings and body signatures
+    are each folded into one LiteralSet, so a response costs three scans no matter how
+    many rules exist; only rules triggered by a hit (plus literal-free ones) are checked.
+    """
+
+    def __init__(self, rules: List[Rule]):
+        self.rules = rules
+        self._prefix = LiteralSet(l for r in rules for l in r.path_prefix)
+        self._contains = LiteralSet(l for r in rules for l in r.path_contains)
+        self._body = LiteralSet(l for r in rules for l in (r.body_any | r.body_all))
+        self._by_literal: Dict[str, List[int]] = {}
+        self._always: List[int] = []
+        for i, r in enumerate(rules):
+            if r.literals:
+                for l in r.literals:
+                    self._by_literal.setdefault(l, []).append(i)
+            else:
+                self._always.append(i)
+        self._body_statuses: Optional[Set[int]] = set()
+        for r in rules:
+            if r.needs_body():
+                if r.statuses is None:
+                    self._body_statuses = None
+                    break
+                self._body_statuses |= r.statuses
+
+    @classmethod
+    def from_file(cls, path: Path) -> "RuleSet":
+        data = json.loads(Path(path).read_text("utf-8"))
+        return cls([Rule(spec) for spec in data.get("rules", [])])
+
+    def needs_body(self, status: int) -> bool:
+        return self._body_statuses is None or status in self._body_statuses
+
+    def evaluate(self, path: str, status: int, body_snippet: str) -> List[str]:
+        low_path = path.lower()
+        prefixes = self._prefix.prefixes(low_path)
+        contains = self._contains.search(low_path)
+        body = self._body.search(body_snippet.lower()) if body_snippet and self.needs_body(status) else set()
+        candidates = set(self._always)
+        for l in prefixes | contains | body:
+            candidates.update(self._by_literal.get(l, ()))
+        issues: List[str] = []
+        for i in sorted(candidates):  # rule-file order
+            r = self.rules[i]
+            if r.issue not in issues and r.matches(status, prefixes, contains, body, path):
+                issues.append(r.issue)
+        return issues
+
+    def evaluate_batch(self, items: Iterable[Tuple[str, int, str]]) -> List[List[str]]:
+        """Evaluate many (path, status, body_snippet) findings with the same compiled set."""
+        evaluate = self.evaluate
+        return [evaluate(p, s, b or "") for p, s, b in items]
+
+_RULES: Optional[RuleSet] = None
+
+def load_rules(path: Optional[str] = None) -> RuleSet:
+    """(Re)load the active rule set from `path`, $DIRGRAPH_RULES or the bundled rules.json."""
+    global _RULES
+    _RULES = RuleSet.from_file(Path(path or os.environ.get(RULES_ENV) or RULES_FILE))
+    return _RULES
+
+def rules() -> RuleSet:
+    return _RULES or load_rules()
+
+def needs_body(status: int) -> bool:
+    """Whether any rule inspects the body for this status; others are judged on path/status."""
+    return rules().needs_body(status)
 
 def analyze_item(path: str, status: int, body_snippet: str) -> List[str]:
-    issues: List[str] = []
-    low = (body_snippet or "").lower()
-    if status == 200:
-        if "index of /" in low or ("parent directory" in low and "<title>index of" in low):
-            issues.append("Directory listing enabled")
-        if any(path.lower().startswith(d) for d in SUSPICIOUS_DIRS):
-            issues.append("Sensitive path potentially exposed")
-        if "phpinfo()" in low or "<h1>php info" in low:
-            issues.append("phpinfo exposed")
-    if status in (401, 403):
-        if any(x in path.lower() for x in ("/admin", "/wp-admin", "/phpmyadmin")):
-            issues.append("Restricted admin area (authorization required)")
-    if BACKUP_PAT.search(path):
-        issues.append("Backup/archive file exposed")
-    return issues
+    return rules().evaluate(path, status, body_snippet or "")
+
+def analyze_batch(items: Iterable[Tuple[str, int, str]]) -> List[List[str]]:
+    """analyze_item over many findings; the rule set is resolved once for all of them."""
+    return rules().evaluate_batch(items)
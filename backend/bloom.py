@@ -0,0 +1,80 @@
+import hashlib, math
+from typing import List, Tuple
+
+def _hash(item: str) -> Tuple[int, int]:
+    d = hashlib.blake2b(item.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    return int.from_bytes(d[:8], "little"), int.from_bytes(d[8:], "little") | 1
+
+class BloomFilter:
+    """
+    Fixed-capacity Bloom filter over str: `k` bit positions per item by double hashing
+    one 128-bit blake2b digest. No false negatives; false positives at about
+    `error_rate` while no more than `capacity` items have been added.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 1e-4):
+        self.capacity = max(1, int(capacity))
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.k = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, h: Tuple[int, int]):
+        h1, h2, m = h[0], h[1], self.size
+        return [(h1 + i * h2) % m for i in range(self.k)]
+
+    def __contains__(self, item: str) -> bool:
+        return self.has(_hash(item))
+
+    def has(self, h: Tuple[int, int]) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(h))
+
+    def add(self, item: str) -> bool:
+        """Add `item`; True if it was not (probably) present before."""
+        return self.put(_hash(item))
+
+    def put(self, h: Tuple[int, int]) -> bool:
+        bits, new = self.bits, False
+        for p in self._positions(h):
+            byte, mask = p >> 3, 1 << (p & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                new = True
+        self.count += new
+        return new
+
+class ScalableBloomFilter:
+    """
+    Bloom filter that grows: when the newest layer is full another one with `growth`
+    times the capacity and a tighter error rate is added, so the overall false
+    positive rate stays in the order of `error_rate` however many items arrive.
+    Size the first layer for the expected load: every extra layer costs a probe.
+    """
+
+    def __init__(self, capacity: int = 1 << 14, error_rate: float = 1e-4, growth: int = 2):
+        self.error_rate = error_rate
+        self.growth = growth
+        self.layers: List[BloomFilter] = [BloomFilter(capacity, error_rate / 2)]
+
+    def __contains__(self, item: str) -> bool:
+        h = _hash(item)
+        return any(layer.has(h) for layer in self.layers)
+
+    def add(self, item: str) -> bool:
+        """Add `item`; True if it was not (probably) present before."""
+        h = _hash(item)
+        if any(layer.has(h) for layer in self.layers):
+            return False
+        last = self.layers[-1]
+        if last.count >= last.capacity:
+            last = BloomFilter(last.capacity * self.growth, self.error_rate / 2 ** (len(self.layers) + 1))
+            self.layers.append(last)
+        return last.put(h)
+
+    def __len__(self) -> int:
+        return sum(layer.count for layer in self.layers)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(layer.bits) for layer in self.layers)
@@ -0,0 +1,161 @@
+import array, hashlib, json, logging, mmap, os, struct, sys, threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Tuple, Union
+
+log = logging.getLogger("dirgraph.corpus")
+
+# File layout: MAGIC | count (u32) | offsets (u32 * (count + 1)) | utf-8 blob
+# All little-endian; little-endian hosts map the offsets as they are, others swap a copy.
+MAGIC = b"DGC1"
+_HDR = struct.Struct("<4sI")
+
+_LOADED: Dict[str, "Corpus"] = {}
+_LOCK = threading.Lock()
+
+def _normalize(line: str) -> str:
+    s = line.strip()
+    if not s or s.startswith("#"):
+        return ""
+    return s if s.startswith("/") else "/" + s
+
+def _source_state(sources: List[Path]) -> Tuple[str, str]:
+    """(combination id, state id): the second changes whenever a source file changes."""
+    combo = hashlib.sha1("\n".join(str(p) for p in sources).encode()).hexdigest()[:16]
+    stats = []
+    for p in sources:
+        try:
+            st = p.stat()
+            stats.append((str(p), st.st_size, st.st_mtime_ns))
+        except OSError:
+            stats.append((str(p), -1, -1))
+    state = hashlib.sha1(json.dumps(stats).encode()).hexdigest()[:16]
+    return combo, state
+
+def _build(sources: List[Path], dest: Path) -> int:
+    """Normalize, dedupe (keeping first-seen order) and write the compiled corpus."""
+    seen = set()
+    blob = bytearray()
+    offsets = array.array("I", [0])
+    for p in sources:
+        try:
+            with p.open("r", encoding="utf-8", errors="ignore") as f:
+                for line in f:
+                    s = _normalize(line)
+                    if s and s not in seen:
+                        seen.add(s)
+                        blob += s.encode("utf-8")
+                        offsets.append(len(blob))
+        except OSError:
+            continue
+    tmp = dest.with_suffix(".tmp")
+    with tmp.open("wb") as f:
+        f.write(_HDR.pack(MAGIC, len(offsets) - 1))
+        if sys.byteorder == "big":
+            offsets.byteswap()
+        f.write(offsets.tobytes())
+        f.write(blob)
+    os.replace(tmp, dest)
+    return len(offsets) - 1
+
+class Corpus(Sequence):
+    """
+    Read-only, memory-mapped candidate list. Indexing decodes one entry on demand and
+    slicing returns a CorpusView, so handing `corpus[:cap]` to a job copies nothing.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        with path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = _HDR.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a compiled corpus")
+        off_end = _HDR.size + 4 * (self._count + 1)
+        raw = memoryview(self._mm)[_HDR.size:off_end]
+        if sys.byteorder == "little":
+            self._offsets = raw.cast("I")
+        else:
+            self._offsets = array.array("I", raw.tobytes())
+            self._offsets.byteswap()
+        self._blob = off_end
+
+    def __reduce__(self):
+        return (Corpus, (self.path,))  # another process maps the file itself
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _get(self, i: int) -> str:
+        a, b = self._offsets[i], self._offsets[i + 1]
+        return self._mm[self._blob + a:self._blob + b].decode("utf-8")
+
+    def __getitem__(self, i: Union[int, slice]):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._count)
+            if step != 1:
+                raise ValueError("corpus slices must be contiguous")
+            return CorpusView(self, start, max(start, stop))
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        return self._get(i)
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._get(i) for i in range(self._count))
+
+class CorpusView(Sequence):
+    """Contiguous window [start, stop) over a Corpus."""
+
+    def __init__(self, corpus: Corpus, start: int, stop: int):
+        self.corpus, self.start, self.stop = corpus, start, stop
+
+    def __reduce__(self):
+        return (CorpusView, (self.corpus, self.start, self.stop))
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __getitem__(self, i: Union[int, slice]):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                raise ValueError("corpus slices must be contiguous")
+            return CorpusView(self.corpus, self.start + start, self.start + max(start, stop))
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.corpus._get(self.start + i)
+
+    def __iter__(self) -> Iterator[str]:
+        get = self.corpus._get
+        return (get(i) for i in range(self.start, self.stop))
+
+def load_corpus(sources: List[Path], cache_dir: Path) -> Corpus:
+    """
+    Compiled corpus for this ordered combination of wordlists, built on first use and
+    rebuilt only when a source file's size or mtime changes. Loaded corpora are shared
+    by every job in the process.
+    """
+    combo, state = _source_state(sources)
+    key = f"{combo}-{state}"
+    with _LOCK:
+        corpus = _LOADED.get(key)
+        if corpus is not None:
+            return corpus
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        dest = cache_dir / f"{key}.dgc"
+        if not dest.exists():
+            n = _build(sources, dest)
+            log.info("Compiled corpus %s: %d unique candidates from %d lists", key, n, len(sources))
+            for old in cache_dir.glob(f"{combo}-*.dgc"):
+                if old != dest:
+                    try:
+                        old.unlink()
+                    except OSError:
+                        pass  # still mapped elsewhere (Windows); retried on the next rebuild
+            for k in [k for k in _LOADED if k.startswith(combo + "-")]:
+                del _LOADED[k]
+        corpus = _LOADED[key] = Corpus(dest)
+        return corpus
@@ -0,0 +1,87 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+Sink = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Download/extract ticks are as chatty as progress; only the latest one matters.
+COALESCE_STAGES = {"seclists_downloading", "seclists_extracting"}
+
+class EventBatcher:
+    """
+    Coalesce high-frequency scan events into time-windowed `batch` frames.
+
+    `progress` keeps only its latest value; `found` items and the graph deltas they carry
+    are accumulated. All of it is flushed every `interval` seconds as one
+    {"type":"batch","progress":..,"found":[..],"graph":{"nodes","edges","updates"}} frame.
+    Any other event flushes the pending batch first, so ordering is preserved; flushes
+    and such pass-through events hold one lock, so the ticker cannot send a frame between
+    them.
+    """
+
+    def __init__(self, sink: Sink, interval: float = 0.15, max_found: int = 500):
+        self.sink = sink
+        self.interval = interval
+        self.max_found = max_found
+        self._progress: Optional[float] = None
+        self._found: List[Dict] = []
+        self._graph: Dict[str, List[Dict]] = {"nodes": [], "edges": [], "updates": []}
+        self._stage: Optional[Dict] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._ticker())
+
+    async def _ticker(self):
+        # Never cancelled mid-flush (a swapped-out frame would be lost); aclose() signals instead.
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.interval)
+            except asyncio.TimeoutError:
+                await self.flush()
+
+    async def emit(self, ev: Dict[str, Any]):
+        t = ev.get("type")
+        if t == "progress":
+            self._progress = ev.get("value")
+        elif t == "found":
+            self._found.append(ev.get("item", {}))
+            for k, v in (ev.get("graph") or {}).items():
+                self._graph.setdefault(k, []).extend(v)
+            if len(self._found) >= self.max_found:
+                await self.flush()
+        elif t == "stage" and ev.get("stage") in COALESCE_STAGES:
+            if self._stage and self._stage.get("stage") != ev.get("stage"):
+                await self.flush()
+            self._stage = ev
+        else:
+            async with self._lock:
+                await self._flush()
+                await self.sink(ev)
+
+    async def flush(self):
+        async with self._lock:
+            await self._flush()
+
+    async def _flush(self):
+        stage, self._stage = self._stage, None
+        if stage:
+            await self.sink(stage)
+        if self._progress is None and not self._found:
+            return
+        frame = {"type": "batch", "progress": self._progress, "found": self._found}
+        if any(self._graph.values()):
+            frame["graph"] = self._graph
+            self._graph = {"nodes": [], "edges": [], "updates": []}
+        self._progress, self._found = None, []
+        await self.sink(frame)
+
+    async def aclose(self):
+        """Stop the ticker and deliver whatever is still pending."""
+        self._stop.set()
+        if self._task:
+            await self._task
+            self._task = None
+        await self.flush()
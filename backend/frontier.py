@@ -0,0 +1,226 @@
+import asyncio, heapq, itertools
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .bloom import ScalableBloomFilter
+
+Expand = Callable[[Iterable[str]], Iterator[str]]
+
+DIR_STATUSES = (200, 204, 401, 403)
+REDIRECT_STATUSES = (301, 302, 307, 308)
+MUTATION_SHARE = 0.25  # at most this fraction of requests go to variants while words remain
+
+def depth_of(path: str) -> int:
+    return len([s for s in path.split("/") if s])
+
+def as_directory(path: str, status: int, location: Optional[str]) -> Optional[str]:
+    """
+    The directory a finding reveals, as '/a/b/', or None.
+    2xx/401/403 count when the path ends in '/' or its last segment has no extension;
+    redirects count when they only append a slash (the classic 301-to-directory).
+    """
+    p = "/" + path.strip("/")
+    if p == "/":
+        return None
+    if status in REDIRECT_STATUSES:
+        loc = (location or "").split("?", 1)[0].split("#", 1)[0]
+        return p + "/" if loc.endswith(p + "/") else None
+    if status in DIR_STATUSES and (path.endswith("/") or "." not in p.rsplit("/", 1)[-1]):
+        return p + "/"
+    return None
+
+def _rank(status: int) -> int:
+    # Open directories first, then redirects-to-slash, then auth-protected ones.
+    return 0 if 200 <= status < 300 else 1 if status in REDIRECT_STATUSES else 2
+
+class Frontier:
+    """
+    Async work source shared by the whole worker pool.
+
+    The root candidate stream is served first. Directories reported through discover()
+    go onto a priority queue ordered by (depth, status rank, path length) and, once the
+    current stream runs dry, the best one is expanded with the first `budget(depth)`
+    words. (directory, word) pairs are deduplicated, and next() only returns None when
+    every stream is exhausted and no in-flight request can still discover more.
+
+    Variants of findings handed to mutate() (see mutations.py) are served ahead of
+    the word streams, but no more than MUTATION_SHARE of all requests until those
+    run dry; they are pulled lazily, up to `mutation_budget` in all. Requested paths
+    are remembered in a Bloom filter, so a variant or subdirectory word that was
+    already tried is skipped (and, rarely, one that was not); a root-stream path
+    already requested as a variant, or handed to skip(), is skipped exactly.
+
+    `checkpoint` is the number of root-stream paths (extension variants included)
+    that are known to be finished, counting from the start of the stream: a scan
+    restarted with skip=checkpoint repeats nothing that was lost and nothing twice
+    beyond the requests that were in flight. With stride=(k, n) only every n-th root
+    path is served (a shard's share); indices, and so checkpoints, stay global, and
+    the smallest checkpoint across all n shards is the scan's.
+    """
+
+    def __init__(
+        self,
+        root: Iterable[str],
+        words: Sequence[str],
+        expand: Expand,
+        recursive: bool = False,
+        max_depth: int = 3,
+        depth_budget: int = 5000,
+        root_total: int = 0,
+        stream_factor: int = 1,
+        skip: int = 0,
+        stride: Tuple[int, int] = (0, 1),
+        mutation_budget: int = 0,
+    ):
+        self.words = words
+        self.expand = expand
+        self.recursive = recursive
+        self.max_depth = max_depth
+        self.depth_budget = depth_budget
+        self.stream_factor = stream_factor  # requests per word (1 + extension variants)
+        self.total = root_total
+        self._root_total = root_total
+        self.inflight = 0
+        self.dirs: Set[str] = set()
+        self._seen = ScalableBloomFilter(max(1 << 14, 2 * root_total))
+        self.mutation_budget = mutation_budget
+        self.mutated = 0
+        self.served = 0  # paths handed out, variants included
+        self._mutations: Deque[Iterator[str]] = deque()
+        self._requested: Set[str] = set()  # variants issued and paths skip()ped, exact
+        self._heap: List[Tuple[Tuple[int, int, int], int, str]] = []
+        self._seq = itertools.count()
+        self._stride = stride                      # (k, n): serve only root-stream indices i % n == k
+        self._issued = skip                        # root-stream paths handed out so far
+        self._low: List[int] = []                  # root-stream indices not finished yet (lazy heap)
+        self._finished: Set[int] = set()
+        self._root_inflight: Dict[str, List[int]] = {}
+        self._current: Optional[Iterator[str]] = self._root(expand(root))
+        self._waiters: List[asyncio.Future] = []
+
+    def _root(self, it: Iterator[str]) -> Iterator[str]:
+        k, n = self._stride
+        for i, p in enumerate(itertools.islice(it, self._issued, None), self._issued):
+            if i % n != k:
+                self._issued = i + 1  # another shard's path
+                continue
+            if p in self._requested:
+                self._issued = i + 1  # already requested as a variant, or by the caller: finished
+                continue
+            self._seen.add(p)  # multi-segment words may come back from a subdirectory stream
+            self._root_inflight.setdefault(p, []).append(i)
+            heapq.heappush(self._low, i)
+            self._issued = i + 1
+            yield p
+        # Now the stream's real length is known: replace the estimate with it.
+        self.total += len(range(k, self._issued, n)) - self._root_total
+
+    @property
+    def checkpoint(self) -> int:
+        return self._low[0] if self._low else self._issued
+
+    def stats(self) -> Dict[str, int]:
+        """Queue depths: paths in flight, served so far, and work waiting behind the current stream."""
+        return {"inflight": self.inflight, "served": self.served, "total": self.total,
+                "directories_queued": len(self._heap), "mutations_queued": len(self._mutations),
+                "seen_bytes": self._seen.nbytes}
+
+    def budget(self, depth: int) -> int:
+        """Words tried under a directory `depth` segments deep: depth_budget, halved per level."""
+        return max(1, self.depth_budget >> max(0, depth - 1))
+
+    def _subtree(self, directory: str, depth: int) -> Iterator[str]:
+        words = itertools.islice(self.words, self.budget(depth))
+        for p in self.expand(directory + w.lstrip("/") for w in words):
+            if self._seen.add(p):
+                yield p
+
+    def mutate(self, paths: Iterable[str]):
+        """Queue variants of a finding; they are generated only when a worker needs one."""
+        if self.mutated < self.mutation_budget:
+            self._mutations.append(iter(paths))
+            self._notify()
+
+    def _next_mutation(self) -> Optional[str]:
+        while self._mutations and self.mutated < self.mutation_budget:
+            for p in self._mutations[0]:
+                if self._seen.add(p):
+                    self._requested.add(p)
+                    self.mutated += 1
+                    self.total += 1
+                    return p
+            self._mutations.popleft()
+        self._mutations.clear()
+        return None
+
+    def skip(self, paths: Iterable[str]):
+        """Paths the caller has requested already (e.g. re-checked findings); they are never served."""
+        for p in paths:
+            self._seen.add(p)
+            self._requested.add(p)
+
+    def discover(self, path: str, status: int, location: Optional[str] = None) -> Optional[str]:
+        """Queue the directory behind a finding for exploration; returns it if it was new."""
+        if not self.recursive:
+            return None
+        d = as_directory(path, status, location)
+        return self.explore(d, status) if d else None
+
+    def explore(self, d: str, status: int = 200) -> Optional[str]:
+        """Queue directory `d` ('/a/b/') for exploration, recursive mode or not; returns it if it was new."""
+        if d in self.dirs:
+            return None
+        depth = depth_of(d)
+        if depth > self.max_depth:
+            return None
+        self.dirs.add(d)
+        heapq.heappush(self._heap, ((depth, _rank(status), len(d)), next(self._seq), d))
+        self.total += min(self.budget(depth), len(self.words)) * self.stream_factor
+        self._notify()
+        return d
+
+    def _notify(self):
+        waiters, self._waiters = self._waiters, []
+        for w in waiters:
+            if not w.done():
+                w.set_result(None)
+
+    async def next(self) -> Optional[str]:
+        while True:
+            # Variants go first, but take at most MUTATION_SHARE of the requests while words remain.
+            p = None
+            if self._mutations and self.mutated < MUTATION_SHARE * (self.served + 1):
+                p = self._next_mutation()
+            if p is None and self._current is None and self._heap:
+                _, _, d = heapq.heappop(self._heap)
+                self._current = self._subtree(d, depth_of(d))
+            if p is None and self._current is not None:
+                p = next(self._current, None)
+                if p is None:
+                    self._current = None
+                    continue
+            if p is None and self._mutations:
+                p = self._next_mutation()
+            if p is not None:
+                self.inflight += 1
+                self.served += 1
+                return p
+            if self.inflight == 0:
+                self._notify()  # release the other idle workers too
+                return None
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.append(fut)
+            await fut
+
+    def task_done(self, path: Optional[str] = None, finished: bool = True):
+        """Release an in-flight slot; `finished=False` (cancelled) keeps the checkpoint before it."""
+        idx = self._root_inflight.get(path) if path is not None else None
+        if idx and finished:
+            self._finished.add(idx.pop())
+            if not idx:
+                del self._root_inflight[path]
+            while self._low and self._low[0] in self._finished:
+                self._finished.discard(heapq.heappop(self._low))
+        self.inflight -= 1
+        if self.inflight == 0 or self._heap or self._mutations:
+            self._notify()
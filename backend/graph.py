@@ -0,0 +1,272 @@
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+GraphDelta = Dict[str, List[Dict]]
+
+MORE = "#more"   # suffix of the overflow node standing in for a directory's extra children
+H_GAP, V_GAP = 60, 140  # tree layout spacing, in px
+
+def node_id_for(path: str) -> str:
+    return ("root" if path in ("", "/") else str(path).rstrip("/")) or "root"
+
+def _parent_path(path: str) -> Optional[str]:
+    parts = path.strip("/").split("/")
+    return "/" + "/".join(parts[:-1]) if len(parts) > 1 else None
+
+def _chain(path: str) -> List[str]:
+    """Node ids from the top-level directory down to `path` itself (root excluded)."""
+    out = []
+    p: Optional[str] = path
+    while p is not None and node_id_for(p) != "root":
+        out.append(node_id_for(p))
+        p = _parent_path(p)
+    return out[::-1]
+
+def tree_layout(view: Dict, root: str) -> Dict:
+    """
+    Tidy top-down positions for a view: leaves get consecutive columns in DFS order,
+    parents sit centred over their children. Linear in the number of nodes, so it
+    is cheap enough to precompute for every request instead of running a force
+    layout in the browser. Positions are relative to `root` at (0, 0).
+    """
+    kids: Dict[str, List[str]] = {}
+    for e in view["edges"]:
+        kids.setdefault(e["data"]["source"], []).append(e["data"]["target"])
+    pos: Dict[str, Tuple[float, float]] = {}
+    col = 0
+    stack: List[Tuple[str, int, bool]] = [(root, 0, False)]
+    while stack:
+        nid, depth, done = stack.pop()
+        ch = kids.get(nid)
+        if not ch:
+            pos[nid] = (col * H_GAP, depth * V_GAP); col += 1
+        elif done:
+            pos[nid] = ((pos[ch[0]][0] + pos[ch[-1]][0]) / 2, depth * V_GAP)
+        else:
+            stack.append((nid, depth, True))
+            stack.extend((c, depth + 1, False) for c in reversed(ch))
+    x0 = pos.get(root, (0, 0))[0]
+    for n in view["nodes"]:
+        x, y = pos.get(n["data"]["id"], (x0, 0))
+        n["position"] = {"x": x - x0, "y": y}
+    return view
+
+class GraphBuilder:
+    """
+    Incremental graph of a scan's findings. add() keeps the node/edge index and the
+    summary counters current and returns only what changed: new nodes (including
+    synthesized parent directories, each linked to its own parent), new edges, and
+    data updates for synthesized nodes that later turn out to be findings.
+
+    Large-graph mode: a directory holding more than `collapse_threshold` findings is
+    shown as one aggregate node (count + status histogram) and its visible subtree is
+    dropped from the client ("removes"); a directory's children past `fanout_limit`
+    are folded into one "+N more" overflow node. view() returns any such subtree on
+    demand. 0 disables either limit.
+    """
+
+    def __init__(self, base_url: str, collapse_threshold: int = 0, fanout_limit: int = 0):
+        self.base_url = str(base_url)
+        self.collapse_threshold = max(0, int(collapse_threshold))
+        self.fanout_limit = max(0, int(fanout_limit))
+        self.nodes: Dict[str, Dict] = {"root": {"id": "root", "label": self.base_url, "status": 200}}
+        self.edges: Dict[str, Dict] = {}
+        self.parent: Dict[str, str] = {}
+        self.children: Dict[str, List[str]] = {}
+        self._pos: Dict[str, int] = {}  # index of a node among its parent's children
+        self._sub: Dict[str, Tuple[List[int], Counter]] = {}   # findings below a directory
+        self._more: Dict[str, Tuple[List[int], Counter]] = {}  # findings folded into pid#more
+        self._more_sent = set()
+        self._root_sent = False
+        # "total_tested" counts findings, not requests (a job's summary has it under that
+        # name since the first release; requests tested are the summary's "requests").
+        self.counts = {"total_tested": 0, "ok_200": 0, "forbidden_403": 0, "auth_401": 0, "redirects_30x": 0}
+
+    def _count(self, status: int):
+        self.counts["total_tested"] += 1
+        if status == 200: self.counts["ok_200"] += 1
+        elif status == 403: self.counts["forbidden_403"] += 1
+        elif status == 401: self.counts["auth_401"] += 1
+        elif str(status).startswith("30"): self.counts["redirects_30x"] += 1
+
+    # -- tree index -----------------------------------------------------------------
+
+    def _insert(self, nid: str, label: str, pid: str, data: Optional[Dict] = None):
+        self.nodes[nid] = data if data is not None else {"id": nid, "label": label}
+        self.parent[nid] = pid
+        kids = self.children.setdefault(pid, [])
+        self._pos[nid] = len(kids)
+        kids.append(nid)
+        eid = f"{pid}->{nid}"
+        self.edges[eid] = {"id": eid, "source": pid, "target": nid}
+
+    def _overflowed(self, nid: str) -> bool:
+        return bool(self.fanout_limit) and self._pos.get(nid, 0) >= self.fanout_limit
+
+    def _collapsed(self, nid: str) -> bool:
+        sub = self._sub.get(nid)
+        return bool(self.collapse_threshold) and nid != "root" and sub is not None \
+            and sub[0][0] > self.collapse_threshold
+
+    def _ancestry(self, nid: str) -> List[str]:
+        out = []
+        while nid != "root":
+            out.append(nid); nid = self.parent[nid]
+        return out[::-1]
+
+    def _rep(self, nid: str) -> str:
+        """The element the client shows for `nid`: itself, a collapsed ancestor or an overflow node."""
+        for a in self._ancestry(nid):
+            if self._overflowed(a): return self.parent[a] + MORE
+            if a != nid and self._collapsed(a): return a
+        return nid
+
+    def _visible_below(self, nid: str) -> List[str]:
+        out, stack = [], [nid]
+        while stack:
+            cur = stack.pop()
+            for c in self.children.get(cur, ()):
+                if self._overflowed(c):
+                    if cur + MORE in self._more_sent: out.append(cur + MORE)
+                    break
+                out.append(c)
+                if not self._collapsed(c): stack.append(c)
+        return out
+
+    @staticmethod
+    def _bump(table: Dict, key: str, status: Optional[int]):
+        cnt, hist = table.setdefault(key, ([0], Counter()))
+        cnt[0] += 1
+        if status is not None: hist[status] += 1
+
+    @staticmethod
+    def _agg(cnt_hist: Tuple[List[int], Counter]) -> Dict:
+        cnt, hist = cnt_hist
+        return {"aggregate": True, "count": cnt[0], "hist": {str(k): v for k, v in sorted(hist.items())}}
+
+    def _data(self, nid: str) -> Dict:
+        if nid.endswith(MORE):
+            pid = nid[:-len(MORE)]
+            agg = self._agg(self._more.get(pid) or ([0], Counter()))
+            return {"id": nid, "label": f"+{agg['count']} more", "parent": pid,
+                    "offset": self.fanout_limit, **agg}
+        data = self.nodes[nid]
+        return {**data, **self._agg(self._sub[nid])} if self._collapsed(nid) else data
+
+    # -- streaming ------------------------------------------------------------------
+
+    def add(self, item: Dict) -> GraphDelta:
+        delta: GraphDelta = {"nodes": [], "edges": [], "updates": []}
+        if not self._root_sent:
+            delta["nodes"].append({"data": self.nodes["root"]})
+            self._root_sent = True
+        path = str(item["path"]); status = int(item["status"]); np = node_id_for(path)
+        self._count(status)
+        data = {"id": np, "label": path, "status": status, "url": str(item.get("url") or ""),
+                "issues": "; ".join(str(x) for x in (item.get("issues") or []))}
+        if np == "root":
+            return delta
+        chain = _chain(path)
+
+        # A visible directory about to cross the threshold: its shown subtree goes away.
+        collapse_at = None
+        if self.collapse_threshold:
+            for a in chain[:-1]:
+                sub = self._sub.get(a)
+                if sub and sub[0][0] == self.collapse_threshold and self._rep(a) == a:
+                    collapse_at = a
+                    delta["removes"] = self._visible_below(a)
+                    break
+
+        new_ids = []
+        pid = "root"
+        for i, nid in enumerate(chain):
+            if nid not in self.nodes:
+                is_leaf = i == len(chain) - 1
+                self._insert(nid, "/" + "/".join(path.strip("/").split("/")[:i + 1]), pid,
+                             data if is_leaf else None)
+                new_ids.append(nid)
+            pid = nid
+        existing = self.nodes[np]
+        promoted = "status" not in existing  # was synthesized as a parent; now we know it
+        if promoted:
+            existing.update(data)
+
+        for a in chain[:-1]:
+            self._bump(self._sub, a, status)
+        self._bump(self._sub, "root", status)
+        for a in chain:
+            if self._overflowed(a):
+                self._bump(self._more, self.parent[a], status)
+
+        touched, created = set(), set()
+        for nid in new_ids:
+            rep = self._rep(nid)
+            if rep == nid:
+                delta["nodes"].append({"data": self.nodes[nid]})
+                delta["edges"].append({"data": self.edges[f"{self.parent[nid]}->{nid}"]})
+                created.add(nid)
+            elif rep.endswith(MORE) and rep not in self._more_sent and self._rep(rep[:-len(MORE)]) == rep[:-len(MORE)]:
+                self._more_sent.add(rep)
+                owner = rep[:-len(MORE)]
+                delta["nodes"].append({"data": self._data(rep)})
+                delta["edges"].append({"data": {"id": f"{owner}->{rep}", "source": owner, "target": rep}})
+                created.add(rep)
+            else:
+                touched.add(rep)
+        rep = self._rep(np)
+        if promoted or rep != np:
+            touched.add(rep)
+        if collapse_at:
+            touched.add(collapse_at)
+        for t in touched - created:
+            delta["updates"].append({"data": self._data(t)})
+        return delta
+
+    # -- on-demand views --------------------------------------------------------------
+
+    def _view_level(self, pid: str, kids: List[str], view: GraphDelta, offset: int = 0):
+        lim = self.fanout_limit or len(kids) or 1
+        page, rest = kids[offset:offset + lim], kids[offset + lim:]
+        for c in page:
+            view["nodes"].append({"data": self._data(c)})
+            view["edges"].append({"data": self.edges[f"{pid}->{c}"]})
+            if not self._collapsed(c) and self.children.get(c):
+                self._view_level(c, self.children[c], view)
+        if rest:
+            more: Tuple[List[int], Counter] = ([0], Counter())
+            for c in rest:
+                st = self.nodes[c].get("status")
+                if st is not None:
+                    more[0][0] += 1; more[1][st] += 1
+                sub = self._sub.get(c)
+                if sub:
+                    more[0][0] += sub[0][0]; more[1].update(sub[1])
+            mid = pid + MORE
+            view["nodes"].append({"data": {"id": mid, "label": f"+{more[0][0]} more", "parent": pid,
+                                           "offset": offset + lim, **self._agg(more)}})
+            view["edges"].append({"data": {"id": f"{pid}->{mid}", "source": pid, "target": mid}})
+
+    def view(self, nid: str = "root", offset: int = 0, layout: Optional[str] = None) -> Optional[Dict]:
+        """
+        One subtree under the same collapse rules, with `nid` itself expanded: its
+        children (a page of `fanout_limit` starting at `offset`), recursively, with
+        big child directories as aggregates. For an overflow node, the next page of
+        its directory's children. None if the node is unknown.
+        """
+        if nid.endswith(MORE):
+            nid = nid[:-len(MORE)]
+        if nid not in self.nodes:
+            return None
+        view: GraphDelta = {"nodes": [], "edges": []}
+        if nid == "root" and offset == 0:
+            view["nodes"].append({"data": self.nodes["root"]})
+        self._view_level(nid, self.children.get(nid, []), view, offset)
+        out = {"root": nid, **view}
+        if layout == "tree":
+            tree_layout(out, nid)
+        return out
+
+    def summary(self) -> Dict:
+        return dict(self.counts)
+
@@ -0,0 +1,196 @@
+import itertools, json, logging, os, threading
+from bisect import bisect_right
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+from .wordlists import BUILTIN_CANDIDATES, DATA
+
+log = logging.getLogger("dirgraph.hitstats")
+
+STATS_PATH = DATA / "hitstats.json"
+VERSION = 1
+MAX_WORDS = 20000    # per stack; the least-hit words are pruned beyond this
+HEAD_SHARE = 20      # at most 1/HEAD_SHARE of a scan's candidates are moved to the front ...
+HEAD_MAX = 2000      # ... and never more than this many
+SEED_WEIGHT = 0.01   # a prior is worth less than a single observed hit
+
+# Cold-start priors: paths that are worth probing first on each stack before any
+# scan has been recorded. Every stack falls back to the generic ones after its own.
+SEEDS: Dict[str, List[str]] = {
+    "wp": ["/wp-admin/", "/wp-login.php", "/wp-content/", "/wp-includes/", "/wp-json/", "/xmlrpc.php",
+           "/wp-content/uploads/", "/wp-content/plugins/", "/readme.html", "/license.txt", "/wp-config.php.bak"],
+    "drupal": ["/user/login", "/CHANGELOG.txt", "/core/", "/sites/default/", "/sites/all/", "/modules/",
+               "/themes/", "/node/", "/update.php", "/install.php", "/admin/"],
+    "joomla": ["/administrator/", "/components/", "/modules/", "/templates/", "/plugins/", "/media/",
+               "/language/", "/configuration.php", "/README.txt", "/htaccess.txt"],
+    "iis": ["/aspnet_client/", "/web.config", "/trace.axd", "/elmah.axd", "/default.aspx", "/iisstart.htm",
+            "/bin/", "/App_Data/", "/_vti_bin/", "/Web.config.bak"],
+    "api": ["/api/", "/v1/", "/v2/", "/swagger.json", "/openapi.json", "/swagger/", "/swagger-ui.html",
+            "/graphql", "/docs", "/health", "/status", "/metrics"],
+    "generic": list(BUILTIN_CANDIDATES),
+}
+
+def word_of(path: str) -> Optional[str]:
+    """The wordlist entry a finding was discovered by: its last segment, as '/word' or '/word/'."""
+    seg = path.rstrip("/").rsplit("/", 1)[-1]
+    if not seg:
+        return None
+    return "/" + seg + ("/" if path.endswith("/") else "")
+
+def ext_of(word: str) -> Optional[str]:
+    name = word.rstrip("/").rsplit("/", 1)[-1]
+    if "." not in name.lstrip("."):
+        return None
+    return "." + name.rsplit(".", 1)[-1].lower()
+
+class RankedCandidates(Sequence):
+    """
+    Candidate list with `head` moved to the front: the head first, then `tail` without
+    the head's words, `cap` entries in all. Iterating it is lazy, so a corpus tail is
+    never materialized; it pickles as head + tail (a CorpusView pickles as a window).
+    Only where the head's words sit in the tail is recorded, so indexing is a bisect.
+    The tail's entries are assumed unique (a corpus view is deduped).
+    """
+
+    def __init__(self, head: Sequence[str], tail: Sequence[str], cap: int):
+        self.head = list(head[:max(0, cap)])
+        self.tail = tail
+        self._skip = frozenset(self.head)
+        need = max(0, cap) - len(self.head)
+        # Tail positions holding head words, found in one pass that ends once all are.
+        skips: List[int] = []
+        if need and self._skip:
+            for t, w in enumerate(tail):
+                if t - len(skips) >= need:
+                    break
+                if w in self._skip:
+                    skips.append(t)
+                    if len(skips) == len(self._skip):
+                        break
+        self._stop = min(len(tail), need + len(skips))  # where the tail stops contributing
+        self._len = len(self.head) + self._stop - len(skips)
+        # skips[m] - m never decreases: bisecting it maps a ranked offset onto the tail.
+        self._shift = [t - m for m, t in enumerate(skips)]
+
+    def __len__(self) -> int:
+        return self._len
+
+    def _tail_index(self, j: int) -> int:
+        """Tail position of the j-th tail entry that is not a head word."""
+        return j + bisect_right(self._shift, j)
+
+    def _from(self, i: int) -> Iterator[str]:
+        yield from itertools.islice(self.head, i, None)
+        t = self._tail_index(max(0, i - len(self.head)))
+        skip = self._skip
+        for w in itertools.islice(self.tail, t, self._stop):
+            if w not in skip:
+                yield w
+
+    def __iter__(self) -> Iterator[str]:
+        return self._from(0)
+
+    def __getitem__(self, i: Union[int, slice]):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._len)
+            if step == 1:
+                return list(itertools.islice(self._from(start), max(0, stop - start)))
+            return [self[j] for j in range(start, stop, step)]
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError(i)
+        if i < len(self.head):
+            return self.head[i]
+        return self.tail[self._tail_index(i - len(self.head))]
+
+class HitStats:
+    """
+    Local record of which words and extensions produced findings, per detected stack
+    (see wordlists.detect_stack), kept in a small JSON file next to the wordlists.
+    rank() turns it into a probe order: words that hit before on this stack first,
+    then words that hit on any stack, then the seed priors, then the wordlists.
+
+    Methods touch the file and are meant to run off the event loop (asyncio.to_thread).
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or STATS_PATH)
+        self._lock = threading.Lock()
+        self._data: Optional[Dict] = None
+
+    def _load(self) -> Dict:
+        if self._data is None:
+            data = None
+            try:
+                data = json.loads(self.path.read_text())
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                log.warning("Ignoring unreadable hit statistics %s: %s", self.path, e)
+            if not isinstance(data, dict) or data.get("version") != VERSION:
+                data = {"version": VERSION, "stacks": {}}
+            self._data = data
+        return self._data
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._data, separators=(",", ":")))
+        os.replace(tmp, self.path)
+
+    def record(self, stack: str, paths: Iterable[str], new_run: bool = True):
+        """Count the words and extensions behind one scan's findings."""
+        words = Counter(w for w in map(word_of, paths) if w)
+        with self._lock:
+            st = self._load()["stacks"].setdefault(stack, {"runs": 0, "paths": {}, "exts": {}})
+            st["runs"] += 1 if new_run else 0
+            for w, n in words.items():
+                st["paths"][w] = st["paths"].get(w, 0) + n
+                ext = ext_of(w)
+                if ext:
+                    st["exts"][ext] = st["exts"].get(ext, 0) + n
+            if len(st["paths"]) > MAX_WORDS:
+                st["paths"] = dict(Counter(st["paths"]).most_common(MAX_WORDS))
+            self._save()
+
+    def ranked_words(self, stack: str, limit: int) -> List[str]:
+        """Up to `limit` words, most likely to hit on `stack` first."""
+        with self._lock:
+            stacks = self._load()["stacks"]
+            score: Counter = Counter()
+            for name, st in stacks.items():
+                weight = 2.0 if name == stack else 1.0
+                runs = max(1, st["runs"])
+                for w, n in st["paths"].items():
+                    score[w] += weight * n / runs
+        seeds = SEEDS.get(stack, []) + (SEEDS["generic"] if stack != "generic" else [])
+        for i, w in enumerate(seeds):
+            score[w] += SEED_WEIGHT * (1 - i / len(seeds))
+        return [w for w, _ in score.most_common(limit)]
+
+    def ext_order(self, stack: str, exts: Sequence[str]) -> List[str]:
+        """`exts` reordered by how often they hit on `stack` (stable for ties)."""
+        with self._lock:
+            counts = self._load()["stacks"].get(stack, {}).get("exts", {})
+        return sorted(exts, key=lambda e: -counts.get(e.lower(), 0))
+
+    def head_limit(self, cap: int) -> int:
+        return min(HEAD_MAX, max(1, cap // HEAD_SHARE))
+
+    def rank(self, stack: str, candidates: Sequence[str], cap: int,
+             head: Optional[Sequence[str]] = None) -> RankedCandidates:
+        """`candidates` with the likely hits moved up front; pass a saved `head` to repeat an order."""
+        if head is None:
+            head = self.ranked_words(stack, self.head_limit(cap))
+        return RankedCandidates(head, candidates, cap)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stacks = self._load()["stacks"]
+            return {name: {"runs": st["runs"], "words": len(st["paths"]),
+                           "top": Counter(st["paths"]).most_common(10), "exts": st["exts"]}
+                    for name, st in stacks.items()}
+
+HITSTATS = HitStats()
@@ -0,0 +1,238 @@
+import asyncio, logging, time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+log = logging.getLogger("dirgraph.limiter")
+
+MAX_RETRY_AFTER = 60.0  # never let a target park the whole scan for longer than this
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds (delta-seconds or HTTP-date), capped at MAX_RETRY_AFTER."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return min(float(value), MAX_RETRY_AFTER)
+    try:
+        delay = parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, min(delay, MAX_RETRY_AFTER))
+
+def _percentile(sorted_vals: List[float], q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * len(sorted_vals)))]
+
+class FairGate:
+    """
+    In-flight cap shared by many jobs: at most `limit` requests overall and `per_key`
+    per key (an origin). When slots are short, waiting keys are served round-robin,
+    one grant per key per turn, so a big target cannot starve the small ones.
+    """
+
+    def __init__(self, limit: int, per_key: int):
+        self.limit = max(1, int(limit))
+        self.per_key = max(1, int(per_key))
+        self.inflight = 0
+        self._by_key: Dict[str, int] = {}
+        self._queues: Dict[str, Deque[asyncio.Future]] = {}
+        self._ring: Deque[str] = deque()  # keys with waiters, in service order
+
+    def _grantable(self, key: str) -> bool:
+        return self.inflight < self.limit and self._by_key.get(key, 0) < self.per_key
+
+    def _take(self, key: str):
+        self.inflight += 1
+        self._by_key[key] = self._by_key.get(key, 0) + 1
+
+    async def acquire(self, key: str):
+        if self._grantable(key) and not self._queues.get(key):
+            self._take(key)
+            return
+        fut = asyncio.get_running_loop().create_future()
+        q = self._queues.setdefault(key, deque())
+        q.append(fut)
+        if key not in self._ring:
+            self._ring.append(key)
+        try:
+            await fut  # _dispatch() took the slot for us
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release(key)
+            elif fut in q:
+                q.remove(fut)
+            raise
+
+    def release(self, key: str):
+        self.inflight = max(0, self.inflight - 1)
+        left = self._by_key.get(key, 1) - 1
+        if left > 0:
+            self._by_key[key] = left
+        else:
+            self._by_key.pop(key, None)
+        self._dispatch()
+
+    def _dispatch(self):
+        granted = True
+        while granted and self._ring and self.inflight < self.limit:
+            granted = False
+            for _ in range(len(self._ring)):
+                key = self._ring.popleft()
+                q = self._queues.get(key)
+                while q and q[0].done():
+                    q.popleft()  # cancelled while waiting
+                if not q:
+                    self._queues.pop(key, None)
+                    continue
+                if self._grantable(key):
+                    self._take(key)
+                    q.popleft().set_result(None)
+                    granted = True
+                self._ring.append(key)  # back of the line, granted or still capped
+                if self.inflight >= self.limit:
+                    break
+
+    def stats(self) -> Dict:
+        return {"limit": self.limit, "per_key": self.per_key, "inflight": self.inflight,
+                "waiting": sum(len(q) for q in self._queues.values()), "keys": dict(self._by_key)}
+
+class ConcurrencyLimiter:
+    """
+    Gate for in-flight requests against one target.
+
+    With adaptive=False it behaves like a semaphore of `max_limit`. With adaptive=True
+    the limit follows AIMD: it starts at `min_limit`, grows (slow start, then +1 per
+    window) while latency and errors stay healthy, and is cut by `decrease` on 429/503,
+    timeouts, error spikes or p50 latency drifting above twice the best seen. A
+    Retry-After pauses every acquirer until it expires; with `shared_pause` (any
+    object with a float `.value`, e.g. multiprocessing.Value("d")) the pause is also
+    published to, and honoured from, limiters in other processes. With a `gate`
+    (FairGate) each slot also needs a grant for `gate_key` from that shared gate.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        adaptive: bool = False,
+        decrease: float = 0.7,
+        max_error_rate: float = 0.05,
+        shared_pause=None,
+        gate: Optional[FairGate] = None,
+        gate_key: str = "",
+    ):
+        self.max_limit = max(1, int(max_limit))
+        self.min_limit = max(1, min(int(min_limit), self.max_limit))
+        self.adaptive = adaptive
+        self.decrease = decrease
+        self.max_error_rate = max_error_rate
+        self.limit = float(self.min_limit if adaptive else self.max_limit)
+        self.inflight = 0
+        self._slow_start = True
+        self._pause_until = 0.0
+        self.shared_pause = shared_pause  # time.monotonic() deadline, same clock as loop.time()
+        self.gate = gate
+        self.gate_key = gate_key
+        self._best_p50: Optional[float] = None
+        self._waiters: Deque[asyncio.Future] = deque()
+        # rolling window of (latency, outcome) for the current adjustment round
+        self._window: List[Tuple[float, str]] = []
+        self._recent: Deque[float] = deque(maxlen=1000)
+        self.counts: Dict[str, int] = {"ok": 0, "throttled": 0, "timeout": 0, "error": 0}
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            until = self._pause_until
+            if self.shared_pause is not None:
+                until = max(until, self.shared_pause.value)
+            delay = until - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            if self.inflight < int(self.limit):
+                self.inflight += 1
+                if self.gate is not None:
+                    try:
+                        await self.gate.acquire(self.gate_key)
+                    except BaseException:
+                        self.inflight -= 1
+                        self._wake()
+                        raise
+                return
+            fut = loop.create_future()
+            self._waiters.append(fut)
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    self._wake()  # pass the wake-up on to someone else
+                raise
+            finally:
+                if fut in self._waiters:
+                    self._waiters.remove(fut)
+
+    def _wake(self):
+        free = int(self.limit) - self.inflight
+        while free > 0 and self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                free -= 1
+
+    def release(self, latency: float, outcome: str = "ok", retry_after: Optional[float] = None):
+        """Return a slot and feed the controller. outcome: ok | throttled | timeout | error."""
+        self.inflight = max(0, self.inflight - 1)
+        if self.gate is not None:
+            self.gate.release(self.gate_key)
+        self.counts[outcome] = self.counts.get(outcome, 0) + 1
+        if outcome == "ok":
+            self._recent.append(latency)
+        if retry_after:
+            loop = asyncio.get_running_loop()
+            self._pause_until = max(self._pause_until, loop.time() + retry_after)
+            if self.shared_pause is not None and self._pause_until > self.shared_pause.value:
+                self.shared_pause.value = self._pause_until
+        if self.adaptive:
+            self._window.append((latency, outcome))
+            if outcome == "throttled":
+                self._backoff("throttled")
+            elif len(self._window) >= max(16, int(self.limit)):
+                self._adjust()
+        self._wake()
+
+    def _backoff(self, reason: str):
+        old = self.limit
+        self.limit = max(float(self.min_limit), self.limit * self.decrease)
+        self._slow_start = False
+        self._window.clear()
+        if int(old) != int(self.limit):
+            log.info("Concurrency %d -> %d (%s)", old, self.limit, reason)
+
+    def _adjust(self):
+        window, self._window = self._window, []
+        lat = sorted(l for l, o in window if o == "ok")
+        failures = sum(1 for _, o in window if o in ("timeout", "error"))
+        if failures / len(window) > self.max_error_rate:
+            return self._backoff("errors")
+        if lat:
+            p50 = _percentile(lat, 0.5)
+            if self._best_p50 is None or p50 < self._best_p50:
+                self._best_p50 = p50
+            if p50 > 2 * self._best_p50 + 0.005:
+                return self._backoff("latency")
+        grow = self.limit * 0.5 if self._slow_start else 1.0
+        self.limit = min(float(self.max_limit), self.limit + max(1.0, grow))
+
+    def stats(self) -> Dict:
+        lat = sorted(self._recent)
+        return {
+            "limit": int(self.limit),
+            "inflight": self.inflight,
+            "waiting": len(self._waiters),
+            "p50_ms": round(_percentile(lat, 0.5) * 1000, 1),
+            "p99_ms": round(_percentile(lat, 0.99) * 1000, 1),
+            **self.counts,
+        }
@@ -1,15 +1,26 @@
-import asyncio, uuid, traceback, logging
+import asyncio, json, threading, uuid, traceback, logging
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, List
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
-from fastapi.responses import FileResponse
+from typing import Dict, List, Optional
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query, UploadFile, File, Form
+from fastapi.responses import FileResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 
-from .models import EnumerateRequest
+from .models import BatchRequest, EnumerateRequest, Hit
 from .wordlists import (
-    ensure_seclists, index_wordlists, choose_wordlists, iter_candidates, builtin_candidates
+    INDEX, ensure_seclists, load_index, index_wordlists, choose_wordlists, iter_candidates, builtin_candidates,
+    detect_stack,
 )
-from .scanner import DirEnumerator, initial_probe, soft_404_baseline
+from .hitstats import HITSTATS
+from .rescan import neighbours, rotating_slice
+from .scanner import DirEnumerator, initial_probe
+from .shards import ShardedEnumerator
+from .events import EventBatcher
+from .graph import GraphBuilder
+from .pool import POOLS, origin_of
+from .limiter import FairGate
+from .store import JobStore, JobLog, RESUMABLE_STATES, subscribe
+from .metrics import METRICS, PROFILE_INTERVAL, PROFILE_MAX_SECONDS, SamplingProfiler, ScanMetrics
 
 # Basic logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
@@ -26,61 +37,269 @@ app.mount("/static", StaticFiles(directory=str(FRONTEND), html=False), name="sta
 async def index():
     return FileResponse(FRONTEND / "index.html")
 
-JOBS: Dict[str, Dict] = {}
-
-def _to_graph(base_url: str, items: List[dict]):
-    nodes = [{"data":{"id":"root","label":str(base_url), "status":200}}]
-    edges = []
-    seen = {"root"}
-    def node_id_for(path: str) -> str:
-        return ("root" if path in ("", "/") else str(path).rstrip("/")) or "root"
-    for it in items:
-        path = str(it["path"]); np = node_id_for(path)
-        if np not in seen:
-            issues_str = "; ".join(str(x) for x in (it.get("issues") or []))
-            nodes.append({"data":{"id": np, "label": path, "status": int(it["status"]), "url": str(it["url"]), "issues": issues_str}})
-            seen.add(np)
-        parent = "root"
-        if path and path != "/":
-            if "/" in path.strip("/"):
-                parent_path = "/" + "/".join(path.strip("/").split("/")[:-1])
-                parent = node_id_for(parent_path)
-                if parent not in seen:
-                    nodes.append({"data":{"id": parent, "label": parent_path}})
-                    seen.add(parent)
-        edges.append({"data":{"id": f"{parent}->{np}", "source": parent, "target": np}})
-    summary = {
-        "total_tested": len(items),
-        "ok_200": sum(1 for i in items if int(i["status"])==200),
-        "forbidden_403": sum(1 for i in items if int(i["status"])==403),
-        "auth_401": sum(1 for i in items if int(i["status"])==401),
-        "redirects_30x": sum(1 for i in items if str(i["status"]).startswith("30")),
-    }
-    return {"nodes":nodes, "edges":edges, "summary":summary, "findings":items}
+@app.on_event("startup")
+async def _load_wordlist_index():
+    await asyncio.to_thread(load_index)
+
+@app.get("/api/wordlists")
+async def wordlist_stats():
+    return {"lists": INDEX.stats()}
+
+@app.get("/api/hitstats")
+async def hit_stats():
+    return {"stacks": await asyncio.to_thread(HITSTATS.stats)}
+
+@app.on_event("startup")
+async def _mark_interrupted_jobs():
+    ids = await STORE.interrupt_running()
+    if ids: log.info("Interrupted jobs from a previous run (resumable): %s", ", ".join(ids))
+
+@app.on_event("shutdown")
+async def _close_pools():
+    # Stop running scans as 'interrupted' so they can be resumed after the restart.
+    for job in list(JOBS.values()):
+        job["stopping"] = "interrupted"
+        job["task"].cancel()
+    await asyncio.gather(*(j["task"] for j in list(JOBS.values())), return_exceptions=True)
+    await POOLS.close()
+    await STORE.close()
+
+@app.get("/api/pool")
+async def pool_stats():
+    return {"pools": POOLS.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition: request counters and latencies, stage timings, live gauges."""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+def _scans() -> List[Dict]:
+    return [j for j in JOBS.values() if j.get("metrics")]
+
+def _limiter_total(key: str):
+    return lambda: [((), sum(j["enumerator"].limiter_stats()[key] for j in _scans() if j.get("enumerator")))]
+
+def _log_total(key: str) -> int:
+    return sum(j["log"].stats()[key] for j in JOBS.values())
+
+METRICS.gauge("dirgraph_jobs_running", "Scan jobs running in this process.", lambda: [((), len(_scans()))])
+METRICS.gauge("dirgraph_requests_in_flight", "Requests holding a concurrency slot.", _limiter_total("inflight"))
+METRICS.gauge("dirgraph_limiter_waiting", "Requests queued for a concurrency slot.", _limiter_total("waiting"))
+METRICS.gauge("dirgraph_limiter_limit", "Concurrency limits of running jobs, added up.", _limiter_total("limit"))
+METRICS.gauge("dirgraph_batch_gate_waiting", "Requests queued for a batch's shared slots.",
+              lambda: [((), sum(j["gate"].stats()["waiting"] for j in JOBS.values() if j.get("gate")))])
+METRICS.gauge("dirgraph_frontier_queued_directories", "Found directories waiting to be explored.",
+              lambda: [((), sum(j["enumerator"].frontier.stats()["directories_queued"] for j in _scans()
+                                if j.get("enumerator") and j["enumerator"].frontier))])
+METRICS.gauge("dirgraph_event_backlog", "Job log frames not yet stored, and queued for live observers.",
+              lambda: [((("queue", "store"),), _log_total("unwritten_frames")),
+                       ((("queue", "observers"),), _log_total("subscriber_backlog"))])
+METRICS.gauge("dirgraph_pool_in_flight", "Requests in flight per connection pool.",
+              lambda: [((("origin", p["origin"]),), p["in_flight"]) for p in POOLS.stats()])
+METRICS.gauge("dirgraph_pool_connections", "Connections opened per connection pool since it was created.",
+              lambda: [((("origin", p["origin"]),), p["connections_created"]) for p in POOLS.stats()])
+
+STORE = JobStore()
+JOBS: Dict[str, Dict] = {}  # running jobs: {"log", "graph", "task"}
+FINISHED_GRAPHS: "OrderedDict[str, GraphBuilder]" = OrderedDict()  # kept for subtree expansion
+FINISHED_GRAPHS_MAX = 8
+FINISHED_STATS: "OrderedDict[str, Dict]" = OrderedDict()  # final stats of recent jobs, incl. canceled ones
+FINISHED_STATS_MAX = 64
+
+def _hits(rows) -> List[Hit]:
+    return [Hit(path, status, size, redirected_to, json.loads(issues or "[]"), etag, modified)
+            for path, status, size, redirected_to, issues, etag, modified in rows]
+
+def _is_batch(rec: Dict) -> bool:
+    return "targets" in json.loads(rec["request"])
+
+async def _job_graph(job_id: str) -> GraphBuilder:
+    job = JOBS.get(job_id)
+    if job and job.get("graph"): return job["graph"]
+    graph = FINISHED_GRAPHS.get(job_id)
+    if graph is None:
+        rec = await STORE.get(job_id)
+        if rec is None: raise HTTPException(status_code=404, detail="unknown job")
+        if _is_batch(rec): raise HTTPException(status_code=404, detail="batch jobs have one graph per target job")
+        req = EnumerateRequest.model_validate_json(rec["request"])
+        graph = GraphBuilder(str(req.url), req.collapse_threshold, req.fanout_limit)
+        for h in _hits(await STORE.findings(job_id)): graph.add(h.to_item(str(req.url)).model_dump())
+    FINISHED_GRAPHS[job_id] = graph
+    FINISHED_GRAPHS.move_to_end(job_id)
+    while len(FINISHED_GRAPHS) > FINISHED_GRAPHS_MAX: FINISHED_GRAPHS.popitem(last=False)
+    return graph
+
+@app.get("/api/jobs/{job_id}/graph")
+async def job_graph(job_id: str, layout: Optional[str] = Query(None, pattern="^tree$")):
+    """The whole graph as currently collapsed; layout=tree adds precomputed positions."""
+    return (await _job_graph(job_id)).view("root", layout=layout)
+
+@app.get("/api/jobs/{job_id}/subtree")
+async def job_subtree(job_id: str, node: str, offset: int = Query(0, ge=0),
+                      layout: Optional[str] = Query(None, pattern="^tree$")):
+    """Expand one aggregate or "+N more" node; positions are relative to the node."""
+    view = (await _job_graph(job_id)).view(node, offset=offset, layout=layout)
+    if view is None: raise HTTPException(status_code=404, detail="unknown node")
+    return view
+
+def _job_info(rec: Dict) -> Dict:
+    info = {k: rec[k] for k in ("id", "state", "created", "updated", "cursor", "tested") if k in rec}
+    info["request"] = json.loads(rec["request"])
+    if rec.get("summary"): info["summary"] = json.loads(rec["summary"])
+    if "findings" in rec: info["findings"] = rec["findings"]
+    return info
+
+@app.get("/api/jobs")
+async def list_jobs(limit: int = Query(50, ge=1, le=500)):
+    return {"jobs": [_job_info(r) for r in await STORE.jobs(limit)]}
+
+@app.get("/api/jobs/{job_id}")
+async def job_info(job_id: str):
+    rec = await STORE.get(job_id)
+    if rec is None: raise HTTPException(status_code=404, detail="unknown job")
+    return _job_info(rec)
+
+def _live_stats(job: Dict) -> Dict:
+    stats = {"state": "running", **job["metrics"].snapshot(), "events": job["log"].stats()}
+    enumerator = job.get("enumerator")
+    if enumerator is not None:
+        stats["limiter"] = enumerator.limiter_stats()
+        if enumerator.frontier: stats["frontier"] = enumerator.frontier.stats()
+    if job.get("detector"): stats["soft404"] = job["detector"].summary()
+    if job.get("profiler"): stats["profile"] = job["profiler"].report()
+    return stats
+
+@app.get("/api/jobs/{job_id}/stats")
+async def job_stats(job_id: str):
+    """Requests, latency percentiles, bytes read, stage timings and soft-404 baselines of a job; queue depths while it runs."""
+    job = JOBS.get(job_id)
+    if job and job.get("metrics"): return _live_stats(job)
+    if job_id in FINISHED_STATS: return FINISHED_STATS[job_id]
+    rec = await STORE.get(job_id)
+    if rec is None: raise HTTPException(status_code=404, detail="unknown job")
+    if _is_batch(rec): raise HTTPException(status_code=404, detail="batch jobs have stats per target job")
+    summary = json.loads(rec["summary"]) if rec.get("summary") else {}
+    if "stats" not in summary: raise HTTPException(status_code=404, detail="no stats recorded for this job")
+    return {"state": rec["state"], **summary["stats"]}
+
+@app.post("/api/jobs/{job_id}/profile")
+async def job_profile(job_id: str, enable: bool = True,
+                      interval: float = Query(PROFILE_INTERVAL, ge=0.001, le=1.0),
+                      seconds: float = Query(PROFILE_MAX_SECONDS, gt=0, le=3600)):
+    """
+    Start (enable=false: stop) a sampling profiler while a scan runs. It samples the
+    server's event loop, so other jobs in this process show up too and shard
+    processes do not; the report comes back here, in the job's stats and at GET.
+    """
+    job = JOBS.get(job_id)
+    if not job or not job.get("metrics"): raise HTTPException(status_code=404, detail="no running scan job")
+    profiler = job.get("profiler")
+    if enable:
+        if any(j.get("profiler") and j["profiler"].running for j in JOBS.values()):
+            raise HTTPException(status_code=409, detail="a profiler is already running")
+        profiler = job["profiler"] = SamplingProfiler(threading.get_ident(), interval, seconds).start()
+        return {"profiling": True, "mode": profiler.mode, "interval": interval, "seconds": seconds}
+    if profiler is None: raise HTTPException(status_code=409, detail="not profiling")
+    profiler.stop()
+    return profiler.report()
+
+@app.get("/api/jobs/{job_id}/profile")
+async def job_profile_report(job_id: str):
+    job = JOBS.get(job_id)
+    profiler = job.get("profiler") if job else None
+    if profiler is None:
+        profile = FINISHED_STATS.get(job_id, {}).get("profile")
+        if profile is None: raise HTTPException(status_code=404, detail="no profile for this job")
+        return profile
+    return profiler.report()
 
 @app.post("/api/enumerate")
 async def start_enumeration(req: EnumerateRequest):
+    since = await _since(req) if req.since else None
     job_id = str(uuid.uuid4())
-    q: asyncio.Queue = asyncio.Queue()
-    JOBS[job_id] = {"queue": q}
+    await STORE.create(job_id, req.model_dump_json())
+    _launch(job_id, req, since=since)
+    return {"job_id": job_id}
+
+async def _since(req: EnumerateRequest) -> Dict:
+    """The job an incremental scan starts from: its lists, candidate order, rotation and findings."""
+    rec = await STORE.get(req.since)
+    if rec is None: raise HTTPException(status_code=404, detail="unknown job in since")
+    if _is_batch(rec): raise HTTPException(status_code=422, detail="since must be a target job, not a batch")
+    if rec["state"] == "running":
+        raise HTTPException(status_code=409, detail="the job in since is still running")
+    if str(EnumerateRequest.model_validate_json(rec["request"]).url) != str(req.url):
+        raise HTTPException(status_code=422, detail="the job in since scanned another URL")
+    if not rec.get("meta"): raise HTTPException(status_code=409, detail="the job in since never chose its wordlists")
+    return {"id": req.since, "meta": json.loads(rec["meta"]), "known": _hits(await STORE.findings(req.since))}
+
+@app.post("/api/jobs/{job_id}/resume")
+async def resume_job(job_id: str):
+    """Continue an interrupted, canceled or failed scan from its last checkpoint."""
+    rec = await STORE.get(job_id)
+    if rec is None: raise HTTPException(status_code=404, detail="unknown job")
+    if job_id in JOBS or rec["state"] not in RESUMABLE_STATES:
+        raise HTTPException(status_code=409, detail=f"job is {rec['state']}")
+    if _is_batch(rec):
+        raise HTTPException(status_code=409, detail="resume the batch's target jobs individually")
+    req = EnumerateRequest.model_validate_json(rec["request"])
+    if req.since:
+        raise HTTPException(status_code=409, detail="incremental scans are not resumed; start another with the same since")
+    await STORE.update(job_id, state="running")
+    _launch(job_id, req, resume={
+        "cursor": rec["cursor"], "tested": rec["tested"],
+        "meta": json.loads(rec["meta"]) if rec.get("meta") else None,
+        "known": _hits(await STORE.findings(job_id)),
+        "seq": await STORE.next_seq(job_id),
+    })
+    return {"job_id": job_id, "cursor": rec["cursor"]}
 
-    async def emit(ev): 
+def _launch(job_id: str, req: EnumerateRequest, resume: Optional[Dict] = None,
+            gate: Optional[FairGate] = None, since: Optional[Dict] = None) -> Dict:
+    resume = resume or {}
+    jlog = JobLog(STORE, job_id, start_seq=resume.get("seq", 0))
+    graph = GraphBuilder(str(req.url), req.collapse_threshold, req.fanout_limit)
+    known: List[Hit] = resume.get("known") or []
+    for h in known:  # the replayed log already drew these; only the builder's state is needed
+        graph.add(h.to_item(str(req.url)).model_dump())
+    metrics = ScanMetrics()
+    METRICS.register(job_id, metrics)
+    job = JOBS[job_id] = {"log": jlog, "graph": graph, "metrics": metrics}
+
+    async def deliver(ev):
         # also mirror to server logs for visibility
         if ev.get("type") == "stage":
             log.info("Stage: %s %s", ev.get("stage"), {k:v for k,v in ev.items() if k not in ("type","stage")})
         elif ev.get("type") == "meta":
             log.info("Meta: total_candidates=%s exts=%s", ev.get("total_candidates"), ev.get("exts"))
-        elif ev.get("type") == "progress":
-            pass
-        elif ev.get("type") == "found":
-            item = ev.get("item", {})
-            log.info("Found: %s %s", item.get("status"), item.get("path"))
+        elif ev.get("type") == "batch":
+            for item in ev.get("found") or []:
+                log.info("Found: %s %s", item.get("status"), item.get("path"))
         elif ev.get("type") == "error":
             log.error("Error event: %s", ev.get("message"))
-        await q.put(ev)
+        await jlog.put(ev)  # waits while the store is far behind: backpressure on the scan
+
+    batcher = EventBatcher(deliver)
+
+    async def emit(ev):
+        # Findings update the graph as they arrive; the batcher ships the deltas.
+        if ev.get("type") == "found":
+            ev["graph"] = graph.add(ev["item"])
+            jlog.record_finding(ev["item"])
+            hits.append(ev["item"]["path"])
+        await batcher.emit(ev)
+
+    hits: List[str] = []  # this run's findings, for HITSTATS
 
     async def run():
+        jlog.start()
+        batcher.start()
+        state, fields = "error", {}
+        stack = None
         try:
+            if resume:
+                await emit({"type":"stage","stage":"resuming","cursor": resume["cursor"], "findings": len(known)})
+
             # 1) Ensure SecLists (streamed progress)
             try:
                 await ensure_seclists(on_event=emit)
@@ -89,99 +308,277 @@ async def start_enumeration(req: EnumerateRequest):
                 log.warning("SecLists unavailable, will use builtin fallback: %s", dl_e)
 
             await emit({"type":"stage","stage":"indexing_lists"})
-            catalog = await asyncio.to_thread(index_wordlists)
+            with metrics.stage("indexing"):
+                catalog = await asyncio.to_thread(index_wordlists)
             counts = {k: len(v) for k, v in catalog.items()}
             await emit({"type":"stage","stage":"indexing_lists_done","counts": counts})
 
             # 2) Probe target and choose lists
             await emit({"type":"stage","stage":"probing_target"})
-            import aiohttp
-            async with aiohttp.ClientSession() as session:
-                html, headers = await initial_probe(session, str(req.url))
+            # One pooled session per origin: the scan reuses the probe's warm connections.
+            async with POOLS.session(str(req.url), req.max_concurrency) as session:
+                with metrics.stage("probing"):
+                    html, headers = await initial_probe(session, str(req.url))
 
-                await emit({"type":"stage","stage":"choosing_wordlists"})
-                chosen = choose_wordlists(str(req.url), html, headers, catalog)
+                # An incremental scan also keeps its predecessor's lists and order, so the rotation lines up.
+                saved = since["meta"] if since else resume.get("meta")
+                if saved:
+                    # Same lists and extensions as the interrupted run, so its cursor still applies.
+                    chosen = [(cat, Path(p)) for cat, p in saved["wordlists"]]
+                else:
+                    await emit({"type":"stage","stage":"choosing_wordlists"})
+                    chosen = choose_wordlists(str(req.url), html, headers, catalog, budget=req.max_paths)
+                stack = saved.get("stack", "generic") if saved else detect_stack(html, headers)
 
                 await emit({"type":"stage","stage":"building_candidates"})
-                candidates = await asyncio.to_thread(iter_candidates, chosen, req.max_paths)
+                with metrics.stage("candidates"):
+                    candidates = await asyncio.to_thread(iter_candidates, chosen, req.max_paths)
+
+                    # Fallback if nothing to do
+                    if not candidates:
+                        await emit({"type":"stage","stage":"using_builtin_wordlist"})
+                        candidates = builtin_candidates(min(req.max_paths, 5000))
 
-                # Fallback if nothing to do
-                if not candidates:
-                    await emit({"type":"stage","stage":"using_builtin_wordlist"})
-                    candidates = builtin_candidates(min(req.max_paths, 5000))
+                    # Likely hits first. A resumed scan repeats the saved order (or none), or its cursor is off.
+                    head = saved.get("head") if saved else None
+                    if head is not None or (req.ranked and not saved):
+                        candidates = await asyncio.to_thread(HITSTATS.rank, stack, candidates, len(candidates), head)
+                        head = candidates.head
+
+                    # Incremental: the next slice of the rotation; subdirectories still get the full list.
+                    rescan = {}
+                    if since:
+                        rescan["words"] = candidates
+                        candidates = rotating_slice(candidates, saved.get("rotation", 0), req.rescan_slice)
 
                 await emit({"type":"stage","stage":"candidates_ready","count": len(candidates)})
 
-                hdr_low = {k.lower(): v.lower() for k, v in headers.items()}
-                exts = []
-                if "microsoft-iis" in hdr_low.get("server","") or "asp.net" in hdr_low.get("x-powered-by",""):
-                    exts = [".aspx", ".asp"]
-                elif "php" in hdr_low.get("x-powered-by","") or "php" in (html or "").lower():
-                    exts = [".php"]
+                if saved:
+                    exts = saved["exts"]
+                else:
+                    hdr_low = {k.lower(): v.lower() for k, v in headers.items()}
+                    exts = []
+                    if req.extensions is not None:
+                        exts = ["." + e.strip().lstrip(".") for e in req.extensions if e.strip().lstrip(".")]
+                    elif "microsoft-iis" in hdr_low.get("server","") or "asp.net" in hdr_low.get("x-powered-by",""):
+                        exts = [".aspx", ".asp"]
+                    elif "php" in hdr_low.get("x-powered-by","") or "php" in (html or "").lower():
+                        exts = [".php"]
+                    exts = await asyncio.to_thread(HITSTATS.ext_order, stack, exts)
+                    await STORE.update(job_id, meta=json.dumps(
+                        {"wordlists": [[cat, str(p)] for cat, p in chosen], "exts": exts,
+                         "stack": stack, "head": head}))
+                if since:  # where the next incremental scan of this chain picks up
+                    await STORE.update(job_id, meta=json.dumps(
+                        {**saved, "since": since["id"], "rotation": candidates.stop}))
 
                 await emit({
                     "type":"meta",
                     "wordlists": [str(p) for _, p in chosen] if chosen else ["builtin (embedded)"],
                     "total_candidates": len(candidates),
-                    "exts": exts
+                    "exts": exts,
+                    "stack": stack,
+                    "ranked": len(head) if head else 0,
+                    **({"since": since["id"], "known": len(since["known"]), "slice_start": candidates.start}
+                       if since else {}),
                 })
 
+                options = dict(
+                    follow_redirects=req.follow_redirects,
+                    max_concurrency=req.max_concurrency,
+                    timeout=req.timeout_seconds,
+                    exts_hint=exts,
+                    body_mode=req.body_mode,
+                    adaptive=req.adaptive_concurrency,
+                    min_concurrency=req.min_concurrency,
+                    max_retries=req.max_retries,
+                    recursive=req.recursive,
+                    max_depth=req.max_depth,
+                    depth_budget=req.depth_budget,
+                    time_budget=req.time_budget,
+                    request_budget=req.request_budget,
+                    expand_extensions=req.expand_extensions,
+                    mutation_budget=req.mutation_budget,
+                )
+                if req.shards > 1:
+                    enumerator = ShardedEnumerator(str(req.url), shards=req.shards, **options)
+                else:
+                    enumerator = DirEnumerator(str(req.url), **options)
+                job["enumerator"], enumerator.metrics = enumerator, metrics
+                if gate is not None:  # batch member: every request also needs a slot from the shared gate
+                    enumerator.limiter.gate, enumerator.limiter.gate_key = gate, origin_of(str(req.url))
+                prev_tested = resume.get("tested", 0)
+                jlog.checkpoint_fn = lambda: (None if enumerator.checkpoint() is None
+                                              else (enumerator.checkpoint(), prev_tested + enumerator.tested))
+
                 await emit({"type":"stage","stage":"soft_404_baseline"})
-                baseline = await soft_404_baseline(session, str(req.url))
-
-            # 3) Enumerate
-            enumerator = DirEnumerator(str(req.url),
-                follow_redirects=req.follow_redirects,
-                max_concurrency=req.max_concurrency,
-                timeout=req.timeout_seconds
-            )
-            enumerator.exts_hint = exts
-            await emit({"type":"stage","stage":"enumeration_started"})
-            found_items = await enumerator.run(candidates, emit, baseline)
-
-            filtered = [f.model_dump() for f in found_items if int(f.status) in (200, 204, 301, 302, 401, 403)]
-            graph = _to_graph(str(req.url), filtered)
-            await emit({"type":"done","result": graph})
-            log.info("Enumeration done: tested=%d, kept=%d", len(found_items), len(filtered))
+                detector = job["detector"] = enumerator.wildcard_detector(session)
+                with metrics.stage("baseline"):
+                    root_baseline = await detector.calibrate("/")
+                await emit({"type":"stage","stage":"soft_404_baseline_done",
+                            "statuses": sorted(root_baseline)})
+
+                # Incremental: re-check the previous findings first; they carry over without being re-emitted.
+                diff = None
+                if since:
+                    await emit({"type":"stage","stage":"revalidating","count": len(since["known"])})
+                    with metrics.stage("revalidation"):
+                        diff = await enumerator.revalidate(session, since["known"], detector)
+                    for h in diff.current():
+                        item = h.to_item(str(req.url)).model_dump()
+                        graph.add(item)
+                        jlog.record_finding(item)
+                    await emit({"type":"stage","stage":"revalidated", **diff.counts()})
+                    rescan["probed"] = [h.path for h in since["known"]]
+                    rescan["explore"] = neighbours([after for _, after in diff.changed])
+
+                # 3) Enumerate
+                await emit({"type":"stage","stage":"enumeration_started"})
+                with metrics.stage("enumeration"):
+                    found_items = await enumerator.run(candidates, emit, detector, session=session,
+                                                       start=resume.get("cursor", 0), known=known, **rescan)
+
+            summary = {**graph.summary(), "requests": prev_tested + enumerator.tested}
+            if enumerator.stopped:
+                summary["stopped"] = enumerator.stopped
+            if diff is not None:
+                diff.added = list(found_items.dicts())
+                summary["requests"] += len(since["known"])
+                summary["since"], summary["diff"] = since["id"], diff.counts()
+                await emit(diff.event(str(req.url), since["id"]))
+            summary["stats"] = {**metrics.snapshot(), "soft404": detector.summary()}
+            await emit({"type":"done","result": {"summary": summary}})
+            log.info("Enumeration done: tested=%d, kept=%d", enumerator.tested, len(found_items))
+            state, fields = "done", {"summary": json.dumps(summary)}
 
         except asyncio.CancelledError:
-            try: await emit({"type":"canceled"})
+            state = job.get("stopping", "canceled")
+            try: await emit({"type": state})
             finally: pass
         except Exception:
             await emit({"type":"error","message": traceback.format_exc()})
         finally:
-            await q.put(None)
+            await batcher.aclose()
+            await jlog.aclose(state, **fields)
+            if stack and state != "error" and not since:  # a slice is not a run: it would dilute the rates
+                await asyncio.to_thread(HITSTATS.record, stack, hits, not resume)
+            JOBS.pop(job_id, None)
+            METRICS.retire(job_id, state)
+            final = FINISHED_STATS[job_id] = {"state": state, **metrics.snapshot()}
+            if job.get("detector"): final["soft404"] = job["detector"].summary()
+            profiler = job.pop("profiler", None)
+            if profiler:
+                profiler.stop()
+                final["profile"] = profiler.report()
+            while len(FINISHED_STATS) > FINISHED_STATS_MAX: FINISHED_STATS.popitem(last=False)
+            FINISHED_GRAPHS[job_id] = graph
+            while len(FINISHED_GRAPHS) > FINISHED_GRAPHS_MAX: FINISHED_GRAPHS.popitem(last=False)
 
-    JOBS[job_id]["task"] = asyncio.create_task(run())
-    return {"job_id": job_id}
+    job["task"] = asyncio.create_task(run())
+    return job
+
+@app.post("/api/batch")
+async def start_batch(req: BatchRequest):
+    if not req.targets: raise HTTPException(status_code=422, detail="no targets")
+    batch_id = str(uuid.uuid4())
+    await STORE.create(batch_id, req.model_dump_json())
+    _launch_batch(batch_id, req)
+    return {"job_id": batch_id, "targets": len(req.targets)}
+
+@app.post("/api/batch/upload")
+async def upload_batch(file: UploadFile = File(...), options: str = Form("{}")):
+    """Targets from a text file, one URL (or bare host) per line; `options` is a JSON BatchRequest minus targets."""
+    text = (await file.read()).decode("utf-8", "replace")
+    targets = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            targets.append(line if "://" in line else f"http://{line}/")
+    try:
+        req = BatchRequest(**{**json.loads(options or "{}"), "targets": targets})
+    except ValueError as e:  # bad JSON or a pydantic ValidationError
+        raise HTTPException(status_code=422, detail=str(e))
+    return await start_batch(req)
+
+def _launch_batch(batch_id: str, req: BatchRequest):
+    """
+    One job per target, launched as ordinary jobs (own log, graph and checkpoint) but
+    sharing one FairGate: `global_concurrency` requests overall, `per_host_concurrency`
+    per origin, granted round-robin. Wordlist index, compiled corpora and connection
+    pools are shared through their caches. The batch's own log reports each target
+    as it starts and finishes, the latter with its summary and collapsed graph.
+    """
+    blog = JobLog(STORE, batch_id)
+    gate = FairGate(req.global_concurrency, req.per_host_concurrency)
+    # The gate lives in this process, so targets never fan out to shard processes.
+    targets = [t.model_copy(update={"shards": 1}) for t in req.target_requests()]
+    children: Dict[str, Dict] = {}
+    job = JOBS[batch_id] = {"log": blog, "graph": None, "gate": gate, "children": children}
+    sem = asyncio.Semaphore(max(1, req.parallel_targets))
+    totals = {"targets": len(targets), "done": 0, "failed": 0, "findings": 0, "requests": 0}
+
+    async def one(treq: EnumerateRequest):
+        async with sem:
+            job_id = str(uuid.uuid4())
+            await STORE.create(job_id, treq.model_dump_json())
+            blog.publish({"type":"target_started","url": str(treq.url),"job_id": job_id})
+            child = children[job_id] = _launch(job_id, treq, gate=gate)
+            try:
+                await asyncio.shield(child["task"])
+            except asyncio.CancelledError:
+                child["task"].cancel()
+                raise
+        rec = await STORE.get(job_id) or {}
+        summary = json.loads(rec["summary"]) if rec.get("summary") else None
+        totals["done"] += 1
+        if rec.get("state") != "done": totals["failed"] += 1
+        if summary:
+            totals["findings"] += summary.get("total_tested", 0)  # the graph's finding count (see GraphBuilder.counts)
+            totals["requests"] += summary.get("requests", 0)
+        blog.publish({"type":"target_done","url": str(treq.url),"job_id": job_id,"state": rec.get("state"),
+                      "summary": summary, "graph": child["graph"].view("root")})
+        blog.publish({"type":"progress","value": totals["done"] / len(targets)})
+
+    async def run():
+        blog.start()
+        state = "error"
+        try:
+            blog.publish({"type":"meta","targets": [str(t.url) for t in targets], "gate": gate.stats()})
+            for t, res in zip(targets, await asyncio.gather(*(one(t) for t in targets), return_exceptions=True)):
+                if isinstance(res, Exception):
+                    totals["failed"] += 1
+                    log.error("Batch target %s failed: %r", t.url, res)
+            blog.publish({"type":"done","result": {"summary": totals}})
+            state = "done"
+        except asyncio.CancelledError:
+            state = job.get("stopping", "canceled")
+            blog.publish({"type": state})
+        except Exception:
+            blog.publish({"type":"error","message": traceback.format_exc()})
+        finally:
+            await blog.aclose(state, summary=json.dumps(totals))
+            JOBS.pop(batch_id, None)
+
+    job["task"] = asyncio.create_task(run())
 
 @app.websocket("/ws/{job_id}")
-async def ws_progress(ws: WebSocket, job_id: str):
+async def ws_progress(ws: WebSocket, job_id: str, offset: int = 0):
+    """Frames of a job from seq `offset` (replayed from the store, then live); any number of observers."""
     await ws.accept()
-    if job_id not in JOBS:
+    job = JOBS.get(job_id)
+    if job is None and await STORE.get(job_id) is None:
         await ws.send_json({"type":"error","message":"unknown job"})
         await ws.close(); return
-    q: asyncio.Queue = JOBS[job_id]["queue"]
     try:
-        while True:
-            ev = await q.get()
-            if ev is None: break
-            await ws.send_json(ev)
-    except WebSocketDisconnect:
-        pass
-    finally:
+        async for frame in subscribe(STORE, job_id, offset, job["log"] if job else None):
+            await ws.send_text(frame)
         await ws.close()
-        JOBS.pop(job_id, None)
+    except WebSocketDisconnect:
+        pass  # the scan keeps running; reconnect with ?offset= to pick up where this left off
 
 @app.delete("/api/enumerate/{job_id}")
 async def cancel(job_id: str):
     job = JOBS.get(job_id)
     if not job: raise HTTPException(status_code=404, detail="unknown job")
-    task = job.get("task")
-    if task: task.cancel()
-    try:
-        await job["queue"].put({"type":"canceled"})
-        await job["queue"].put(None)
-    except Exception:
-        pass
+    job["task"].cancel()  # its cancellation path logs 'canceled' and keeps the checkpoint
     return {"status":"canceled"}
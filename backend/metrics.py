@@ -0,0 +1,377 @@
+import collections, os, signal, sys, threading, time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, so no process series
+    resource = None
+
+# Request latencies and waits, seconds. Fixed buckets keep observe() to a bisect and two adds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+WAIT_BUCKETS = (0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+PROFILE_INTERVAL = 0.005   # seconds between profiler samples
+PROFILE_MAX_SECONDS = 300  # a forgotten profiler stops itself
+PROFILE_TOP = 40
+
+TIMER_HELP = {
+    "dirgraph_stage_seconds": "Duration of a job's pipeline stage.",
+    "dirgraph_wordlists_seconds": "Duration of a wordlist operation (bootstrap, index, corpus).",
+}
+
+LabelSet = Tuple[Tuple[str, str], ...]
+GaugeFn = Callable[[], Iterable[Tuple[LabelSet, float]]]
+
+class Histogram:
+    """Fixed-bucket histogram; mergeable, so shard processes can ship theirs."""
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float):
+        self.counts[bisect_left(self.bounds, v)] += 1
+        self.sum += v
+        self.count += 1
+
+    def merge(self, other: "Histogram"):
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.sum += other.sum
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate by linear interpolation inside the bucket (the +Inf bucket reports its lower bound)."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lo = self.bounds[i - 1] if i else 0.0
+                if i == len(self.bounds):
+                    return lo
+                return lo + (self.bounds[i] - lo) * (rank - seen) / c
+            seen += c
+        return self.bounds[-1]
+
+    def state(self) -> Dict:
+        return {"bounds": self.bounds, "counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+    @classmethod
+    def from_state(cls, s: Dict) -> "Histogram":
+        h = cls(s["bounds"])
+        h.counts, h.sum, h.count = list(s["counts"]), s["sum"], s["count"]
+        return h
+
+    def summary(self) -> Dict:
+        ms = lambda v: None if v is None else round(v * 1000, 2)
+        return {"count": self.count, "mean_ms": ms(self.sum / self.count) if self.count else None,
+                "p50_ms": ms(self.quantile(0.5)), "p90_ms": ms(self.quantile(0.9)), "p99_ms": ms(self.quantile(0.99))}
+
+class ScanMetrics:
+    """
+    Counters of one job's requests, updated inline on the hot path (a few integer adds
+    and one bisect per request). Gauges such as in-flight requests are not kept here:
+    they are read from the limiter, pool and queues when someone asks.
+
+    A sharded job's worker processes send their state() with each batch; absorb()
+    keeps the latest per shard and snapshot()/merged() add them in.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.outcomes: Dict[str, int] = collections.Counter()  # ok / throttled / timeout / error
+        self.statuses: Dict[int, int] = collections.Counter()
+        self.bytes_read = 0
+        self.retries = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.wait = Histogram(WAIT_BUCKETS)  # time queued for a limiter (and batch gate) slot
+        self.stages: Dict[str, float] = {}
+        self._remote: Dict[Any, Dict] = {}
+
+    def observe_request(self, seconds: float, outcome: str, status: Optional[int], nbytes: int):
+        self.outcomes[outcome] += 1
+        if status is not None:
+            self.statuses[status] += 1
+        self.bytes_read += nbytes
+        self.latency.observe(seconds)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a pipeline stage; also recorded in the process-wide stage histogram."""
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            dt = time.monotonic() - t0
+            self.stages[name] = self.stages.get(name, 0.0) + dt
+            METRICS.observe_stage(name, dt)
+
+    def state(self) -> Dict:
+        m = self.merged()
+        return {"outcomes": dict(m.outcomes), "statuses": dict(m.statuses), "bytes_read": m.bytes_read,
+                "retries": m.retries, "latency": m.latency.state(), "wait": m.wait.state(), "stages": dict(m.stages)}
+
+    def absorb(self, source: Any, state: Dict):
+        self._remote[source] = state
+
+    def merge_state(self, s: Dict):
+        self.outcomes.update(s["outcomes"])
+        self.statuses.update({int(k): v for k, v in s["statuses"].items()})
+        self.bytes_read += s["bytes_read"]
+        self.retries += s["retries"]
+        self.latency.merge(Histogram.from_state(s["latency"]))
+        self.wait.merge(Histogram.from_state(s["wait"]))
+        for k, v in s["stages"].items():
+            self.stages.setdefault(k, v)  # shards repeat the same stages; wall time, not a sum
+
+    def merged(self) -> "ScanMetrics":
+        if not self._remote:
+            return self
+        m = ScanMetrics()
+        m.started = self.started
+        m.merge_state({"outcomes": self.outcomes, "statuses": self.statuses, "bytes_read": self.bytes_read,
+                       "retries": self.retries, "latency": self.latency.state(), "wait": self.wait.state(),
+                       "stages": self.stages})
+        for s in self._remote.values():
+            m.merge_state(s)
+        return m
+
+    def snapshot(self) -> Dict:
+        m = self.merged()
+        requests = sum(m.outcomes.values())
+        elapsed = time.monotonic() - self.started
+        return {
+            "requests": requests,
+            "requests_per_s": round(requests / elapsed, 1) if elapsed else None,
+            "outcomes": dict(m.outcomes),
+            "statuses": {str(k): v for k, v in sorted(m.statuses.items())},
+            "retries": m.retries,
+            "bytes_read": m.bytes_read,
+            "latency": m.latency.summary(),
+            "limiter_wait": m.wait.summary(),
+            "stages": {k: round(v, 4) for k, v in m.stages.items()},
+        }
+
+class SamplingProfiler:
+    """
+    Statistical profiler for the event loop's thread: every `interval` seconds its
+    current stack is counted per frame, so the cost does not grow with the amount of
+    code that runs. When the loop runs in the main thread (as under uvicorn) samples
+    come from a SIGPROF timer, which ticks on CPU time and interrupts whatever
+    bytecode is running. Otherwise a daemon thread reads sys._current_frames(); that
+    can only look while the loop has released the GIL, so it mostly sees the
+    selector and is only a rough guide. It covers every job of this process, not
+    shard worker processes.
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL, max_seconds: float = PROFILE_MAX_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.mode = ("signal" if thread_id == threading.main_thread().ident and hasattr(signal, "setitimer")
+                     else "thread")
+        self.samples = 0
+        self.self_counts: Dict[str, int] = collections.Counter()   # innermost frame, by line
+        self.total_counts: Dict[str, int] = collections.Counter()  # anywhere on the stack, by function
+        self.started = time.monotonic()
+        self.stopped: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._previous = None
+
+    def start(self) -> "SamplingProfiler":
+        if self.mode == "signal":
+            self._previous = signal.signal(signal.SIGPROF, self._on_signal)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        else:
+            self._thread = threading.Thread(target=self._run, name="dirgraph-profiler", daemon=True)
+            self._thread.start()
+        return self
+
+    def _on_signal(self, signum, frame):
+        if time.monotonic() - self.started > self.max_seconds:
+            self.stop()
+        elif frame is not None:
+            self._record(frame)
+
+    def _run(self):
+        deadline = self.started + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self._record(frame)
+        self.stop()
+
+    def _record(self, frame):
+        self.samples += 1
+        code = frame.f_code
+        self.self_counts[f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno or '?'})"] += 1
+        seen = set()
+        while frame is not None:
+            code = frame.f_code
+            key = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            if key not in seen:  # recursion counts once per sample
+                seen.add(key)
+                self.total_counts[key] += 1
+            frame = frame.f_back
+
+    def stop(self):
+        """Stop sampling; in "signal" mode this must run on the main thread, like start()."""
+        if self.stopped is not None:
+            return
+        self.stopped = time.monotonic()
+        if self.mode == "signal":
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, self._previous or signal.SIG_DFL)
+        else:
+            self._stop.set()
+
+    @property
+    def running(self) -> bool:
+        return self.stopped is None
+
+    def report(self, top: int = PROFILE_TOP) -> Dict:
+        n = self.samples or 1
+        pct = lambda items: [{"frame": k, "samples": c, "pct": round(100 * c / n, 1)} for k, c in items]
+        return {
+            "running": self.running,
+            "mode": self.mode,
+            "seconds": round((self.stopped or time.monotonic()) - self.started, 2),
+            "interval": self.interval,
+            "samples": self.samples,
+            "self": pct(collections.Counter(self.self_counts).most_common(top)),
+            "cumulative": pct(collections.Counter(self.total_counts).most_common(top)),
+        }
+
+def _fmt_labels(labels: LabelSet, extra: LabelSet = ()) -> str:
+    items = tuple(labels) + tuple(extra)
+    if not items:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+def _fmt(v: float) -> str:
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+class MetricsRegistry:
+    """
+    Process-wide view rendered as Prometheus text: request counters summed over the
+    jobs that are running (live ScanMetrics) plus those that finished (retired into
+    one accumulator, so totals stay monotonic), process-wide timers, and gauges
+    computed by callbacks at scrape time.
+    """
+
+    def __init__(self):
+        self.live: Dict[str, ScanMetrics] = {}
+        self.retired = ScanMetrics()
+        self.timers: Dict[Tuple[str, LabelSet], Histogram] = {}
+        self.gauges: List[Tuple[str, str, GaugeFn]] = []
+        self.jobs_finished: Dict[str, int] = collections.Counter()
+        self._lock = threading.Lock()
+
+    def register(self, job_id: str, m: ScanMetrics):
+        self.live[job_id] = m
+
+    def retire(self, job_id: str, state: str):
+        m = self.live.pop(job_id, None)
+        if m is not None:
+            s = m.state()
+            s["stages"] = {}  # already in the stage histogram
+            self.retired.merge_state(s)
+        self.jobs_finished[state] += 1
+
+    def observe_stage(self, stage: str, seconds: float):
+        self.observe("dirgraph_stage_seconds", seconds, stage=stage)
+
+    def _timer(self, name: str, labels: LabelSet, bounds: Sequence[float]) -> Histogram:
+        h = self.timers.get((name, labels))
+        if h is None:
+            with self._lock:  # wordlist timers are also observed from worker threads
+                h = self.timers.setdefault((name, labels), Histogram(bounds))
+        return h
+
+    def observe(self, name: str, seconds: float, **labels: str):
+        self._timer(name, tuple(sorted(labels.items())), STAGE_BUCKETS).observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels: str):
+        """Time a block into the `name` histogram, e.g. METRICS.timer("dirgraph_wordlists_seconds", op="index")."""
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - t0, **labels)
+
+    def gauge(self, name: str, help: str, fn: GaugeFn):
+        self.gauges.append((name, help, fn))
+
+    def totals(self) -> ScanMetrics:
+        m = ScanMetrics()
+        for s in [self.retired, *self.live.values()]:
+            st = s.state()
+            st["stages"] = {}
+            m.merge_state(st)
+        return m
+
+    def render(self) -> str:
+        out: List[str] = []
+
+        def head(name: str, kind: str, help: str):
+            out.append(f"# HELP {name} {help}")
+            out.append(f"# TYPE {name} {kind}")
+
+        def hist(name: str, labels: LabelSet, h: Histogram):
+            cum = 0
+            for bound, c in zip((*h.bounds, float("inf")), h.counts):
+                cum += c
+                le = "+Inf" if bound == float("inf") else _fmt(bound)
+                out.append(f"{name}_bucket{_fmt_labels(labels, (('le', le),))} {cum}")
+            out.append(f"{name}_sum{_fmt_labels(labels)} {_fmt(h.sum)}")
+            out.append(f"{name}_count{_fmt_labels(labels)} {h.count}")
+
+        t = self.totals()
+        head("dirgraph_requests_total", "counter", "Requests sent to targets, by outcome.")
+        for k, v in sorted(t.outcomes.items()):
+            out.append(f'dirgraph_requests_total{{outcome="{k}"}} {v}')
+        head("dirgraph_responses_total", "counter", "Responses received, by status code.")
+        for k, v in sorted(t.statuses.items()):
+            out.append(f'dirgraph_responses_total{{status="{k}"}} {v}')
+        head("dirgraph_retries_total", "counter", "Requests retried after a timeout, error or throttle.")
+        out.append(f"dirgraph_retries_total {t.retries}")
+        head("dirgraph_bytes_read_total", "counter", "Response bytes read from targets (bodies are capped).")
+        out.append(f"dirgraph_bytes_read_total {t.bytes_read}")
+        head("dirgraph_request_duration_seconds", "histogram", "Target request latency.")
+        hist("dirgraph_request_duration_seconds", (), t.latency)
+        head("dirgraph_limiter_wait_seconds", "histogram", "Time requests queued for a concurrency slot.")
+        hist("dirgraph_limiter_wait_seconds", (), t.wait)
+        head("dirgraph_jobs_finished_total", "counter", "Jobs finished, by final state.")
+        for k, v in sorted(self.jobs_finished.items()):
+            out.append(f'dirgraph_jobs_finished_total{{state="{k}"}} {v}')
+
+        timers = sorted(self.timers.items())
+        for name in sorted({n for (n, _), _ in timers}):
+            head(name, "histogram", TIMER_HELP.get(name, "Duration of an operation."))
+            for (n, labels), h in timers:
+                if n == name:
+                    hist(name, labels, h)
+
+        for name, help, fn in self.gauges:
+            head(name, "gauge", help)
+            for labels, v in fn():
+                out.append(f"{name}{_fmt_labels(labels)} {_fmt(v)}")
+
+        if resource is not None:
+            ru = resource.getrusage(resource.RUSAGE_SELF)
+            head("process_cpu_seconds_total", "counter", "User and system CPU time of this process.")
+            out.append(f"process_cpu_seconds_total {_fmt(ru.ru_utime + ru.ru_stime)}")
+            head("process_max_resident_memory_bytes", "gauge", "Peak resident set size of this process.")
+            out.append(f"process_max_resident_memory_bytes {ru.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)}")
+        return "\n".join(out) + "\n"
+
+METRICS = MetricsRegistry()
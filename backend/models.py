@@ -1,12 +1,48 @@
-from pydantic import BaseModel, HttpUrl
-from typing import List, Dict, Optional
+import sys
+from array import array
+from urllib.parse import urljoin
+from pydantic import BaseModel, Field, HttpUrl
+from typing import List, Dict, Iterator, Literal, Optional, Tuple
 
-class EnumerateRequest(BaseModel):
-    url: HttpUrl
-    max_concurrency: int = 64
+class ScanOptions(BaseModel):
+    max_concurrency: int = 64  # upper bound when adaptive_concurrency is on
+    adaptive_concurrency: bool = False
+    min_concurrency: int = 4
+    max_retries: int = 2  # per path, on timeouts/connection errors/429/503
     timeout_seconds: int = 10
     follow_redirects: bool = False
     max_paths: int = 50000  # safety cap
+    recursive: bool = False
+    max_depth: int = 3        # directories up to this many segments deep are explored
+    depth_budget: int = 5000  # words tried per discovered directory, halved at each deeper level
+    body_mode: Literal["stream", "range", "head"] = "stream"  # see DirEnumerator._fetch
+    shards: int = 1  # worker processes splitting the scan (capped at the CPU count); see shards.py
+    collapse_threshold: int = 200  # directories with more findings are streamed as one aggregate node (0 = never)
+    fanout_limit: int = 300        # children shown per directory before a "+N more" node (0 = unlimited)
+    ranked: bool = True  # probe paths that hit before on this kind of stack first; see hitstats.py
+    time_budget: Optional[float] = None  # seconds of enumeration before stopping early
+    request_budget: Optional[int] = None  # paths tested before stopping early
+    extensions: Optional[List[str]] = None  # overrides the extensions inferred from the probe (e.g. [".php", ".bak"])
+    expand_extensions: Literal["all", "hits"] = "hits"  # only words that hit (as variants), or cross every word
+    # Extra requests for variants of findings: extensions (in "hits" mode), backups, case,
+    # linked words. On by default: with "hits" it is where extensions get tried at all (0 = off).
+    mutation_budget: int = 2000
+
+class EnumerateRequest(ScanOptions):
+    url: HttpUrl
+    since: Optional[str] = None  # a finished job on this URL: re-check its findings, then scan a slice (rescan.py)
+    rescan_slice: float = Field(0.1, gt=0, le=1)  # share of the candidate space a `since` scan tests, rotating
+
+class BatchRequest(ScanOptions):
+    """Many targets in one job; the ScanOptions apply to each of them."""
+    targets: List[HttpUrl]
+    global_concurrency: int = 512  # requests in flight across the whole batch
+    per_host_concurrency: int = 32  # ... and against any one origin
+    parallel_targets: int = 16      # targets being probed/scanned at the same time
+
+    def target_requests(self) -> List["EnumerateRequest"]:
+        opts = self.model_dump(include=set(ScanOptions.model_fields))
+        return [EnumerateRequest(url=t, **opts) for t in self.targets]
 
 class FoundItem(BaseModel):
     url: str
@@ -16,9 +52,67 @@ class FoundItem(BaseModel):
     redirected_to: Optional[str] = None
     wordlist: Optional[str] = None
     issues: List[str] = []
+    etag: Optional[str] = None           # validators, for conditional re-checks
+    last_modified: Optional[str] = None
+
+class Hit:
+    """Hot-path result for one tested path; becomes a FoundItem only when emitted or exported."""
+    __slots__ = ("path", "status", "size", "redirected_to", "issues", "etag", "last_modified")
+
+    def __init__(self, path: str, status: int, size: Optional[int] = None,
+                 redirected_to: Optional[str] = None, issues: Optional[List[str]] = None,
+                 etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self.path = path
+        self.status = status
+        self.size = size
+        self.redirected_to = redirected_to
+        self.issues = issues or []
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def to_item(self, base: str) -> FoundItem:
+        return FoundItem(url=urljoin(base.rstrip("/") + "/", self.path.lstrip("/")), path=self.path,
+                         status=self.status, size=self.size, redirected_to=self.redirected_to,
+                         issues=list(self.issues), etag=self.etag, last_modified=self.last_modified)
+
+    @classmethod
+    def from_item(cls, item: Dict) -> "Hit":
+        return cls(item["path"], item["status"], item.get("size"), item.get("redirected_to"), item.get("issues"),
+                   item.get("etag"), item.get("last_modified"))
+
+class ResultColumns:
+    """
+    Struct-of-arrays store for the findings a scan keeps: interned paths, statuses as
+    array('H'), sizes as array('I') and a sparse side table for the rarer redirect
+    targets, issue lists and validators. Rows are materialized as Hit/FoundItem on demand.
+    """
+    NO_SIZE = 0xFFFFFFFF
+
+    def __init__(self, base: str):
+        self.base = base
+        self.paths: List[str] = []
+        self.statuses = array("H")
+        self.sizes = array("I")
+        self.extra: Dict[int, Tuple[Optional[str], List[str], Optional[str], Optional[str]]] = {}
+
+    def append(self, hit: Hit):
+        i = len(self.paths)
+        self.paths.append(sys.intern(hit.path))
+        self.statuses.append(hit.status)
+        self.sizes.append(self.NO_SIZE if hit.size is None else min(hit.size, self.NO_SIZE - 1))
+        if hit.redirected_to or hit.issues or hit.etag or hit.last_modified:
+            self.extra[i] = (hit.redirected_to, hit.issues, hit.etag, hit.last_modified)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def hit(self, i: int) -> Hit:
+        size = self.sizes[i]
+        loc, issues, etag, modified = self.extra.get(i, (None, [], None, None))
+        return Hit(self.paths[i], self.statuses[i], None if size == self.NO_SIZE else size, loc, issues, etag, modified)
+
+    def items(self) -> Iterator[FoundItem]:
+        return (self.hit(i).to_item(self.base) for i in range(len(self.paths)))
 
-class GraphResult(BaseModel):
-    nodes: List[Dict]
-    edges: List[Dict]
-    summary: Dict
-    findings: List[FoundItem]
+    def dicts(self) -> Iterator[Dict]:
+        return (it.model_dump() for it in self.items())
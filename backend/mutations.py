@@ -0,0 +1,107 @@
+import posixpath, re
+from html import unescape
+from typing import Iterator, List, Optional, Sequence
+
+from .frontier import REDIRECT_STATUSES, as_directory
+
+# Variants worth a request once a base is known to exist.
+BACKUP_SUFFIXES = (".bak", "~", ".old", ".orig", ".save", ".swp", ".tmp")
+STEM_SUFFIXES = (".bak", ".old")             # config.php -> config.bak
+ARCHIVE_EXTS = (".zip", ".tar.gz", ".tgz", ".rar", ".7z")  # a directory packed up next to itself
+PROMISING_STATUSES = (200, 204, 401, 403)
+CASE_STATUSES = (401, 403)                   # an ACL may match one spelling only
+MAX_RESPONSE_WORDS = 16                      # words taken from one response body
+WORD_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+LINK_RE = re.compile(r"""(?:href|src|action)\s*=\s*["']([^"'#?<>\s]+)""", re.I)
+
+def _split(path: str):
+    """(directory with trailing '/', last segment) of a path."""
+    p = path.rstrip("/")
+    head, _, name = p.rpartition("/")
+    return head + "/", name
+
+def _has_ext(name: str) -> bool:
+    return "." in name.lstrip(".")
+
+def _is_backup(name: str) -> bool:
+    return name.endswith(BACKUP_SUFFIXES) or name.endswith(ARCHIVE_EXTS)
+
+def response_words(snippet: str, directory: str) -> Iterator[str]:
+    """Same-site links in a response body, and their segments as words under `directory`."""
+    seen = set()
+    for m in LINK_RE.finditer(snippet or ""):
+        link = unescape(m.group(1))
+        if "://" in link or link.startswith(("//", "mailto:", "javascript:", "data:", "tel:")):
+            continue
+        segs = [s for s in link.split("/") if s]
+        if not segs or not all(WORD_RE.match(s) for s in segs):
+            continue
+        target = posixpath.normpath(posixpath.join(directory, link))
+        for p in (target, *(directory + s for s in segs)):
+            if p not in seen and p != directory.rstrip("/"):
+                seen.add(p)
+                yield p
+                if len(seen) >= MAX_RESPONSE_WORDS:
+                    return
+
+class Mutator:
+    """
+    Lazy variants of a finding: what else is likely to exist once `path` does.
+
+    - files (last segment has an extension): backup copies (`.bak`, `~`, `.old`, ...,
+      a vim `.name.swp`) and the stem with a backup extension;
+    - extensionless hits and directories: archives of the directory and, when the
+      word list is not crossed with every extension (`all_exts=False`), the
+      extension variants of this base only;
+    - 401/403 answers: case variants of the last segment;
+    - 200 bodies: same-site links in the first bytes of the response, and their
+      segments as words in the same directory.
+
+    Nothing is generated for misses, so the extra requests scale with findings, not
+    with the word list. Duplicates are filtered by the Frontier, not here.
+    """
+
+    def __init__(self, exts: Sequence[str] = (), all_exts: bool = True,
+                 backup_suffixes: Sequence[str] = BACKUP_SUFFIXES, case_variants: bool = True,
+                 words_from_responses: bool = True):
+        self.exts: List[str] = list(exts)
+        self.all_exts = all_exts
+        self.backup_suffixes = tuple(backup_suffixes)
+        self.case_variants = case_variants
+        self.words_from_responses = words_from_responses
+
+    def mutations(self, path: str, status: int, location: Optional[str] = None,
+                  snippet: str = "") -> Iterator[str]:
+        if status not in PROMISING_STATUSES and status not in REDIRECT_STATUSES:
+            return
+        parent, name = _split(path)
+        if not name:
+            return
+        directory = as_directory(path, status, location)
+        if status in REDIRECT_STATUSES and directory is None:
+            return  # a redirect elsewhere says nothing about this name
+        if _is_backup(name):
+            return  # no backups of backups
+        base = parent + name
+        if _has_ext(name) and directory is None:
+            for s in self.backup_suffixes:
+                yield base + s
+            yield parent + "." + name + ".swp"
+            stem = name.rsplit(".", 1)[0]
+            for s in STEM_SUFFIXES:
+                yield parent + stem + s
+        else:
+            if not self.all_exts and not name.startswith("."):
+                for ext in self.exts:
+                    yield base + ext
+            if directory is not None:
+                for ext in ARCHIVE_EXTS:
+                    yield base + ext
+            for s in self.backup_suffixes[:3]:
+                yield base + s
+        if self.case_variants and status in CASE_STATUSES:
+            for v in (name.lower(), name.upper(), name.capitalize()):
+                if v != name:
+                    yield parent + v + ("/" if path.endswith("/") else "")
+        if self.words_from_responses and snippet and 200 <= status < 300:
+            yield from response_words(snippet, directory or parent)
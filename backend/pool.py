@@ -0,0 +1,120 @@
+import asyncio, logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import urlsplit
+import aiohttp
+
+log = logging.getLogger("dirgraph.pool")
+
+DNS_TTL = 300           # seconds a resolved host stays in the connector's DNS cache
+KEEPALIVE_TIMEOUT = 30  # idle keep-alive connections are kept this long
+IDLE_CLOSE = 60         # a pool nobody leases is kept warm this long for the next job
+
+def origin_of(url: str) -> str:
+    u = urlsplit(str(url))
+    port = u.port or (443 if u.scheme == "https" else 80)
+    return f"{u.scheme}://{(u.hostname or '').lower()}:{port}"
+
+class _HostPool:
+    """One keep-alive connector + session for an origin, with trace-based counters."""
+
+    def __init__(self, origin: str):
+        self.origin = origin
+        self.loop = asyncio.get_running_loop()
+        self.leases = 0
+        self.capacity = 0  # sum of the concurrency bounds of current leases
+        self.close_handle: Optional[asyncio.TimerHandle] = None
+        self.counters: Dict[str, int] = {
+            "requests": 0, "in_flight": 0, "connections_created": 0, "connections_reused": 0,
+            "dns_cache_hits": 0, "dns_cache_misses": 0,
+        }
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._count("requests", "in_flight"))
+        trace.on_request_end.append(self._uncount("in_flight"))
+        trace.on_request_exception.append(self._uncount("in_flight"))
+        trace.on_connection_create_end.append(self._count("connections_created"))
+        trace.on_connection_reuseconn.append(self._count("connections_reused"))
+        trace.on_dns_cache_hit.append(self._count("dns_cache_hits"))
+        trace.on_dns_cache_miss.append(self._count("dns_cache_misses"))
+        # No connector-wide cap: a lease's requests all pass through its job's
+        # ConcurrencyLimiter, bounded by the same concurrency the lease adds to
+        # `capacity`, so the pool never carries more than that sum and jobs sharing it
+        # never queue behind each other.
+        # Handshakes are saved by keep-alive reuse only: asyncio's TLS transport offers
+        # no client-side session resumption, so there is no TLS session cache to share.
+        self.connector = aiohttp.TCPConnector(
+            limit=0, limit_per_host=0, use_dns_cache=True, ttl_dns_cache=DNS_TTL,
+            keepalive_timeout=KEEPALIVE_TIMEOUT, enable_cleanup_closed=True,
+        )
+        self.session = aiohttp.ClientSession(connector=self.connector, trace_configs=[trace])
+
+    def _count(self, *keys: str):
+        async def cb(session, ctx, params):
+            for k in keys:
+                self.counters[k] += 1
+        return cb
+
+    def _uncount(self, key: str):
+        async def cb(session, ctx, params):
+            self.counters[key] -= 1
+        return cb
+
+    def stats(self) -> Dict:
+        c = self.counters
+        handshakes = c["connections_created"]
+        return {
+            "origin": self.origin, "leases": self.leases, "capacity": self.capacity, **c,
+            "requests_per_connection": round(c["requests"] / handshakes, 1) if handshakes else None,
+        }
+
+class ConnectionPools:
+    """
+    Per-origin connection pools shared by every phase of a job (probe, baseline,
+    enumeration) and by concurrent jobs to the same host; each lease's job limiter
+    keeps its share of the pool within the concurrency it leased. A released pool
+    lingers for IDLE_CLOSE seconds so back-to-back jobs start on warm keep-alive
+    connections.
+    """
+
+    def __init__(self):
+        self._pools: Dict[str, _HostPool] = {}
+
+    @asynccontextmanager
+    async def session(self, url: str, concurrency: int = 64) -> AsyncIterator[aiohttp.ClientSession]:
+        origin = origin_of(url)
+        pool = self._pools.get(origin)
+        if pool is None or pool.session.closed or pool.loop is not asyncio.get_running_loop():
+            pool = self._pools[origin] = _HostPool(origin)
+            log.info("Opened connection pool for %s", origin)
+        if pool.close_handle:
+            pool.close_handle.cancel()
+            pool.close_handle = None
+        pool.leases += 1
+        pool.capacity += concurrency
+        try:
+            yield pool.session
+        finally:
+            pool.leases -= 1
+            pool.capacity -= concurrency
+            if pool.leases == 0:
+                loop = asyncio.get_running_loop()
+                pool.close_handle = loop.call_later(
+                    IDLE_CLOSE, lambda: asyncio.ensure_future(self._close(origin, pool)))
+
+    async def _close(self, origin: str, pool: _HostPool):
+        if pool.leases == 0 and self._pools.get(origin) is pool:
+            del self._pools[origin]
+            log.info("Closing idle connection pool for %s: %s", origin, pool.stats())
+            await pool.session.close()
+
+    def stats(self) -> List[Dict]:
+        return [p.stats() for p in self._pools.values()]
+
+    async def close(self):
+        pools, self._pools = list(self._pools.values()), {}
+        for p in pools:
+            if p.close_handle:
+                p.close_handle.cancel()
+            await p.session.close()
+
+POOLS = ConnectionPools()
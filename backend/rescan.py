@@ -0,0 +1,123 @@
+import math
+from itertools import chain, islice
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from .frontier import as_directory
+from .models import Hit
+
+SIZE_TOLERANCE = 0.02  # without validators, a body this much larger or smaller counts as changed
+MIN_SIZE_DELTA = 16    # ... and never a difference of fewer bytes (dates, counters, CSRF tokens)
+
+def _weak(tag: Optional[str]) -> Optional[str]:
+    # If-None-Match compares weakly: W/"x" and "x" are the same entity
+    return tag[2:] if tag and tag.startswith("W/") else tag
+
+def conditional_headers(hit: Hit) -> Dict[str, str]:
+    """If-None-Match / If-Modified-Since for a finding's saved validators."""
+    headers = {}
+    if hit.etag:
+        headers["If-None-Match"] = hit.etag
+    if hit.last_modified:
+        headers["If-Modified-Since"] = hit.last_modified
+    return headers
+
+def compare(old: Hit, new: Optional[Hit]) -> str:
+    """
+    "unchanged", "changed" or "removed" for a finding re-checked with conditional
+    headers; `new` is None when the path is not a finding any more (miss or soft-404).
+    304 answers never get here: they are unchanged by definition.
+    Validators decide when both sides have the same kind; otherwise a status or
+    redirect change, or a size change beyond SIZE_TOLERANCE, counts as changed.
+    """
+    if new is None:
+        return "removed"
+    if new.status != old.status or (new.redirected_to or None) != (old.redirected_to or None):
+        return "changed"
+    if old.etag and new.etag:
+        return "unchanged" if _weak(old.etag) == _weak(new.etag) else "changed"
+    if old.last_modified and new.last_modified:
+        return "unchanged" if old.last_modified == new.last_modified else "changed"
+    if old.size is not None and new.size is not None:
+        delta = abs(new.size - old.size)
+        if delta >= MIN_SIZE_DELTA and delta > SIZE_TOLERANCE * max(old.size, new.size):
+            return "changed"
+    return "unchanged"
+
+def neighbours(hits: Sequence[Hit]) -> List[str]:
+    """Directories worth exploring again around changed findings: their own, or the one they sit in."""
+    dirs: Set[str] = set()
+    for h in hits:
+        d = as_directory(h.path, h.status, h.redirected_to)
+        if d is None:
+            parent = "/" + h.path.strip("/").rpartition("/")[0]
+            d = parent.rstrip("/") + "/" if parent != "/" else None
+        if d:
+            dirs.add(d)
+    return sorted(dirs)
+
+class RotatingSlice(Sequence):
+    """
+    `count` items of `seq` starting at `start`, wrapping around at its end: one turn
+    of a rotation that covers the whole candidate space every len(seq)/count runs.
+    Lazy and picklable when `seq` is (a corpus view, RankedCandidates or a list).
+    """
+
+    def __init__(self, seq: Sequence[str], start: int, count: int):
+        self.seq = seq
+        n = len(seq)
+        self.start = start % n if n else 0
+        self.count = max(0, min(count, n))
+
+    @property
+    def stop(self) -> int:
+        """Where the next turn starts."""
+        n = len(self.seq)
+        return (self.start + self.count) % n if n else 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: Union[int, slice]):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.count))]
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return self.seq[(self.start + i) % len(self.seq)]
+
+    def __iter__(self) -> Iterator[str]:
+        first = min(self.count, len(self.seq) - self.start)
+        return chain(islice(self.seq, self.start, self.start + first),
+                     islice(self.seq, 0, self.count - first))
+
+def rotating_slice(candidates: Sequence[str], start: int, fraction: float) -> RotatingSlice:
+    """The next `fraction` of the candidates from `start` on (at least one)."""
+    return RotatingSlice(candidates, start, max(1, math.ceil(len(candidates) * fraction)))
+
+class Diff:
+    """What an incremental scan found relative to the job it started from."""
+
+    def __init__(self):
+        self.unchanged: List[Hit] = []
+        self.changed: List[Tuple[Hit, Hit]] = []  # (before, after)
+        self.removed: List[Hit] = []
+        self.unverified: List[Hit] = []           # no answer at all: kept as they were
+        self.added: List[Dict] = []               # found items, as emitted
+
+    def current(self) -> Iterator[Hit]:
+        """The findings as they stand now, apart from the added ones."""
+        yield from self.unchanged
+        yield from self.unverified
+        for _, after in self.changed:
+            yield after
+
+    def counts(self) -> Dict[str, int]:
+        return {"added": len(self.added), "changed": len(self.changed), "removed": len(self.removed),
+                "unchanged": len(self.unchanged), "unverified": len(self.unverified)}
+
+    def event(self, base: str, since: str) -> Dict:
+        item = lambda h: h.to_item(base).model_dump()
+        return {"type": "diff", "since": since, "counts": self.counts(), "added": self.added,
+                "changed": [{"before": item(a), "after": item(b)} for a, b in self.changed],
+                "removed": [item(h) for h in self.removed]}
@@ -1,13 +1,48 @@
-import asyncio, random, string, traceback
+import asyncio, contextlib, logging, random, string, time, traceback
 from urllib.parse import urljoin as _urljoin
-from typing import Callable, Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
 import aiohttp
 
-from .models import FoundItem
+from .models import Hit, ResultColumns
+from .limiter import ConcurrencyLimiter, parse_retry_after
+from .pool import POOLS
+from .soft404 import WildcardDetector
+from .frontier import Frontier
+from .mutations import Mutator
+from .rescan import Diff, compare, conditional_headers
+from .metrics import ScanMetrics
 from . import analyzer
 
+log = logging.getLogger("dirgraph.scanner")
+
 EventCb = Callable[[Dict], None]
 
+# Body-read policy: analysis only ever looks at the first SNIPPET_LIMIT bytes.
+SNIPPET_LIMIT = 2048
+MAX_DRAIN_BYTES = 1 << 20     # cap when sizing a body without Content-Length
+KEEPALIVE_DRAIN = 64 << 10    # small leftovers are drained so the connection is reused
+BODY_MODES = ("stream", "range", "head")
+THROTTLE_STATUSES = (429, 503)
+REPORT_STATUSES = (200, 204, 301, 302, 401, 403)
+ANALYZE_BATCH = 256  # re-checked findings analyzed per analyzer.analyze_batch call
+RETRY_BASE, RETRY_CAP = 0.5, 10.0  # exponential backoff bounds, seconds
+EXTENSION_POLICIES = ("all", "hits")  # cross every word with exts_hint, or only words that hit (see mutations.py)
+
+class Fetched(NamedTuple):
+    status: int
+    size: Optional[int]
+    location: Optional[str]
+    snippet: bytes
+    retry_after: Optional[str] = None
+    read: int = 0  # body bytes received, drained ones included
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+def _fetched(r: aiohttp.ClientResponse, status: int, size: Optional[int], snippet: bytes) -> Fetched:
+    h = r.headers
+    return Fetched(status, size, h.get("Location"), snippet, h.get("Retry-After"), r.content.total_bytes,
+                   h.get("ETag"), h.get("Last-Modified"))
+
 def _rand_token(n=24) -> str:
     return "".join(random.choice(string.ascii_lowercase) for _ in range(n))
 
@@ -24,6 +59,46 @@ def _safe_urljoin(base, path) -> str:
     # urljoin expects a relative path (no accidental bytes), strip leading slashes handled by caller
     return _urljoin(b, p)
 
+def _declared_size(r: aiohttp.ClientResponse) -> Optional[int]:
+    """Full entity size from Content-Range (206/416) or Content-Length, if the server sent one."""
+    cr = r.headers.get("Content-Range")
+    if cr and "/" in cr:
+        total = cr.rsplit("/", 1)[1].strip()
+        if total.isdigit():
+            return int(total)
+    cl = r.headers.get("Content-Length")
+    if cl and cl.strip().isdigit() and r.status != 206:
+        return int(cl)
+    return None
+
+async def _read_capped(
+    r: aiohttp.ClientResponse, limit: int = SNIPPET_LIMIT, drain: int = MAX_DRAIN_BYTES
+) -> Tuple[bytes, Optional[int]]:
+    """
+    Read at most `limit` bytes of the body and work out its size without buffering it.
+    Size comes from the headers when present, otherwise from a drain capped at `drain`
+    bytes (the returned size is then a lower bound).
+    """
+    buf = bytearray()
+    while len(buf) < limit:
+        chunk = await r.content.read(limit - len(buf))
+        if not chunk:
+            break
+        buf += chunk
+    size = _declared_size(r)
+    if r.content.at_eof():
+        return bytes(buf), size if size is not None else len(buf)
+    rest_cap = drain if size is None else min(drain, KEEPALIVE_DRAIN)
+    if size is not None and size - len(buf) > rest_cap:
+        return bytes(buf), size  # big body: drop the connection instead of reading it
+    seen = len(buf)
+    while seen - len(buf) < rest_cap:
+        chunk = await r.content.read(min(1 << 16, rest_cap - (seen - len(buf))))
+        if not chunk:
+            break
+        seen += len(chunk)
+    return bytes(buf), size if size is not None else seen
+
 async def initial_probe(session: aiohttp.ClientSession, base: str) -> Tuple[str, Dict[str, str]]:
     try:
         async with session.get(_to_text(base), allow_redirects=True) as r:
@@ -33,15 +108,6 @@ async def initial_probe(session: aiohttp.ClientSession, base: str) -> Tuple[str,
     except Exception:
         return "", {}
 
-async def soft_404_baseline(session: aiohttp.ClientSession, base: str) -> Tuple[int, int]:
-    bogus = _safe_urljoin(_to_text(base), f"/{_rand_token(18)}/")
-    try:
-        async with session.get(bogus, allow_redirects=False) as r:
-            body = await r.read()
-            return r.status, len(body or b"")
-    except Exception:
-        return 404, 0
-
 class DirEnumerator:
     def __init__(
         self,
@@ -50,90 +116,355 @@ class DirEnumerator:
         max_concurrency: int = 64,
         timeout: int = 10,
         exts_hint: Optional[List[str]] = None,
+        body_mode: str = "stream",
+        adaptive: bool = False,
+        min_concurrency: int = 4,
+        max_retries: int = 2,
+        recursive: bool = False,
+        max_depth: int = 3,
+        depth_budget: int = 5000,
+        time_budget: Optional[float] = None,
+        request_budget: Optional[int] = None,
+        expand_extensions: str = "hits",
+        mutation_budget: int = 2000,
     ):
         self.base = _to_text(base).rstrip("/")
         self.follow_redirects = follow_redirects
-        self.sem = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max(1, int(max_concurrency))
         self.timeout = aiohttp.ClientTimeout(total=timeout)
         self.exts_hint = exts_hint or []
+        if body_mode not in BODY_MODES:
+            raise ValueError(f"unknown body_mode {body_mode!r}")
+        self.body_mode = body_mode
+        if expand_extensions not in EXTENSION_POLICIES:
+            raise ValueError(f"unknown expand_extensions {expand_extensions!r}")
+        self.expand_extensions = expand_extensions
+        self.mutation_budget = max(0, int(mutation_budget))
+        self.mutator = Mutator(self.exts_hint, all_exts=expand_extensions == "all") if self.mutation_budget else None
+        # Worker count is the upper bound; the limiter decides how many are in flight.
+        self.limiter = ConcurrencyLimiter(self.max_concurrency, min_concurrency, adaptive=adaptive)
+        self.max_retries = max(0, int(max_retries))
+        self.failed = 0
+        self.tested = 0
+        self.last_error: Optional[str] = None
+        self.recursive = recursive
+        self.max_depth = max_depth
+        self.depth_budget = depth_budget
+        self.frontier: Optional[Frontier] = None
+        self.time_budget = time_budget          # seconds of enumeration, then stop early
+        self.request_budget = request_budget    # paths tested, then stop early
+        self.stopped: Optional[str] = None      # which budget ended the scan, if any
+        self._issued = 0
+        self._deadline: Optional[float] = None
+        self.metrics = ScanMetrics()  # callers may swap in the job's own before run()
+
+    async def _fetch(self, session: aiohttp.ClientSession, url: str,
+                     headers: Optional[Dict[str, str]] = None) -> Fetched:
+        """
+        Fetch `url` according to body_mode, with extra request `headers` if given.
+        - stream: GET, read the first SNIPPET_LIMIT bytes only.
+        - range:  GET with `Range: bytes=0-2047`; 206/416 are reported as 200.
+        - head:   HEAD first, GET only when the analyzer needs the body.
+        """
+        redirects = self.follow_redirects
+        if self.body_mode == "head":
+            async with session.head(url, allow_redirects=redirects, headers=headers, timeout=self.timeout) as r:
+                if r.status not in (405, 501) and not analyzer.needs_body(r.status):
+                    return _fetched(r, r.status, _declared_size(r), b"")
+        if self.body_mode == "range":
+            ranged = {**(headers or {}), "Range": f"bytes=0-{SNIPPET_LIMIT - 1}", "Accept-Encoding": "identity"}
+            async with session.get(url, allow_redirects=redirects, headers=ranged, timeout=self.timeout) as r:
+                snippet, size = await _read_capped(r)
+                return _fetched(r, 200 if r.status in (206, 416) else r.status, size, snippet)
+        async with session.get(url, allow_redirects=redirects, headers=headers, timeout=self.timeout) as r:
+            snippet, size = await _read_capped(r)
+            return _fetched(r, r.status, size, snippet)
+
+    async def _fetch_with_retry(self, session: aiohttp.ClientSession, url: str,
+                                headers: Optional[Dict[str, str]] = None) -> Optional[Fetched]:
+        """
+        Fetch through the concurrency limiter, retrying timeouts, connection errors and
+        429/503 with jittered exponential backoff (or the server's Retry-After).
+        Returns None once retries are exhausted without any response.
+        """
+        res: Optional[Fetched] = None
+        m = self.metrics
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                m.retries += 1
+            queued = time.monotonic()
+            await self.limiter.acquire()
+            t0 = time.monotonic()
+            m.wait.observe(t0 - queued)
+            outcome, retry_after, got = "error", None, None
+            try:
+                res = got = await self._fetch(session, url, headers)
+                if res.status in THROTTLE_STATUSES:
+                    outcome, retry_after = "throttled", parse_retry_after(res.retry_after)
+                else:
+                    outcome = "ok"
+            except asyncio.TimeoutError:
+                outcome, self.last_error = "timeout", f"timeout: {url}"
+            except aiohttp.ClientError as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+            finally:
+                latency = time.monotonic() - t0
+                self.limiter.release(latency, outcome, retry_after)
+                m.observe_request(latency, outcome, got.status if got else None, got.read if got else 0)
+            if outcome == "ok":
+                return res
+            if attempt < self.max_retries:
+                backoff = min(RETRY_CAP, RETRY_BASE * 2 ** attempt) * random.uniform(0.5, 1.5)
+                await asyncio.sleep(max(backoff, retry_after or 0.0))
+        if res is None:
+            self.failed += 1
+            log.debug("Giving up on %s after %d attempts: %s", url, self.max_retries + 1, self.last_error)
+        return res  # a final 429/503 is still a real answer
 
     async def _check_one(
         self, session: aiohttp.ClientSession, path: str
-    ) -> Tuple[str, Optional[FoundItem], Optional[str]]:
+    ) -> Tuple[str, Optional[Hit], Optional[str]]:
+        """
+        Test one path. Only reportable statuses produce a Hit (and get analyzed);
+        misses and failures return None without allocating anything.
+        """
         try:
             path = _to_text(path)
             url = _safe_urljoin(self.base + "/", path.lstrip("/"))
 
-            async with self.sem:
-                async with session.get(url, allow_redirects=self.follow_redirects) as r:
-                    body = await r.read()
-                    loc = r.headers.get("Location")
-                    item = FoundItem(
-                        url=url,
-                        path=path,
-                        status=r.status,
-                        size=len(body) if body else None,
-                        redirected_to=loc,
-                    )
-                    snippet = (body[:2048] or b"").decode(errors="ignore")
-                    item.issues = analyzer.analyze_item(path, r.status, snippet)
-                    return path, item, snippet
+            res = await self._fetch_with_retry(session, url)
+            if res is None or res.status not in REPORT_STATUSES:
+                return path, None, None
+            snippet = res.snippet.decode(errors="ignore")
+            issues = analyzer.analyze_item(path, res.status, snippet)
+            return path, Hit(path, res.status, res.size or None, res.location, issues,
+                             res.etag, res.last_modified), snippet
 
-        except Exception:
-            # Return None item so the caller can keep going; details reported by caller
+        except Exception as e:
+            # Not a network failure (bad URL etc.): retrying will not help, count and move on
+            self.failed += 1
+            self.last_error = f"{type(e).__name__}: {e}"
             return _to_text(path), None, None
 
+    def wildcard_detector(self, session: aiohttp.ClientSession) -> WildcardDetector:
+        """Soft-404 detector whose calibration probes go through this enumerator's fetch policy."""
+        async def fetch(path: str):
+            url = _safe_urljoin(self.base + "/", path.lstrip("/"))
+            res = await self._fetch_with_retry(session, url)
+            return res[:4] if res else None
+        return WildcardDetector(fetch, exts=[_to_text(e) for e in self.exts_hint])
+
+    async def revalidate(self, session: aiohttp.ClientSession, known: Sequence[Hit],
+                         detector: WildcardDetector) -> Diff:
+        """
+        Re-request known findings with their validators (If-None-Match /
+        If-Modified-Since) and sort them into a Diff. A 304 is unchanged without a
+        body; any other answer is checked and analyzed like a fresh result and compared
+        with the old one (rescan.compare). Paths with no answer at all, or still
+        throttled or failing server-side (429/503, 5xx) after the retries, prove
+        nothing: they stay as they were, as `unverified`. Requests go through the
+        limiter like the scan's. Fresh answers are analyzed in batches of
+        ANALYZE_BATCH (analyzer.analyze_batch); the verdict does not depend on issues.
+        """
+        diff = Diff()
+        todo = iter(known)
+        pending: List[Tuple[Hit, str]] = []  # fresh hits waiting for their issues
+
+        def analyze_pending():
+            batch = pending[:]
+            pending.clear()
+            tags = analyzer.analyze_batch((h.path, h.status, snippet) for h, snippet in batch)
+            for (h, _), issues in zip(batch, tags):
+                h.issues = issues
+
+        async def worker():
+            for old in todo:
+                try:
+                    url = _safe_urljoin(self.base + "/", old.path.lstrip("/"))
+                    res = await self._fetch_with_retry(session, url, conditional_headers(old))
+                    if res is None or res.status in THROTTLE_STATUSES or res.status >= 500:
+                        diff.unverified.append(old)
+                        continue
+                    if res.status == 304:
+                        diff.unchanged.append(old)
+                        continue
+                    new = None
+                    if res.status in REPORT_STATUSES:
+                        snippet = res.snippet.decode(errors="ignore")
+                        if not await detector.is_soft404(old.path, res.status, res.size, res.location, snippet):
+                            new = Hit(old.path, res.status, res.size or None, res.location,
+                                      None, res.etag, res.last_modified)
+                            pending.append((new, snippet))
+                            if len(pending) >= ANALYZE_BATCH:
+                                analyze_pending()
+                    verdict = compare(old, new)
+                    if verdict == "changed":
+                        diff.changed.append((old, new))
+                    elif verdict == "removed":
+                        diff.removed.append(old)
+                    else:
+                        diff.unchanged.append(new)  # with the fresh validators
+                except Exception as e:
+                    self.failed += 1
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    diff.unverified.append(old)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.max_concurrency, len(known)))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        analyze_pending()
+        return diff
+
+    def limiter_stats(self) -> Dict:
+        return self.limiter.stats()
+
+    def checkpoint(self) -> Optional[int]:
+        """Root-stream cursor a resumed run can start from (see Frontier.checkpoint)."""
+        return self.frontier.checkpoint if self.frontier else None
+
+    def _budget_spent(self) -> bool:
+        if self.stopped is None:
+            if self.request_budget is not None and self._issued >= self.request_budget:
+                self.stopped = "request_budget"
+            elif self._deadline is not None and time.monotonic() >= self._deadline:
+                self.stopped = "time_budget"
+        return self.stopped is not None
+
+    def _expand(self, candidates: Iterable[str]) -> Iterator[str]:
+        """Lazily yield each candidate followed by its extension variants (expand_extensions="all")."""
+        exts = [_to_text(e) for e in self.exts_hint] if self.expand_extensions == "all" else []
+        for path in candidates:
+            path = _to_text(path)  # harden again
+            yield path
+            for ext in exts:
+                if not path.endswith(ext):
+                    yield path.rstrip("/") + ext
+
     async def run(
         self,
-        candidates: List[str],
+        candidates: Sequence[str],
         on_event: EventCb,
-        baseline: Tuple[int, int],
-    ) -> List[FoundItem]:
-        found: List[FoundItem] = []
-        try:
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                tasks = []
-                for path in candidates:
-                    path = _to_text(path)  # harden again
-                    plist = [path]
-                    for ext in self.exts_hint:
-                        ext = _to_text(ext)
-                        if not path.endswith(ext):
-                            plist.append(path.rstrip("/") + ext)
-                    for p in plist:
-                        tasks.append(asyncio.create_task(self._check_one(session, p)))
-
-                total = len(tasks) or 1
-                done_count = 0
-
-                for fut in asyncio.as_completed(tasks):
-                    try:
-                        _, item, _ = await fut
-                    except Exception:
-                        # Extremely rare: task-level exception; report and continue
-                        await on_event({"type": "error", "message": traceback.format_exc()})
-                        item = None
-
-                    done_count += 1
+        detector: Optional[WildcardDetector] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        start: int = 0,
+        known: Sequence[Hit] = (),
+        stride: Tuple[int, int] = (0, 1),
+        baselines: Optional[Dict] = None,
+        words: Optional[Sequence[str]] = None,
+        explore: Sequence[str] = (),
+        probed: Sequence[str] = (),
+    ) -> ResultColumns:
+        """
+        Stream candidates through a fixed pool of `max_concurrency` workers.
+        Paths are pulled from a lazy generator, so memory stays flat regardless of
+        list size and cancelling run() cancels every outstanding request.
+        In recursive mode, discovered directories go onto the Frontier and are
+        explored by the same workers once the root stream runs dry.
+        Pass the job's pooled `session` to reuse its warm connections; otherwise one
+        is leased from POOLS for the target's origin. Without a calibrated `detector`
+        one is created and calibrates directories lazily.
+        Kept findings are returned as compact ResultColumns.
+        To resume an interrupted scan pass the saved checkpoint() cursor as `start`
+        and its findings as `known`: their directories are queued again and they
+        are not reported a second time. `stride=(k, n)` restricts the root stream to
+        shard k of n (see shards.py).
+        Findings also queue their likely variants (backups, case, words from the
+        body; see mutations.py), up to `mutation_budget` extra requests.
+        With a time_budget or request_budget the workers stop taking new paths once it
+        is spent (in-flight requests still finish) and a budget_exhausted stage is
+        emitted; the checkpoint stays valid, so such a scan can be continued later.
+        Subdirectories are tried with `words` (default: the candidates). Directories
+        in `explore` are queued as if found, recursive mode or not, and paths in
+        `probed` are never requested (an incremental scan passes what it re-checked).
+        """
+        found = ResultColumns(self.base)
+        stream_factor = 1 + len(self.exts_hint) if self.expand_extensions == "all" else 1
+        frontier = Frontier(
+            candidates, candidates if words is None else words, self._expand,
+            recursive=self.recursive, max_depth=self.max_depth, depth_budget=self.depth_budget,
+            # an upper bound (candidates that already carry an extension skip it); the
+            # frontier corrects it once the root stream runs dry
+            root_total=len(range(stride[0], len(candidates) * stream_factor, stride[1])),
+            stream_factor=stream_factor,
+            skip=start,
+            stride=stride,
+            mutation_budget=self.mutation_budget,
+        )
+        self.frontier = frontier
+        known_paths = {h.path for h in known}
+        for h in known:
+            frontier.discover(h.path, h.status, h.redirected_to)
+        frontier.skip(probed)
+        for d in explore:
+            frontier.explore(d)
+        done_count = len(range(stride[0], start, stride[1]))
+        if self.time_budget is not None:
+            self._deadline = time.monotonic() + self.time_budget
 
+        async def worker(session: aiohttp.ClientSession):
+            nonlocal done_count
+            while True:
+                if self._budget_spent():
+                    return
+                p = await frontier.next()
+                if p is None:
+                    return
+                self._issued += 1
+                completed = False  # a cancelled request must not advance the checkpoint
+                try:
+                    _, item, snippet = await self._check_one(session, p)
+                    if item and await detector.is_soft404(
+                        item.path, item.status, item.size, item.redirected_to, snippet or ""
+                    ):
+                        item = None  # probable soft-404 / wildcard response
                     if item:
-                        bl_status, bl_size = baseline
-                        if (
-                            bl_status == 200
-                            and item.status == 200
-                            and item.size is not None
-                            and bl_size
-                            and abs(item.size - bl_size) <= max(250, int(0.15 * bl_size))
-                        ):
-                            pass  # probable soft-404
-                        else:
-                            found.append(item)
-
-                        if item.status in (200, 204, 301, 302, 401, 403):
-                            await on_event({"type": "found", "item": item.model_dump()})
-
-                    await on_event({"type": "progress", "value": done_count / total})
+                        frontier.discover(item.path, item.status, item.redirected_to)
+                        if self.mutator:
+                            frontier.mutate(self.mutator.mutations(
+                                item.path, item.status, item.redirected_to, snippet or ""))
+                    completed = True
+                except Exception:
+                    # Extremely rare: worker-level exception; report and continue
+                    completed = True
+                    await on_event({"type": "error", "message": traceback.format_exc()})
+                    item = None
+                finally:
+                    frontier.task_done(p, completed)
+
+                done_count += 1
+                self.tested += 1
 
+                if item and item.path not in known_paths:
+                    found.append(item)
+                    await on_event({"type": "found", "item": item.to_item(self.base).model_dump()})
+
+                await on_event({"type": "progress", "value": min(1.0, done_count / (frontier.total or 1))})
+
+        try:
+            async with contextlib.AsyncExitStack() as stack:
+                if session is None:
+                    session = await stack.enter_async_context(POOLS.session(self.base, self.max_concurrency))
+                if detector is None:
+                    detector = self.wildcard_detector(session)
+                if baselines:
+                    detector.seed(baselines)
+                workers = [asyncio.create_task(worker(session)) for _ in range(self.max_concurrency)]
+                try:
+                    await asyncio.gather(*workers)
+                finally:
+                    for w in workers:
+                        w.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+            if self.failed:
+                await on_event({"type": "stage", "stage": "enumeration_failures",
+                                "failed": self.failed, "last_error": self.last_error})
+            if self.stopped:
+                await on_event({"type": "stage", "stage": "budget_exhausted",
+                                "reason": self.stopped, "tested": self.tested})
         except Exception:
             # Surface any unexpected error during run()
             await on_event({"type": "error", "message": traceback.format_exc()})
@@ -0,0 +1,222 @@
+import asyncio, logging, math, multiprocessing as mp, os, queue, traceback
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import aiohttp
+
+from .frontier import as_directory
+from .models import Hit, ResultColumns
+from .pool import POOLS
+from .scanner import DirEnumerator, EventCb
+from .soft404 import WildcardDetector
+
+log = logging.getLogger("dirgraph.shards")
+
+SEND_INTERVAL = 0.1   # seconds between a shard's result messages
+POLL = 0.25           # parent's queue poll, also how quickly a dead shard is noticed
+STOP_GRACE = 5.0      # seconds a stopped shard gets to report before it is terminated
+
+def max_shards() -> int:
+    """Cores this process may run on (affinity-aware where the OS tells us)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+def _owner(hit: Hit, n: int) -> int:
+    """Shard that re-explores a known finding's directory on resume."""
+    return _dir_owner(as_directory(hit.path, hit.status, hit.redirected_to) or hit.path, n)
+
+def _dir_owner(d: str, n: int) -> int:
+    return sum(d.encode()) % n
+
+def _shard_main(spec: Dict[str, Any], out, stop):
+    # Entry point of a worker process: own event loop, own connection pool.
+    k = spec["stride"][0]
+    try:
+        asyncio.run(_run_shard(spec, out, stop))
+    except Exception:
+        out.put(("batch", k, [], [{"type": "error", "message": traceback.format_exc()}], 1.0, 0, 0, None, None, None))
+        out.put(("done", k, {}))
+
+async def _run_shard(spec: Dict[str, Any], out, stop):
+    k = spec["stride"][0]
+    enumerator = DirEnumerator(spec["base"], **spec["options"])
+    enumerator.limiter.shared_pause = spec["pause"]
+    found: List[Dict] = []
+    events: List[Dict] = []
+    progress = 0.0
+
+    async def on_event(ev: Dict):
+        nonlocal progress
+        t = ev.get("type")
+        if t == "found":
+            found.append(ev["item"])
+        elif t == "progress":
+            progress = ev.get("value") or 0.0
+        elif ev.get("stage") not in ("enumeration_failures", "budget_exhausted"):  # the parent reports these once
+            events.append(ev)
+
+    def send():
+        nonlocal found, events
+        fr = enumerator.frontier
+        out.put(("batch", k, found, events, progress, fr.total if fr else 0, enumerator.tested,
+                 enumerator.checkpoint(), enumerator.metrics.state(), enumerator.limiter.stats()))
+        found, events = [], []
+
+    scan = asyncio.create_task(enumerator.run(
+        spec["candidates"], on_event, baselines=spec["baselines"],
+        start=spec["start"], known=spec["known"], stride=spec["stride"],
+        words=spec["words"], explore=spec["explore"], probed=spec["probed"]))
+    try:
+        while not scan.done():
+            await asyncio.wait({scan}, timeout=SEND_INTERVAL)
+            if stop.is_set():
+                scan.cancel()
+                await asyncio.gather(scan, return_exceptions=True)
+            send()
+    finally:
+        send()
+        await POOLS.close()
+        out.put(("done", k, {"failed": enumerator.failed, "last_error": enumerator.last_error,
+                             "stopped": enumerator.stopped, "limiter": enumerator.limiter.stats()}))
+
+class ShardedEnumerator(DirEnumerator):
+    """
+    DirEnumerator whose run() spreads the scan over `shards` worker processes.
+
+    Shard k takes root-stream paths i with i % shards == k (interleaved, so the most
+    likely words are spread evenly) and runs its own loop, connection pool and
+    DirEnumerator: fetching, soft-404 checks and analysis all happen there. The
+    corpus is re-mapped by each process, not copied. Concurrency is split evenly
+    and Retry-After pauses are shared, so together the shards stay within
+    `max_concurrency`; the soft-404 baselines calibrated here seed every shard.
+    Findings come back in batches over one queue and are re-emitted as ordinary
+    events, so callers see the same stream as from DirEnumerator.run().
+    In recursive mode a shard explores the directories it found itself, with the
+    full word list. A request_budget is split evenly too; a time_budget applies to
+    each shard as is. Each batch also carries the shard's request metrics and
+    limiter state, merged into this enumerator's metrics and limiter_stats().
+    """
+
+    def __init__(self, base: str, shards: int = 2, **options):
+        super().__init__(base, **options)
+        self.shards = max(1, min(int(shards), max_shards()))
+        self._options = {**options,
+                         "max_concurrency": math.ceil(self.max_concurrency / self.shards),
+                         "min_concurrency": math.ceil(options.get("min_concurrency", 4) / self.shards)}
+        if self.request_budget is not None:
+            self._options["request_budget"] = math.ceil(self.request_budget / self.shards)
+        self._checkpoints: Dict[int, Optional[int]] = {}
+        self._tested: Dict[int, int] = {}
+        self._limiters: Dict[int, Dict] = {}
+
+    def limiter_stats(self) -> Dict:
+        """The shards' limiters added up (latency percentiles: the worst shard's)."""
+        shards = list(self._limiters.values())
+        if not shards:
+            return self.limiter.stats()
+        return {k: (max if k.endswith("_ms") else sum)(s[k] for s in shards) for k in shards[0]}
+
+    def checkpoint(self) -> Optional[int]:
+        cps = self._checkpoints
+        if len(cps) < self.shards or any(c is None for c in cps.values()):
+            return None
+        return min(cps.values())
+
+    async def run(
+        self,
+        candidates: Sequence[str],
+        on_event: EventCb,
+        detector: Optional[WildcardDetector] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        start: int = 0,
+        known: Sequence[Hit] = (),
+        stride: Tuple[int, int] = (0, 1),
+        baselines: Optional[Dict] = None,
+        words: Optional[Sequence[str]] = None,
+        explore: Sequence[str] = (),
+        probed: Sequence[str] = (),
+    ) -> ResultColumns:
+        ctx = mp.get_context("spawn")  # fork would copy the running loop, threads and sockets
+        out, stop = ctx.Queue(), ctx.Event()
+        pause = ctx.Value("d", 0.0, lock=False)
+        n = self.shards
+        seeds = detector.export() if detector else baselines
+        procs = []
+        for k in range(n):
+            spec = {"base": self.base, "options": self._options, "candidates": candidates,
+                    "baselines": seeds, "pause": pause, "start": start, "stride": (k, n),
+                    "known": [h for h in known if _owner(h, n) == k], "words": words,
+                    "explore": [d for d in explore if _dir_owner(d, n) == k], "probed": list(probed)}
+            p = ctx.Process(target=_shard_main, args=(spec, out, stop), daemon=True, name=f"dirgraph-shard-{k}")
+            p.start()
+            procs.append(p)
+        log.info("Started %d shards (concurrency %d each)", n, self._options["max_concurrency"])
+
+        found = ResultColumns(self.base)
+        reported: Set[str] = {h.path for h in known}
+        progress: Dict[int, Tuple[float, int]] = {}
+        finished: Set[int] = set()
+        try:
+            while len(finished) < n:
+                try:
+                    msg = await asyncio.to_thread(out.get, True, POLL)
+                except queue.Empty:
+                    dead = [k for k, p in enumerate(procs) if not p.is_alive() and k not in finished]
+                    if dead and out.empty():
+                        raise RuntimeError(f"shard(s) {dead} exited without reporting")
+                    continue
+                kind, k = msg[0], msg[1]
+                if kind == "done":
+                    finished.add(k)
+                    self.failed += msg[2].get("failed", 0)
+                    self.last_error = msg[2].get("last_error") or self.last_error
+                    self.stopped = msg[2].get("stopped") or self.stopped
+                    continue
+                _, _, items, events, value, total, tested, cp, mstate, lstate = msg
+                if mstate is not None:
+                    self.metrics.absorb(k, mstate)
+                    self._limiters[k] = lstate
+                for ev in events:
+                    await on_event(ev)
+                for item in items:
+                    if item["path"] in reported:
+                        continue  # same directory reached from two shards
+                    reported.add(item["path"])
+                    found.append(Hit.from_item(item))
+                    await on_event({"type": "found", "item": item})
+                # Only now: the checkpoint covers these findings, which are recorded above.
+                self._checkpoints[k] = cp
+                self._tested[k] = tested
+                self.tested = sum(self._tested.values())
+                progress[k] = (value, total)
+                all_total = sum(t for _, t in progress.values())
+                if all_total:
+                    await on_event({"type": "progress",
+                                    "value": sum(v * t for v, t in progress.values()) / all_total})
+            if self.failed:
+                await on_event({"type": "stage", "stage": "enumeration_failures",
+                                "failed": self.failed, "last_error": self.last_error})
+            if self.stopped:
+                await on_event({"type": "stage", "stage": "budget_exhausted",
+                                "reason": self.stopped, "tested": self.tested})
+        except Exception:
+            await on_event({"type": "error", "message": traceback.format_exc()})
+        finally:
+            stop.set()
+            await asyncio.to_thread(_drain_and_join, out, procs)
+        return found
+
+def _drain_and_join(out, procs: List[mp.Process]):
+    # A child blocks on exit until its queued messages reach the pipe, so keep reading.
+    # Late batches are dropped: their checkpoint must not get ahead of what was recorded.
+    for p in procs:
+        for _ in range(int(STOP_GRACE / 0.05)):
+            try:
+                while True: out.get_nowait()
+            except queue.Empty:
+                pass
+            p.join(0.05)
+            if not p.is_alive():
+                break
+        else:
+            p.terminate()
@@ -0,0 +1,184 @@
+import asyncio, hashlib, logging, random, re, string
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+log = logging.getLogger("dirgraph.soft404")
+
+# fetch(path) -> (status, size, location, snippet) or None when the request failed
+Fetch = Callable[[str], Awaitable[Optional[Tuple[int, Optional[int], Optional[str], bytes]]]]
+
+MAX_DIRS = 256         # per-directory calibration cap; deeper dirs fall back to their nearest calibrated parent
+SIMHASH_DISTANCE = 3   # max differing bits for two bodies to count as the same template
+SIZE_SLACK = 64        # bytes of jitter tolerated on top of the spread seen across samples
+
+_WORD = re.compile(r"\w+")
+_NUM = re.compile(r"\d+")
+_HEXTOK = re.compile(r"\b[0-9a-f]{16,}\b")  # session ids, csrf tokens, cache busters
+_WS = re.compile(r"\s+")
+
+def _rand_token(n=12) -> str:
+    return "".join(random.choice(string.ascii_lowercase) for _ in range(n))
+
+def parent_dir(path: str) -> str:
+    """'/a/b' -> '/a/', '/a/' -> '/', '/a' -> '/'."""
+    p = "/" + path.strip("/")
+    return p[: p.rfind("/") + 1] or "/"
+
+def _reflections(path: str) -> List[str]:
+    """Forms of the requested path a page may echo back; short ones are left alone."""
+    seg = path.rstrip("/").rsplit("/", 1)[-1]
+    out = {path, path.strip("/"), seg, seg.rsplit(".", 1)[0]}
+    return sorted((x.lower() for x in out if len(x) >= 3), key=len, reverse=True)
+
+def normalize(text: str, path: str) -> str:
+    low = text.lower()
+    for r in _reflections(path):
+        low = low.replace(r, "")
+    low = _HEXTOK.sub("", low)
+    low = _NUM.sub("0", low)
+    return _WS.sub(" ", low).strip()
+
+def simhash(text: str) -> int:
+    """64-bit simhash over word tokens."""
+    weights = [0] * 64
+    for w in _WORD.findall(text):
+        h = int.from_bytes(hashlib.blake2b(w.encode(), digest_size=8).digest(), "little")
+        for i in range(64):
+            weights[i] += 1 if (h >> i) & 1 else -1
+    return sum(1 << i for i in range(64) if weights[i] > 0)
+
+class Fingerprint(NamedTuple):
+    status: int
+    size: Optional[int]
+    words: int
+    lines: int
+    simhash: int
+    location: Optional[str]  # redirect target with the requested path stripped
+
+def fingerprint(path: str, status: int, size: Optional[int], location: Optional[str], snippet: str) -> Fingerprint:
+    norm = normalize(snippet, path)
+    loc = normalize(location, path) if location else None
+    return Fingerprint(status, size, len(_WORD.findall(norm)), snippet.count("\n"), simhash(norm) if norm else 0, loc)
+
+class _Baseline:
+    """Samples of one (directory, status) pair plus precomputed lookups."""
+
+    def __init__(self):
+        self.samples: List[Fingerprint] = []
+        self.hashes: Set[int] = set()
+        self.locations: Set[str] = set()
+        self.shapes: Set[Tuple[int, int]] = set()  # (words, lines)
+        self.min_size: Optional[int] = None
+        self.max_size: Optional[int] = None
+
+    def add(self, fp: Fingerprint):
+        self.samples.append(fp)
+        if fp.simhash:
+            self.hashes.add(fp.simhash)
+            self.shapes.add((fp.words, fp.lines))
+        if fp.location:
+            self.locations.add(fp.location)
+        if fp.size is not None:
+            self.min_size = fp.size if self.min_size is None else min(self.min_size, fp.size)
+            self.max_size = fp.size if self.max_size is None else max(self.max_size, fp.size)
+
+    def _size_close(self, size: Optional[int]) -> bool:
+        if size is None or self.min_size is None:
+            return True
+        slack = (self.max_size - self.min_size) + SIZE_SLACK
+        return self.min_size - slack <= size <= self.max_size + slack
+
+    def matches(self, fp: Fingerprint) -> bool:
+        if fp.location and fp.location in self.locations:
+            return True  # catch-all redirect
+        if not fp.simhash:
+            # No body to compare (HEAD mode, empty page): size is all we have.
+            return not self.hashes and fp.size is not None and self.min_size is not None and self._size_close(fp.size)
+        if not self._size_close(fp.size):
+            return False
+        if fp.simhash in self.hashes:
+            return True
+        if (fp.words, fp.lines) in self.shapes and len(self.samples) > 1:
+            return True
+        return any(bin(fp.simhash ^ h).count("1") <= SIMHASH_DISTANCE for h in self.hashes)
+
+class WildcardDetector:
+    """
+    Soft-404 / wildcard detection with per-directory baselines.
+
+    Each directory is calibrated lazily (the first time one of its responses needs
+    judging) with several random probes of different shapes. Responses are compared
+    against the samples with the same status by normalized-content simhash, word/line
+    shape, size spread and redirect target; baselines are small per-status sets, so a
+    comparison costs O(1).
+    """
+
+    def __init__(self, fetch: Fetch, exts: Optional[List[str]] = None, samples_per_shape: int = 1):
+        self.fetch = fetch
+        self.exts = exts or []
+        self.samples_per_shape = samples_per_shape
+        self._dirs: Dict[str, Dict[int, _Baseline]] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def _shapes(self, directory: str) -> List[str]:
+        ext = self.exts[0] if self.exts else ".html"
+        shapes = []
+        for _ in range(self.samples_per_shape):
+            tok = _rand_token()
+            shapes += [f"{directory}{tok}", f"{directory}{tok}/", f"{directory}{tok}{ext}", f"{directory}.{tok}"]
+        return shapes
+
+    async def calibrate(self, directory: str = "/") -> Dict[int, _Baseline]:
+        if directory in self._dirs:
+            return self._dirs[directory]
+        if directory in self._pending:
+            return await asyncio.shield(self._pending[directory])
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[directory] = fut
+        try:
+            by_status: Dict[int, _Baseline] = {}
+            shapes = self._shapes(directory)
+            results = await asyncio.gather(*(self.fetch(p) for p in shapes), return_exceptions=True)
+            for p, res in zip(shapes, results):
+                if not res or isinstance(res, BaseException):
+                    continue
+                status, size, loc, body = res
+                text = body.decode("utf-8", "ignore") if isinstance(body, (bytes, bytearray)) else str(body or "")
+                by_status.setdefault(status, _Baseline()).add(fingerprint(p, status, size, loc, text))
+            self._dirs[directory] = by_status
+            log.info("Soft-404 baseline for %s: %s", directory,
+                     {s: len(b.samples) for s, b in by_status.items()})
+            fut.set_result(by_status)
+            return by_status
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved; waiters re-raise it themselves
+            raise
+        finally:
+            self._pending.pop(directory, None)
+
+    def export(self) -> Dict[str, Dict[int, _Baseline]]:
+        """Calibrated baselines by directory (picklable), to seed detectors elsewhere."""
+        return dict(self._dirs)
+
+    def seed(self, baselines: Dict[str, Dict[int, _Baseline]]):
+        """Adopt baselines calibrated by another detector instead of probing again."""
+        self._dirs.update(baselines)
+
+    async def _baselines_for(self, path: str) -> Dict[int, _Baseline]:
+        d = parent_dir(path)
+        if d in self._dirs or d in self._pending or len(self._dirs) < MAX_DIRS:
+            return await self.calibrate(d)
+        while d != "/" and d not in self._dirs:
+            d = parent_dir(d)
+        return self._dirs.get(d) or await self.calibrate("/")
+
+    async def is_soft404(self, path: str, status: int, size: Optional[int], location: Optional[str], snippet: str) -> bool:
+        baselines = await self._baselines_for(path)
+        bl = baselines.get(status)
+        if bl is None:
+            return False
+        return bl.matches(fingerprint(path, status, size, location, snippet))
+
+    def summary(self) -> Dict[str, Dict[int, int]]:
+        """Calibrated directories and, per status, how many samples their baseline holds."""
+        return {d: {s: len(b.samples) for s, b in bs.items()} for d, bs in self._dirs.items()}
@@ -0,0 +1,351 @@
+import asyncio, json, os, sqlite3, time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from .wordlists import DATA
+
+DB_ENV = "DIRGRAPH_DB"
+DB_PATH = DATA / "jobs.sqlite3"
+FLUSH_INTERVAL = 0.5        # seconds between batched writes of a running job
+FLUSH_MAX = 256             # pending events that force an early write
+BACKLOG_MAX = 4 * FLUSH_MAX  # unwritten frames + findings at which put() waits for the writer
+SUBSCRIBER_QUEUE_MAX = 256  # live frames buffered per observer before it falls back to the log
+REPLAY_CHUNK = 500
+
+RESUMABLE_STATES = ("interrupted", "canceled", "error")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    request TEXT NOT NULL,
+    state TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    cursor INTEGER NOT NULL DEFAULT 0,
+    tested INTEGER NOT NULL DEFAULT 0,
+    meta TEXT,
+    summary TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS findings (
+    job_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    size INTEGER,
+    redirected_to TEXT,
+    issues TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    PRIMARY KEY (job_id, path)
+) WITHOUT ROWID;
+"""
+# Columns added since the first release, with their types; _conn() adds them to older databases.
+MIGRATIONS = {"findings": {"etag": "TEXT", "last_modified": "TEXT"}}
+
+# path, status, size, redirected_to, issues json, etag, last_modified
+Finding = Tuple[str, int, Optional[int], Optional[str], str, Optional[str], Optional[str]]
+
+class JobStore:
+    """
+    SQLite (WAL) store of jobs, their event log and their findings.
+
+    Every statement runs on one dedicated thread, so the connection is never shared
+    across threads and the event loop never blocks on disk. Writers hand over whole
+    batches (write()), which land in a single transaction.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or os.environ.get(DB_ENV) or DB_PATH)
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobstore")
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(self.path), check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")  # WAL keeps this crash-safe; only the last batch can be lost
+            db.executescript(SCHEMA)
+            for table, cols in MIGRATIONS.items():
+                have = {r[1] for r in db.execute(f"PRAGMA table_info({table})")}
+                for col, kind in cols.items():
+                    if col not in have:
+                        db.execute(f"ALTER TABLE {table} ADD COLUMN {col} {kind}")
+            db.row_factory = sqlite3.Row
+            self._db = db
+        return self._db
+
+    async def _run(self, fn: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+
+    # -- sync side, store thread only --------------------------------------------------
+
+    def _create(self, job_id: str, request: str):
+        now = time.time()
+        with self._conn() as db:
+            db.execute("INSERT INTO jobs (id, request, state, created, updated) VALUES (?, ?, 'running', ?, ?)",
+                       (job_id, request, now, now))
+
+    def _write(self, job_id: str, events: List[Tuple[int, str]], findings: List[Finding],
+               cursor: Optional[int], tested: Optional[int]):
+        with self._conn() as db:
+            if events:
+                db.executemany("INSERT OR IGNORE INTO events (job_id, seq, body) VALUES (?, ?, ?)",
+                               [(job_id, seq, body) for seq, body in events])
+            if findings:
+                db.executemany("INSERT OR REPLACE INTO findings"
+                               " (job_id, path, status, size, redirected_to, issues, etag, last_modified)"
+                               " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [(job_id, *f) for f in findings])
+            if cursor is not None:
+                db.execute("UPDATE jobs SET cursor = ?, tested = ?, updated = ? WHERE id = ?",
+                           (cursor, tested or 0, time.time(), job_id))
+
+    def _update(self, job_id: str, fields: Dict[str, Any]):
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._conn() as db:
+            db.execute(f"UPDATE jobs SET {cols}, updated = ? WHERE id = ?",
+                       (*fields.values(), time.time(), job_id))
+
+    def _get(self, job_id: str) -> Optional[Dict]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def _jobs(self, limit: int) -> List[Dict]:
+        rows = self._conn().execute(
+            "SELECT j.*, (SELECT COUNT(*) FROM findings f WHERE f.job_id = j.id) AS findings"
+            " FROM jobs j ORDER BY created DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def _events(self, job_id: str, since: int, limit: int, until: Optional[int]) -> List[Tuple[int, str]]:
+        rows = self._conn().execute(
+            "SELECT seq, body FROM events WHERE job_id = ? AND seq >= ? AND seq < ? ORDER BY seq LIMIT ?",
+            (job_id, since, until if until is not None else 1 << 62, limit)).fetchall()
+        return [(r[0], r[1]) for r in rows]
+
+    def _next_seq(self, job_id: str) -> int:
+        row = self._conn().execute("SELECT MAX(seq) FROM events WHERE job_id = ?", (job_id,)).fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def _findings(self, job_id: str) -> List[Finding]:
+        rows = self._conn().execute(
+            "SELECT path, status, size, redirected_to, issues, etag, last_modified FROM findings WHERE job_id = ?",
+            (job_id,)).fetchall()
+        return [tuple(r) for r in rows]
+
+    def _interrupt_running(self) -> List[str]:
+        with self._conn() as db:
+            ids = [r[0] for r in db.execute("SELECT id FROM jobs WHERE state = 'running'")]
+            db.execute("UPDATE jobs SET state = 'interrupted', updated = ? WHERE state = 'running'", (time.time(),))
+        return ids
+
+    def _close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    # -- async API ------------------------------------------------------------------
+
+    async def create(self, job_id: str, request: str):
+        await self._run(self._create, job_id, request)
+
+    async def write(self, job_id: str, events: List[Tuple[int, str]], findings: List[Finding],
+                    cursor: Optional[int] = None, tested: Optional[int] = None):
+        await self._run(self._write, job_id, events, findings, cursor, tested)
+
+    async def update(self, job_id: str, **fields):
+        await self._run(self._update, job_id, fields)
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        return await self._run(self._get, job_id)
+
+    async def jobs(self, limit: int = 50) -> List[Dict]:
+        return await self._run(self._jobs, limit)
+
+    async def events(self, job_id: str, since: int = 0, limit: int = REPLAY_CHUNK,
+                     until: Optional[int] = None) -> List[Tuple[int, str]]:
+        return await self._run(self._events, job_id, since, limit, until)
+
+    async def next_seq(self, job_id: str) -> int:
+        return await self._run(self._next_seq, job_id)
+
+    async def findings(self, job_id: str) -> List[Finding]:
+        return await self._run(self._findings, job_id)
+
+    async def interrupt_running(self) -> List[str]:
+        """Mark jobs left 'running' by a previous process as 'interrupted' (resumable)."""
+        return await self._run(self._interrupt_running)
+
+    async def close(self):
+        await self._run(self._close)
+
+def finding_row(item: Dict) -> Finding:
+    return (str(item["path"]), int(item["status"]), item.get("size"), item.get("redirected_to"),
+            json.dumps(item.get("issues") or []), item.get("etag"), item.get("last_modified"))
+
+class _Subscriber:
+    __slots__ = ("queue", "start", "lagged")
+
+    def __init__(self, start: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_MAX)
+        self.start = start  # first seq this subscriber receives live
+        self.lagged = False
+
+class JobLog:
+    """
+    Live side of one running job: numbers its frames, fans them out to every
+    subscriber and writes them, with new findings and the scan cursor, to the store
+    in batches (every FLUSH_INTERVAL or FLUSH_MAX frames). Publishing never waits on
+    observers; one that falls SUBSCRIBER_QUEUE_MAX frames behind is switched back to
+    reading the stored log until it has caught up. It does wait on the store: put()
+    holds its producer once BACKLOG_MAX frames and findings are unwritten, so a stalled
+    disk slows the scan instead of growing memory.
+    """
+
+    def __init__(self, store: JobStore, job_id: str, start_seq: int = 0):
+        self.store = store
+        self.job_id = job_id
+        self.seq = start_seq
+        self.closed = False
+        # () -> (cursor, tested) or None; sampled at each write
+        self.checkpoint_fn: Optional[Callable[[], Optional[Tuple[int, int]]]] = None
+        self._events: List[Tuple[int, str]] = []
+        self._findings: List[Finding] = []
+        self._subs: List[_Subscriber] = []
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._flushed = asyncio.Event()
+        self._finished = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._writer())
+
+    async def _writer(self):
+        while not self.closed:
+            try:
+                await asyncio.wait_for(self._wake.wait(), FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def publish(self, ev: Dict) -> int:
+        seq = self.seq
+        self.seq += 1
+        body = json.dumps({**ev, "seq": seq})
+        self._events.append((seq, body))
+        for sub in self._subs:
+            self._offer(sub, (seq, body))
+        if len(self._events) >= FLUSH_MAX:
+            self._wake.set()
+        return seq
+
+    async def put(self, ev: Dict) -> int:
+        """publish(), then wait while the store is BACKLOG_MAX frames and findings behind."""
+        seq = self.publish(ev)
+        while len(self._events) + len(self._findings) >= BACKLOG_MAX and not self.closed:
+            if self._task is None or self._task.done():
+                await self.flush()  # no writer running: write inline
+                continue
+            self._flushed.clear()
+            self._wake.set()
+            await self._flushed.wait()
+        return seq
+
+    @staticmethod
+    def _offer(sub: _Subscriber, item: Optional[Tuple[int, str]]):
+        if sub.lagged:
+            return
+        try:
+            sub.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            sub.lagged = True
+
+    def stats(self) -> Dict[str, int]:
+        """Frames and findings not yet written, and how far behind the live observers are."""
+        return {"unwritten_frames": len(self._events), "unwritten_findings": len(self._findings),
+                "subscribers": len(self._subs),
+                "subscriber_backlog": sum(s.queue.qsize() for s in self._subs if not s.lagged)}
+
+    def record_finding(self, item: Dict):
+        self._findings.append(finding_row(item))
+
+    async def flush(self):
+        async with self._lock:
+            events, self._events = self._events, []
+            findings, self._findings = self._findings, []
+            cp = self.checkpoint_fn() if self.checkpoint_fn else None
+            try:
+                if events or findings or cp:
+                    await self.store.write(self.job_id, events, findings, *(cp or (None, None)))
+            finally:
+                self._flushed.set()  # a failed write must not leave put() waiting forever
+
+    async def aclose(self, state: str, **fields):
+        """Final write, record the outcome and release every subscriber."""
+        self.closed = True
+        self._wake.set()
+        if self._task:
+            await self._task
+            self._task = None
+        await self.flush()
+        await self.store.update(self.job_id, state=state, **fields)
+        for sub in self._subs:
+            self._offer(sub, None)
+        self._finished.set()
+
+    async def wait_closed(self):
+        await self._finished.wait()
+
+    def attach(self) -> _Subscriber:
+        sub = _Subscriber(self.seq)
+        self._subs.append(sub)
+        return sub
+
+    def detach(self, sub: _Subscriber):
+        if sub in self._subs:
+            self._subs.remove(sub)
+
+async def subscribe(store: JobStore, job_id: str, offset: int = 0,
+                    live: Optional[JobLog] = None) -> AsyncIterator[str]:
+    """
+    Frames of a job from seq `offset` on, as JSON text: the stored log first, then
+    live frames while the job runs. Ends when the job does.
+    """
+    nxt = max(0, offset)
+    while True:
+        if live is not None and live.closed:
+            await live.wait_closed()  # its last frames are being written
+        sub = live.attach() if live is not None and not live.closed else None
+        if sub is not None:
+            await live.flush()  # everything before sub.start is in the store now
+        until = sub.start if sub is not None else None
+        while until is None or nxt < until:
+            rows = await store.events(job_id, nxt, REPLAY_CHUNK, until)
+            if not rows:
+                break
+            for seq, body in rows:
+                yield body
+                nxt = seq + 1
+        if sub is None:
+            return
+        try:
+            while True:
+                item = await sub.queue.get()
+                if item is None:
+                    return
+                seq, body = item
+                if seq >= nxt:
+                    yield body
+                    nxt = seq + 1
+                if sub.lagged and sub.queue.empty():
+                    break  # dropped frames since; catch up from the store and re-attach
+        finally:
+            live.detach(sub)
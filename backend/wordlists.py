@@ -1,18 +1,27 @@
-import asyncio, zipfile
+import asyncio, fnmatch, json, os, shutil, threading, time, weakref, zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional, Callable, Any
+from typing import Dict, List, Sequence, Tuple, Optional, Callable, Any
 import aiohttp
 import logging
 
+from .corpus import load_corpus
+from .metrics import METRICS
+
 log = logging.getLogger("dirgraph.wordlists")
 
 # Pinned SecLists commit
 SECLISTS_COMMIT = "617ecd9393ecd12925bde2467201c51e6baa7cdb"
+SECLISTS_ZIP_URL = f"https://codeload.github.com/danielmiessler/SecLists/zip/{SECLISTS_COMMIT}"
 
 BASE = Path(__file__).resolve().parent.parent
-DATA = BASE / "data"
+DATA_ENV = "DIRGRAPH_DATA"  # relocates wordlists, corpus cache, job store and hit statistics
+DATA = Path(os.environ.get(DATA_ENV) or BASE / "data")
 SECLISTS_DIR = DATA / "SecLists"
 WEB_CONTENT_DIR = SECLISTS_DIR / "Discovery" / "Web-Content"
+CORPUS_DIR = DATA / "corpus"
+MANIFEST = DATA / "wordlists.manifest.json"
+REVALIDATE_EVERY = 5.0  # seconds between mtime checks of the indexed tree
 
 # First-run subset (expand if you want more)
 WANTED_PATTERNS = [
@@ -32,114 +41,337 @@ BUILTIN_CANDIDATES = [
 
 EventCb = Callable[[Dict[str, Any]], None]
 
-def _txt_count() -> int:
-    return sum(1 for _ in WEB_CONTENT_DIR.rglob("*.txt")) if WEB_CONTENT_DIR.exists() else 0
+# Offline bootstrap: point this at a SecLists zip, a SecLists checkout or a Web-Content dir.
+SECLISTS_SOURCE_ENV = "DIRGRAPH_SECLISTS_SOURCE"
+WEB_CONTENT_REL = "Discovery/Web-Content/"
+EXTRACT_WORKERS = 4
+_BOOTSTRAP_LOCKS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+def _category(p: Path) -> Optional[str]:
+    name = p.name.lower()
+    posix = p.as_posix().lower()
+    if name.startswith("directory-list"):
+        return "base"
+    if name.startswith("raft-") and "directories" in name:
+        return "raft"
+    if "/cms/" in posix:
+        return "cms"
+    if "/svndigger/" in posix:
+        return "svn"
+    return None
+
+def _count_lines(p: Path) -> int:
+    n = 0
+    with p.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            n += chunk.count(b"\n")
+    return n
 
-async def ensure_seclists(on_event: Optional[EventCb] = None):
+class WordlistIndex:
     """
-    Ensure the SecLists Web-Content subtree exists locally.
-    On first run, download the repo zip and extract only Web-Content.
-    If extraction yields no .txt files, raise an error so the caller can fallback or report.
+    Persistent catalog of the wanted wordlists (data/wordlists.manifest.json): category,
+    size, mtime and line count per file, plus the mtimes of the directories the
+    WANTED_PATTERNS glob over. Loaded once at startup; revalidate() only re-globs when a
+    directory mtime changed and only recounts files whose size or mtime changed.
     """
-    if WEB_CONTENT_DIR.exists() and _txt_count() > 0:
-        if on_event: await on_event({"type":"stage","stage":"seclists_cached"})
-        log.info("SecLists already present: %s files", _txt_count())
-        return
 
-    # Fresh download
-    SECLISTS_DIR.mkdir(parents=True, exist_ok=True)
-    DATA.mkdir(parents=True, exist_ok=True)
-    tmp_zip = DATA / "seclists.repo.zip.part"
-    zip_url = f"https://codeload.github.com/danielmiessler/SecLists/zip/{SECLISTS_COMMIT}"
+    def __init__(self, root: Path = WEB_CONTENT_DIR, manifest: Path = MANIFEST):
+        self.root = root
+        self.manifest = manifest
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.dirs: Dict[str, int] = {}
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def load(self) -> "WordlistIndex":
+        try:
+            data = json.loads(self.manifest.read_text("utf-8"))
+            if data.get("root") == str(self.root):
+                self.entries, self.dirs = data.get("entries", {}), data.get("dirs", {})
+        except (OSError, ValueError):
+            pass
+        return self.revalidate(force=True)
+
+    def _save(self):
+        self.manifest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"root": str(self.root), "dirs": self.dirs, "entries": self.entries}), "utf-8")
+        os.replace(tmp, self.manifest)
+
+    def _dir_mtimes(self) -> Dict[str, int]:
+        out = {}
+        for rel in self.dirs:
+            try:
+                out[rel] = (self.root / rel).stat().st_mtime_ns
+            except OSError:
+                out[rel] = -1
+        return out
+
+    def _rescan(self) -> bool:
+        files, dirs = {}, {}
+        if self.root.exists():
+            for pat in WANTED_PATTERNS:
+                for p in self.root.glob(pat):
+                    cat = _category(p)
+                    if cat and p.is_file():
+                        files[p.relative_to(self.root).as_posix()] = cat
+                        for d in [p.parent, *p.parent.parents]:
+                            if d == self.root.parent:
+                                break
+                            dirs[d.relative_to(self.root).as_posix()] = d.stat().st_mtime_ns
+        self.dirs = dirs
+        changed = set(files) != set(self.entries)
+        self.entries = {k: v for k, v in self.entries.items() if k in files}
+        for rel, cat in files.items():
+            self.entries.setdefault(rel, {"category": cat})
+        return changed
+
+    def revalidate(self, force: bool = False) -> "WordlistIndex":
+        with self._lock:
+            if not force and time.monotonic() - self._checked < REVALIDATE_EVERY:
+                return self
+            changed = False
+            if not self.dirs or self._dir_mtimes() != self.dirs:
+                changed = self._rescan()
+            for rel, e in self.entries.items():
+                p = self.root / rel
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                if e.get("size") != st.st_size or e.get("mtime_ns") != st.st_mtime_ns:
+                    e.update(size=st.st_size, mtime_ns=st.st_mtime_ns, lines=_count_lines(p))
+                    changed = True
+            if changed:
+                self._save()
+                log.info("Wordlist manifest updated: %d lists", len(self.entries))
+            self._checked = time.monotonic()
+            return self
+
+    def catalog(self) -> Dict[str, List[Path]]:
+        catalog: Dict[str, List[Path]] = {"base": [], "raft": [], "cms": [], "svn": []}
+        for rel, e in self.entries.items():
+            catalog[e["category"]].append(self.root / rel)
+        for k in catalog:
+            catalog[k].sort()
+        return catalog
+
+    def lines(self, p: Path) -> Optional[int]:
+        try:
+            e = self.entries.get(p.relative_to(self.root).as_posix())
+        except ValueError:
+            return None
+        return e.get("lines") if e else None
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [{"path": rel, **e} for rel, e in sorted(self.entries.items())]
+
+INDEX = WordlistIndex()
+
+def load_index() -> WordlistIndex:
+    """Load the manifest and bring it up to date; call once at app startup."""
+    return INDEX.load()
+
+def _wanted(rel: str) -> bool:
+    """True if a path relative to Web-Content matches WANTED_PATTERNS segment by segment."""
+    parts = rel.split("/")
+    for pat in WANTED_PATTERNS:
+        pparts = pat.split("/")
+        if len(pparts) == len(parts) and all(fnmatch.fnmatch(a, b) for a, b in zip(parts, pparts)):
+            return True
+    return False
+
+def _emitter(on_event: Optional[EventCb]) -> Callable[[Dict[str, Any]], None]:
+    """Thread-safe, fire-and-forget bridge from a worker thread back to on_event."""
+    if not on_event:
+        return lambda ev: None
+    loop = asyncio.get_running_loop()
+    return lambda ev: asyncio.run_coroutine_threadsafe(on_event(ev), loop)
+
+async def _download(dest: Path, on_event: Optional[EventCb]) -> Path:
+    """
+    Stream the pinned SecLists zip into `dest`.part, resuming from whatever a previous
+    attempt left behind (Range request); a server that ignores Range restarts it.
+    """
+    if dest.exists():
+        return dest
+    part = dest.with_name(dest.name + ".part")
+    have = part.stat().st_size if part.exists() else 0
+    headers = {"Range": f"bytes={have}-"} if have else {}
 
     timeout = aiohttp.ClientTimeout(total=1800)
     async with aiohttp.ClientSession(timeout=timeout) as session:
-        if on_event: await on_event({"type":"stage","stage":"seclists_download_start"})
-        async with session.get(zip_url) as resp:
+        if on_event: await on_event({"type":"stage","stage":"seclists_download_start", "resume_from": have})
+        async with session.get(SECLISTS_ZIP_URL, headers=headers) as resp:
+            if resp.status == 416:  # nothing left to fetch: the part file is complete
+                part.replace(dest)
+                return dest
             resp.raise_for_status()
-            total = int(resp.headers.get("Content-Length") or 0)
-            downloaded = 0
-            with tmp_zip.open("wb") as f:
+            if resp.status != 206:
+                have = 0
+            total = have + int(resp.headers.get("Content-Length") or 0) if resp.headers.get("Content-Length") else 0
+            downloaded = have
+            with part.open("ab" if have else "wb") as f:
                 async for chunk in resp.content.iter_chunked(1<<20):
-                    f.write(chunk)
+                    await asyncio.to_thread(f.write, chunk)
                     downloaded += len(chunk)
                     if on_event and total:
                         await on_event({"type":"stage","stage":"seclists_downloading",
                                         "downloaded": downloaded, "total": total})
+    part.replace(dest)
+    return dest
+
+def _extract_zip(archive: Path, progress: Callable[[Dict[str, Any]], None]) -> int:
+    """Extract the wanted Web-Content members with streamed copies on a small thread pool."""
+    with zipfile.ZipFile(archive, "r") as z:
+        jobs = []
+        for m in z.infolist():
+            i = m.filename.find(WEB_CONTENT_REL)
+            if i < 0 or m.is_dir():
+                continue
+            rel = m.filename[i + len(WEB_CONTENT_REL):]
+            if _wanted(rel):
+                jobs.append((m.filename, rel))
+    total = len(jobs) or 1
+    done = 0
+    lock = threading.Lock()
 
-    if on_event: await on_event({"type":"stage","stage":"seclists_extract_start"})
-    extracted = 0
-    with zipfile.ZipFile(tmp_zip, "r") as z:
-        prefix = f"SecLists-{SECLISTS_COMMIT}/Discovery/Web-Content/"
-        members = [m for m in z.infolist() if m.filename.startswith(prefix)]
-        total_members = len(members) or 1
-        for i, m in enumerate(members, 1):
-            rel = m.filename[len(f"SecLists-{SECLISTS_COMMIT}/"):]
-            target = SECLISTS_DIR / rel
-            if m.is_dir():
-                target.mkdir(parents=True, exist_ok=True)
-            else:
+    def copy(batch):
+        nonlocal done
+        with zipfile.ZipFile(archive, "r") as z:  # one handle per thread: reads never serialize
+            for name, rel in batch:
+                target = WEB_CONTENT_DIR / rel
                 target.parent.mkdir(parents=True, exist_ok=True)
-                with target.open("wb") as f:
-                    f.write(z.read(m))
-                extracted += 1
-            if on_event and (i % 50 == 0 or i == total_members):
-                await on_event({"type":"stage","stage":"seclists_extracting","done": i, "total": total_members})
-    try:
-        tmp_zip.unlink()
-    except Exception:
-        pass
-
-    count = _txt_count()
-    log.info("SecLists extraction finished: %s text files", count)
-    if on_event: await on_event({"type":"stage","stage":"seclists_ready","files": count})
-
-    if count == 0:
-        # Hard fail so the caller can fallback or show a clear error
-        raise RuntimeError("SecLists Web-Content extraction yielded 0 *.txt files")
+                with z.open(name) as src, target.open("wb") as dst:
+                    shutil.copyfileobj(src, dst, 1 << 20)
+                with lock:
+                    done += 1
+                    if done % 50 == 0 or done == total:
+                        progress({"type":"stage","stage":"seclists_extracting","done": done, "total": total})
+
+    with ThreadPoolExecutor(EXTRACT_WORKERS) as pool:
+        list(pool.map(copy, [jobs[i::EXTRACT_WORKERS] for i in range(EXTRACT_WORKERS)]))
+    return len(jobs)
+
+def _import_dir(src: Path, progress: Callable[[Dict[str, Any]], None]) -> int:
+    """Copy the wanted lists from a local SecLists checkout or Web-Content directory."""
+    root = src / WEB_CONTENT_REL if (src / WEB_CONTENT_REL).is_dir() else src
+    files = [p for pat in WANTED_PATTERNS for p in root.glob(pat) if p.is_file()]
+    for i, p in enumerate(files, 1):
+        target = WEB_CONTENT_DIR / p.relative_to(root)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(p, target)
+        if i % 50 == 0 or i == len(files):
+            progress({"type":"stage","stage":"seclists_extracting","done": i, "total": len(files)})
+    return len(files)
+
+async def ensure_seclists(on_event: Optional[EventCb] = None, source: Optional[str] = None):
+    """
+    Ensure the wanted SecLists Web-Content lists exist locally.
+    On first run, import them from `source` / $DIRGRAPH_SECLISTS_SOURCE (zip or directory)
+    or download the pinned repo zip (resumable) and extract only the members matching
+    WANTED_PATTERNS. Copies run in worker threads so the event loop stays responsive,
+    and a lock makes concurrent first-run jobs share one bootstrap.
+    If that yields no wordlists, raise an error so the caller can fallback or report.
+    """
+    # concurrent first-run jobs wait for one bootstrap instead of each downloading
+    lock = _BOOTSTRAP_LOCKS.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+    async with lock:
+        present = len((await asyncio.to_thread(INDEX.revalidate)).entries)
+        if present:
+            if on_event: await on_event({"type":"stage","stage":"seclists_cached"})
+            log.info("SecLists already present: %s lists", present)
+            return
+
+        t0 = time.monotonic()
+        WEB_CONTENT_DIR.mkdir(parents=True, exist_ok=True)
+        progress = _emitter(on_event)
+        source = source or os.environ.get(SECLISTS_SOURCE_ENV)
+        if source and Path(source).is_dir():
+            if on_event: await on_event({"type":"stage","stage":"seclists_extract_start","source": source})
+            extracted = await asyncio.to_thread(_import_dir, Path(source), progress)
+        else:
+            archive = Path(source) if source else await _download(DATA / "seclists.repo.zip", on_event)
+            if on_event: await on_event({"type":"stage","stage":"seclists_extract_start"})
+            extracted = await asyncio.to_thread(_extract_zip, archive, progress)
+            if not source:
+                try:
+                    archive.unlink()
+                except Exception:
+                    pass
+        METRICS.observe("dirgraph_wordlists_seconds", time.monotonic() - t0, op="bootstrap")
+        log.info("SecLists bootstrap copied %d wanted lists", extracted)
+
+        count = len((await asyncio.to_thread(INDEX.revalidate, True)).entries)
+        log.info("SecLists extraction finished: %s wordlists indexed", count)
+        if on_event: await on_event({"type":"stage","stage":"seclists_ready","files": count})
+
+        if count == 0:
+            # Hard fail so the caller can fallback or show a clear error
+            raise RuntimeError("SecLists Web-Content extraction yielded 0 wanted wordlists")
 
 def index_wordlists() -> Dict[str, List[Path]]:
-    """Scan Web-Content subtree and index wordlists by category."""
-    catalog: Dict[str, List[Path]] = {"base": [], "raft": [], "cms": [], "svn": []}
-    if not WEB_CONTENT_DIR.exists():
-        return catalog
-    for pat in WANTED_PATTERNS:
-        for p in WEB_CONTENT_DIR.glob(pat):
-            name = p.name.lower()
-            posix = p.as_posix().lower()
-            if name.startswith("directory-list"):
-                catalog["base"].append(p)
-            elif name.startswith("raft-") and "directories" in name:
-                catalog["raft"].append(p)
-            elif "/cms/" in posix:
-                catalog["cms"].append(p)
-            elif "/svndigger/" in posix:
-                catalog["svn"].append(p)
-    for k in catalog:
-        catalog[k].sort()
+    """Wordlists by category, from the persistent index (revalidated by mtime)."""
+    with METRICS.timer("dirgraph_wordlists_seconds", op="index"):
+        catalog = INDEX.revalidate().catalog()
     log.info("Indexed wordlists: base=%d raft=%d cms=%d svn=%d",
              len(catalog["base"]), len(catalog["raft"]), len(catalog["cms"]), len(catalog["svn"]))
     return catalog
 
-def choose_wordlists(url: str, html: str, headers: Dict[str, str], catalog: Dict[str, List[Path]]) -> List[Tuple[str, Path]]:
-    """Heuristics to select lists based on headers/HTML hints."""
+STACKS = ("wp", "drupal", "joomla", "iis", "api", "generic")  # detect_stack() results, most specific first
+
+def _stack_hints(html: str, headers: Dict[str, str]) -> Dict[str, bool]:
     hdr = {k.lower(): v.lower() for k, v in headers.items()}
     lower_html = (html or "").lower()
+    return {
+        "wp": "wp-content" in lower_html or "wp-includes" in lower_html,
+        "drupal": "drupal.settings" in lower_html or "sites/all/modules" in lower_html,
+        "joomla": "joomla" in lower_html,
+        "iis": "microsoft-iis" in hdr.get("server", "") or "asp.net" in hdr.get("x-powered-by", ""),
+        "api": "application/json" in hdr.get("content-type", "") or "swagger" in lower_html or "openapi" in lower_html,
+    }
+
+def detect_stack(html: str, headers: Dict[str, str]) -> str:
+    """The target's stack as one of STACKS, from the same hints choose_wordlists() uses."""
+    hints = _stack_hints(html, headers)
+    return next((s for s in STACKS if hints.get(s)), "generic")
+
+def choose_wordlists(
+    url: str, html: str, headers: Dict[str, str], catalog: Dict[str, List[Path]], budget: Optional[int] = None
+) -> List[Tuple[str, Path]]:
+    """
+    Heuristics to select lists based on headers/HTML hints.
+    With a `budget` (max candidates the job will test), line counts from the index are
+    used to fit the picks: stack-specific lists go first so the cap cannot cut them,
+    and each generic group contributes the smallest list that covers what is left.
+    """
+    hints = _stack_hints(html, headers)
     picks: List[Tuple[str, Path]] = []
+    remaining = budget
 
-    def add(label, group, limit=2):
+    def add(label, group, limit=2, fit=False):
+        nonlocal remaining
+        if budget is not None:
+            if remaining <= 0: return
+            sized = [(INDEX.lines(p), p) for p in group]
+            if fit and sized and all(n is not None for n, _ in sized):
+                covering = sorted((x for x in sized if x[0] >= remaining), key=lambda x: x[0])
+                group = [p for _, p in covering[:1]] or [p for _, p in sorted(sized, key=lambda x: x[0], reverse=True)]
         for p in group[:limit]:
+            if budget is not None:
+                if remaining <= 0: break
+                remaining -= INDEX.lines(p) or 0
             picks.append((label, p))
 
-    is_api = ("application/json" in hdr.get("content-type","") or "swagger" in lower_html or "openapi" in lower_html)
-    is_wp = "wp-content" in lower_html or "wp-includes" in lower_html
-    is_drupal = "drupal.settings" in lower_html or "sites/all/modules" in lower_html
-    is_joomla = "joomla" in lower_html
+    is_api = hints["api"]
+    is_cms = hints["wp"] or hints["drupal"] or hints["joomla"]
 
-    add("base", catalog["base"], limit=2)
+    if is_cms and budget is not None:
+        add("cms", catalog["cms"], limit=3)
+    add("base", catalog["base"], limit=2, fit=True)
     if catalog["raft"]:
-        add("raft", catalog["raft"], limit=1)
-    if is_wp or is_drupal or is_joomla:
+        add("raft", catalog["raft"], limit=1, fit=True)
+    if is_cms and budget is None:
         add("cms", catalog["cms"], limit=3)
     if is_api:
         picks = [p for p in picks if p[0] == "base"][:1] + picks
@@ -153,30 +385,20 @@ def choose_wordlists(url: str, html: str, headers: Dict[str, str], catalog: Dict
     log.info("Chosen wordlists: %d (%s)", len(final), ", ".join(p.name for _, p in final))
     return final
 
-def iter_candidates(paths: List[Tuple[str, Path]], cap: int) -> List[str]:
+def iter_candidates(paths: List[Tuple[str, Path]], cap: int) -> Sequence[str]:
     """
-    Read lines from chosen wordlists and build a unique, normalized list of paths.
-    GUARANTEES: returns List[str] (never bytes), leading '/' enforced.
+    Unique, normalized candidate paths from the chosen wordlists, in list order.
+    The combination is compiled once into a memory-mapped corpus (see corpus.py) and
+    shared across jobs, so this is a zero-copy slice of its first `cap` entries.
+    GUARANTEES: items are str (never bytes), leading '/' enforced.
     """
-    yielded = 0
-    dedupe = set()
-    for _, p in paths:
-        try:
-            with p.open("r", encoding="utf-8", errors="ignore") as f:
-                for line in f:
-                    if yielded >= cap: return list(dedupe)
-                    s = line.strip()
-                    if isinstance(s, (bytes, bytearray)):
-                        s = s.decode("utf-8", "ignore").strip()
-                    if not s or str(s).startswith("#"): continue
-                    s = str(s)
-                    if not s.startswith("/"): s = "/" + s
-                    if s not in dedupe:
-                        dedupe.add(s); yielded += 1
-        except Exception:
-            continue
-    log.info("Built %d unique candidates (cap=%d)", len(dedupe), cap)
-    return list(dedupe)
+    if not paths:
+        return []
+    with METRICS.timer("dirgraph_wordlists_seconds", op="corpus"):  # a compile on a cache miss, else a map
+        corpus = load_corpus([p for _, p in paths], CORPUS_DIR)
+    view = corpus[:max(0, cap)]
+    log.info("Built %d unique candidates (cap=%d, corpus=%d)", len(view), cap, len(corpus))
+    return view
 
 def builtin_candidates(cap: int) -> List[str]:
     out = []
@@ -0,0 +1,69 @@
+"""
+Compare two bench.run reports metric by metric.
+
+    python -m bench.compare before.json after.json [--threshold 5]
+
+Prints every numeric metric present in both with its relative change; changes beyond
+the threshold (and, for timings, MIN_SECONDS) are flagged as better/worse by the
+metric's direction. Exits 1 if any metric got worse, so it can gate a CI job.
+"""
+import argparse, json, sys
+from typing import Dict, Iterator, Optional, Tuple
+
+# Metrics where larger is better; everything else numeric (times, latencies, RSS) is
+# better smaller. Counts that describe the workload rather than its speed are skipped.
+HIGHER_IS_BETTER = ("rps", "ops_per_s")
+MIN_SECONDS = 0.01  # timing changes smaller than this are noise whatever their percentage
+IGNORED = ("n", "s", "words", "requests", "findings", "frames", "nodes", "failed", "hits", "limit", "inflight",
+           "waiting", "inflight_peak", "ok", "throttled", "timeout", "error", "version", "cpus", "repeat", "ops")
+
+def flatten(d: Dict, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    for k, v in d.items():
+        key = f"{prefix}.{k}" if prefix else k
+        if isinstance(v, dict):
+            yield from flatten(v, key)
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            yield key, float(v)
+
+def direction(key: str) -> Optional[int]:
+    """+1 if higher is better, -1 if lower is better, None if not a performance metric."""
+    leaf = key.rsplit(".", 1)[-1]
+    if key.startswith("config.") or ".limiter." in key or ".target." in key or leaf in IGNORED:
+        return None
+    return 1 if leaf in HIGHER_IS_BETTER else -1
+
+def _seconds(key: str) -> bool:
+    return key.endswith("_s") or ".stages." in key
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Compare two benchmark reports")
+    ap.add_argument("before")
+    ap.add_argument("after")
+    ap.add_argument("--threshold", type=float, default=5.0, help="percent change that counts")
+    args = ap.parse_args(argv)
+    with open(args.before) as f:
+        old = json.load(f)
+    with open(args.after) as f:
+        new = json.load(f)
+    a, b = dict(flatten(old)), dict(flatten(new))
+    print(f"before {(old.get('commit') or '?')[:12]}{' (dirty)' if old.get('dirty') else ''}  "
+          f"after {(new.get('commit') or '?')[:12]}{' (dirty)' if new.get('dirty') else ''}")
+    if old.get("config") != new.get("config"):
+        print(f"warning: configs differ: {old.get('config')} vs {new.get('config')}")
+    worse = 0
+    for key in sorted(a.keys() & b.keys()):
+        sign = direction(key)
+        if sign is None:
+            continue
+        x, y = a[key], b[key]
+        change = (y - x) / x * 100 if x else (0.0 if y == x else float("inf"))
+        verdict = ""
+        if abs(change) >= args.threshold and not (_seconds(key) and abs(y - x) < MIN_SECONDS):
+            better = change * sign > 0
+            verdict = "better" if better else "WORSE"
+            worse += not better
+        print(f"{key:55s} {x:>12.4g} -> {y:<12.4g} {change:+7.1f}%  {verdict}")
+    return 1 if worse else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,430 @@
+"""
+Scan benchmarks against the stand-in target (bench/target.py).
+
+    python -m bench.run                          # every profile, e2e + micro, JSON on stdout
+    python -m bench.run --profile slow --suite e2e --set shards=2 --out slow.json
+    python -m bench.compare before.json after.json
+
+e2e runs a full /api/enumerate job per profile: the API and the target each run in
+their own process, on a throwaway data directory seeded with generated wordlists, and
+the job is watched over its WebSocket like the UI does. micro times the stages on
+their own in this process: corpus build/load, analyze_item, soft-404 checks, graph
+deltas, the event path (batcher + job log) and DirEnumerator.run against the target.
+"""
+import argparse, asyncio, contextlib, json, os, platform, random, socket, statistics
+import subprocess, sys, tempfile, time
+from array import array
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage
+    resource = None
+
+import aiohttp
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backend import analyzer  # noqa: E402
+from backend.corpus import Corpus, load_corpus  # noqa: E402
+from backend.events import EventBatcher  # noqa: E402
+from backend.graph import GraphBuilder  # noqa: E402
+from backend.pool import POOLS  # noqa: E402
+from backend.scanner import DirEnumerator  # noqa: E402
+from backend.soft404 import WildcardDetector  # noqa: E402
+from backend.store import JobLog, JobStore  # noqa: E402
+from bench.target import PROFILES, STATS_PATH  # noqa: E402
+
+FORMAT_VERSION = 1
+SYLLABLES = ["ad", "min", "log", "in", "api", "v", "dev", "test", "old", "back", "up", "conf", "data",
+             "img", "js", "css", "user", "file", "upload", "static", "priv", "pub", "doc", "tmp"]
+STARTUP_TIMEOUT = 30.0
+
+# -- fixtures ---------------------------------------------------------------------------
+
+def words(n: int) -> Iterator[str]:
+    """`n` distinct, deterministic, word-like names."""
+    k = len(SYLLABLES)
+    for i in range(n):
+        parts, j = [], i
+        while True:
+            parts.append(SYLLABLES[j % k])
+            j //= k
+            if not j:
+                break
+        yield "".join(parts) + (str(i % 10) if i % 3 == 0 else "")
+
+def write_wordlists(dest: Path, n: int) -> Path:
+    """A Web-Content-like directory (base + raft lists) the job can import as SecLists."""
+    dest.mkdir(parents=True, exist_ok=True)
+    ws = list(words(n))
+    (dest / "directory-list-2.3-small.txt").write_text("# generated\n" + "\n".join(ws) + "\n")
+    (dest / "raft-small-directories.txt").write_text("\n".join(ws[::2]) + "\n")
+    return dest
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wait_port(port: int, proc: subprocess.Popen, timeout: float = STARTUP_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{proc.args[2]} exited with {proc.returncode}")
+        with contextlib.suppress(OSError), socket.create_connection(("127.0.0.1", port), 0.2):
+            return
+        time.sleep(0.05)
+    raise TimeoutError(f"nothing listening on {port} after {timeout}s")
+
+def _stop(proc: subprocess.Popen):
+    proc.terminate()
+    try:
+        proc.wait(10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+@contextlib.contextmanager
+def target(profile: str, seed: int = 0):
+    port = _free_port()
+    proc = subprocess.Popen([sys.executable, "-m", "bench.target", "--profile", profile, "--port", str(port),
+                             "--seed", str(seed)], cwd=str(ROOT), stdout=subprocess.DEVNULL)
+    try:
+        _wait_port(port, proc)
+        yield f"http://127.0.0.1:{port}/"
+    finally:
+        _stop(proc)
+
+@contextlib.contextmanager
+def api(workdir: Path, lists: Path):
+    port = _free_port()
+    env = {**os.environ, "DIRGRAPH_DATA": str(workdir / "data"), "DIRGRAPH_DB": str(workdir / "jobs.sqlite3"),
+           "DIRGRAPH_SECLISTS_SOURCE": str(lists)}
+    with (workdir / "api.log").open("wb") as logf:
+        proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1",
+                                 "--port", str(port), "--log-level", "warning"],
+                                cwd=str(ROOT), env=env, stdout=logf, stderr=subprocess.STDOUT)
+        try:
+            _wait_port(port, proc)
+            yield f"http://127.0.0.1:{port}", proc
+        finally:
+            _stop(proc)
+
+def peak_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """High-water RSS of `pid` (Linux /proc), or of this process; None where neither is available."""
+    if pid is not None:
+        try:
+            for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+        except OSError:
+            return None
+        return None
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1024), 1)
+
+def _pct(values, q: float) -> Optional[float]:
+    if not values:
+        return None
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+async def target_stats(url: str) -> Dict:
+    async with aiohttp.ClientSession() as s, s.get(url.rstrip("/") + STATS_PATH) as r:
+        return await r.json()
+
+# -- e2e --------------------------------------------------------------------------------
+
+async def watch_job(base: str, body: Dict) -> Dict:
+    """Start a job and follow its WebSocket to the end; timings are seconds from submit."""
+    stages: List[tuple] = []
+    first_found = done = scan_start = None
+    summary: Dict = {}
+    async with aiohttp.ClientSession() as s:
+        t0 = time.perf_counter()
+        async with s.post(f"{base}/api/enumerate", json=body) as r:
+            r.raise_for_status()
+            job_id = (await r.json())["job_id"]
+        async with s.ws_connect(f"{base.replace('http', 'ws', 1)}/ws/{job_id}", max_msg_size=0) as ws:
+            async for msg in ws:
+                now = time.perf_counter() - t0
+                ev = json.loads(msg.data)
+                t = ev.get("type")
+                if t == "stage":
+                    stages.append((ev["stage"], now))
+                    if ev["stage"] == "enumeration_started":
+                        scan_start = now
+                elif t == "batch" and ev.get("found") and first_found is None:
+                    first_found = now
+                elif t == "error":
+                    raise RuntimeError(ev.get("message"))
+                elif t in ("done", "canceled", "interrupted"):
+                    done, summary = now, (ev.get("result") or {}).get("summary") or {}
+                    break
+    per_stage: Dict[str, float] = {}
+    marks = stages + [("done", done)]
+    for (name, t), (_, t_next) in zip(marks, marks[1:]):
+        per_stage[name] = round(per_stage.get(name, 0.0) + (t_next - t), 4)
+    scan_s = (done - scan_start) if scan_start is not None else None
+    requests = summary.get("requests", 0)
+    return {
+        "job_id": job_id,
+        "wall_s": round(done, 3),
+        "scan_s": round(scan_s, 3) if scan_s else None,
+        "requests": requests,
+        "findings": summary.get("total_tested", 0),  # findings, despite the name (GraphBuilder.counts)
+        "rps": round(requests / scan_s, 1) if scan_s else None,
+        "ttff_s": round(first_found, 3) if first_found is not None else None,
+        "ttff_scan_s": round(first_found - scan_start, 3) if first_found is not None and scan_start else None,
+        "stages": per_stage,
+    }
+
+def run_e2e(profile: str, n_words: int, options: Dict) -> Dict:
+    prof = PROFILES[profile]
+    with tempfile.TemporaryDirectory(prefix="dirgraph-bench-") as tmp:
+        work = Path(tmp)
+        lists = write_wordlists(work / "lists", n_words)
+        with target(profile) as url, api(work, lists) as (base, proc):
+            body = {"url": url, "max_paths": n_words, "recursive": prof.depth > 1,
+                    "max_depth": prof.depth, "depth_budget": max(1, n_words // 50), **options}
+            res = asyncio.run(watch_job(base, body))
+            res["peak_rss_mb"] = peak_rss_mb(proc.pid)
+            res["target"] = asyncio.run(target_stats(url))
+    return res
+
+# -- micro ------------------------------------------------------------------------------
+
+def _timed(fn: Callable[[], Any], n: int) -> Dict:
+    t0 = time.perf_counter()
+    fn()
+    dt = time.perf_counter() - t0
+    return {"n": n, "s": round(dt, 4), "ops_per_s": round(n / dt, 1) if dt else None,
+            "us_per_op": round(dt / n * 1e6, 2) if n else None}
+
+def micro_corpus(n_words: int) -> Dict:
+    with tempfile.TemporaryDirectory(prefix="dirgraph-bench-") as tmp:
+        lists = write_wordlists(Path(tmp) / "lists", n_words)
+        sources = sorted(lists.glob("*.txt"))
+        t0 = time.perf_counter()
+        corpus = load_corpus(sources, Path(tmp) / "corpus")
+        build = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        warm = Corpus(corpus.path)
+        load = time.perf_counter() - t0
+        it = _timed(lambda: sum(1 for _ in warm[:len(warm)]), len(warm))
+        return {"words": len(corpus), "build_s": round(build, 4), "load_s": round(load, 5), "iterate": it}
+
+def micro_analyze(n: int) -> Dict:
+    rng = random.Random(1)
+    paths = [f"/{w}" for w in words(2000)] + ["/.git/", "/.env", "/backup.zip", "/admin", "/phpinfo.php"]
+    bodies = ["", "Index of /", "<html><body>" + "lorem ipsum " * 100 + "</body></html>", "DB_PASSWORD=x"]
+    sample = [(rng.choice(paths), rng.choice((200, 403, 301)), rng.choice(bodies)) for _ in range(n)]
+    analyzer.rules()  # compile outside the timing
+    return _timed(lambda: [analyzer.analyze_item(p, s, b) for p, s, b in sample], n)
+
+def micro_soft404(n: int) -> Dict:
+    async def fetch(path: str):  # a wildcard site: every miss is a 200 page reflecting the path
+        return 200, 120 + len(path), None, f"<html><body><h1>Not found</h1>The page {path} does not exist.</body></html>".encode()
+    real = "<html><body>" + " ".join(f"w{i}" for i in range(300)) + "</body></html>"
+
+    async def go():
+        det = WildcardDetector(fetch)
+        await det.calibrate("/")
+        rng = random.Random(2)
+        t0 = time.perf_counter()
+        for i in range(n):
+            p = f"/x{rng.getrandbits(32):x}"
+            if i % 10:
+                await det.is_soft404(p, 200, 120 + len(p), None, f"<html><body><h1>Not found</h1>The page {p} does not exist.</body></html>")
+            else:
+                await det.is_soft404(p, 200, len(real), None, real)
+        return time.perf_counter() - t0
+    dt = asyncio.run(go())
+    return {"n": n, "s": round(dt, 4), "ops_per_s": round(n / dt, 1), "us_per_op": round(dt / n * 1e6, 2)}
+
+def _findings(n: int) -> List[Dict]:
+    rng = random.Random(3)
+    names = list(words(400))
+    out, seen = [], set()
+    while len(out) < n:
+        p = "/" + "/".join(rng.choice(names) for _ in range(rng.randint(1, 3)))
+        if p not in seen:
+            seen.add(p)
+            out.append({"url": "http://bench" + p, "path": p, "status": rng.choice((200, 200, 403, 301)),
+                        "size": rng.randint(0, 5000), "redirected_to": None, "wordlist": None, "issues": []})
+    return out
+
+def micro_graph(n: int) -> Dict:
+    items = _findings(n)
+    g = GraphBuilder("http://bench/", collapse_threshold=200, fanout_limit=300)
+    res = _timed(lambda: [g.add(it) for it in items], n)
+    res["nodes"] = len(g.view("root")["nodes"])
+    return res
+
+def micro_events(n: int) -> Dict:
+    """found events through graph deltas, the batcher and the job log (SQLite) as in a job."""
+    items = _findings(n)
+
+    async def go(db: Path):
+        store = JobStore(db)
+        await store.create("bench", "{}")
+        jlog = JobLog(store, "bench")
+        jlog.start()
+        graph = GraphBuilder("http://bench/")
+
+        async def deliver(ev):
+            await jlog.put(ev)
+        batcher = EventBatcher(deliver)
+        batcher.start()
+        t0 = time.perf_counter()
+        for i, it in enumerate(items):
+            await batcher.emit({"type": "found", "item": it, "graph": graph.add(it)})
+            jlog.record_finding(it)
+            await batcher.emit({"type": "progress", "value": i / n})
+            if i % 256 == 0:
+                await asyncio.sleep(0)  # let the batcher tick as it would between requests
+        await batcher.aclose()
+        await jlog.aclose("done")
+        dt = time.perf_counter() - t0
+        frames = jlog.seq
+        await store.close()
+        return dt, frames
+
+    with tempfile.TemporaryDirectory(prefix="dirgraph-bench-") as tmp:
+        dt, frames = asyncio.run(go(Path(tmp) / "events.sqlite3"))
+    return {"n": n, "s": round(dt, 4), "ops_per_s": round(n / dt, 1), "us_per_op": round(dt / n * 1e6, 2),
+            "frames": frames}
+
+class TimedEnumerator(DirEnumerator):
+    """DirEnumerator that records the latency of every request it sends."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = array("d")
+
+    async def _fetch(self, session, url, headers=None):
+        t0 = time.perf_counter()
+        try:
+            return await super()._fetch(session, url, headers)
+        finally:
+            self.latencies.append(time.perf_counter() - t0)
+
+def micro_scan(profile: str, n_words: int, options: Dict) -> Dict:
+    prof = PROFILES[profile]
+    cands = [f"/{w}" for w in words(n_words)]
+    known = {"max_concurrency", "adaptive", "min_concurrency", "max_retries", "body_mode", "exts_hint",
+             "mutation_budget", "expand_extensions"}
+    opts = {k: v for k, v in options.items() if k in known}
+
+    async def go(url: str):
+        e = TimedEnumerator(url, recursive=prof.depth > 1, max_depth=prof.depth,
+                            depth_budget=max(1, n_words // 50), **opts)
+        first: List[float] = []
+        t0 = time.perf_counter()
+
+        async def on_event(ev):
+            if ev.get("type") == "found" and not first:
+                first.append(time.perf_counter() - t0)
+        found = await e.run(cands, on_event)
+        dt = time.perf_counter() - t0
+        await POOLS.close()
+        lat = [x * 1000 for x in e.latencies]
+        return {"requests": e.tested, "findings": len(found), "s": round(dt, 3),
+                "rps": round(e.tested / dt, 1) if dt else None,
+                "p50_ms": round(_pct(lat, 0.5), 2) if lat else None,
+                "p99_ms": round(_pct(lat, 0.99), 2) if lat else None,
+                "ttff_s": round(first[0], 4) if first else None,
+                "failed": e.failed, "limiter": e.limiter.stats()}
+
+    with target(profile) as url:
+        return asyncio.run(go(url))
+
+# -- driver -----------------------------------------------------------------------------
+
+def _median(runs: List[Any]) -> Any:
+    """Element-wise median of repeated results (numbers only; the rest from the first run)."""
+    first = runs[0]
+    if isinstance(first, dict):
+        return {k: _median([r.get(k) for r in runs]) for k in first}
+    nums = [r for r in runs if isinstance(r, (int, float)) and not isinstance(r, bool)]
+    if len(nums) == len(runs) and len(runs) > 1:
+        return round(statistics.median(nums), 4)
+    return first
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(["git", *args], cwd=str(ROOT), capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _parse_set(items: List[str]) -> Dict:
+    out = {}
+    for item in items:
+        k, _, v = item.partition("=")
+        try:
+            out[k] = json.loads(v)
+        except ValueError:
+            out[k] = v
+    return out
+
+def main(argv: Optional[List[str]] = None) -> Dict:
+    ap = argparse.ArgumentParser(description="DirGraph scan benchmarks")
+    ap.add_argument("--profile", action="append", choices=sorted(PROFILES),
+                    help="target profile (repeatable; default: all)")
+    ap.add_argument("--suite", default="e2e,micro", help="comma-separated: e2e, micro")
+    ap.add_argument("--words", type=int, default=20000, help="wordlist size")
+    ap.add_argument("--ops", type=int, default=20000, help="iterations per micro-benchmark")
+    ap.add_argument("--repeat", type=int, default=1, help="runs per measurement; the median is reported")
+    ap.add_argument("--set", action="append", default=[], metavar="KEY=JSON",
+                    help="scan option for every job, e.g. --set max_concurrency=128 --set shards=2")
+    ap.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = ap.parse_args(argv)
+
+    profiles = args.profile or list(PROFILES)
+    suites = {s.strip() for s in args.suite.split(",") if s.strip()}
+    options = _parse_set(args.set)
+    rep = max(1, args.repeat)
+
+    def measure(label: str, fn: Callable[[], Any]) -> Any:
+        print(f"bench: {label}", file=sys.stderr, flush=True)
+        return _median([fn() for _ in range(rep)])
+
+    report: Dict[str, Any] = {
+        "version": FORMAT_VERSION,
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count(),
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {"profiles": profiles, "words": args.words, "ops": args.ops, "repeat": rep, "options": options},
+    }
+    if "e2e" in suites:
+        report["e2e"] = {p: measure(f"e2e {p}", lambda p=p: run_e2e(p, args.words, options)) for p in profiles}
+    if "micro" in suites:
+        micro: Dict[str, Any] = {
+            "corpus": measure("corpus", lambda: micro_corpus(args.words)),
+            "analyze_item": measure("analyze_item", lambda: micro_analyze(args.ops)),
+            "soft404": measure("soft404", lambda: micro_soft404(args.ops)),
+            "graph_add": measure("graph_add", lambda: micro_graph(args.ops)),
+            "events": measure("events", lambda: micro_events(args.ops)),
+            "scan": {p: measure(f"scan {p}", lambda p=p: micro_scan(p, args.words, options)) for p in profiles},
+        }
+        micro["peak_rss_mb"] = peak_rss_mb()
+        report["micro"] = micro
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n")
+    else:
+        print(text)
+    return report
+
+if __name__ == "__main__":
+    main()
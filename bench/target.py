@@ -0,0 +1,112 @@
+"""
+Stand-in scan target for the benchmarks: an aiohttp app whose behaviour is set by a
+Profile. Which paths exist is a pure function of the path, so every run of a profile
+sees the same site; only latencies are random (seeded).
+
+    python -m bench.target --profile deep --port 8766
+"""
+import argparse, asyncio, math, random, zlib
+from typing import Dict, NamedTuple
+from aiohttp import web
+
+BIG_BODY = b"x" * (5 << 20)
+STATS_PATH = "/__bench__/stats"
+
+class Profile(NamedTuple):
+    latency_ms: float = 2.0    # median service time
+    jitter: float = 0.3        # sigma of the lognormal around it; larger = heavier tail
+    hit_rate: float = 0.01     # share of names that exist, at each directory level
+    wildcard: bool = False     # misses answer 200 with a soft-404 page reflecting the path
+    big_every: int = 0         # every n-th hit has a 5 MB body (0 = never)
+    throttle: int = 0          # requests in flight above this get 429 (0 = never)
+    retry_after: str = "0"
+    depth: int = 1             # directory levels that can hold hits; > 1 makes a tree
+
+PROFILES: Dict[str, Profile] = {
+    "baseline": Profile(),
+    "slow": Profile(latency_ms=40.0, jitter=0.8),
+    "wildcard": Profile(wildcard=True),
+    "large": Profile(hit_rate=0.02, big_every=5),
+    "throttled": Profile(throttle=16),
+    "deep": Profile(hit_rate=0.02, depth=3),
+}
+
+def _h(s: str) -> int:
+    return zlib.crc32(s.encode())
+
+def _page(path: str, n: int) -> str:
+    body = " ".join(f"item-{(_h(path) + i) % 997}" for i in range(40 + n % 200))
+    return f"<html><head><title>{path}</title></head><body><h1>{path}</h1><p>{body}</p></body></html>"
+
+def make_app(profile: Profile, seed: int = 0) -> web.Application:
+    rng = random.Random(seed)
+    mu = math.log(max(profile.latency_ms, 0.001) / 1000)
+    stats = {"requests": 0, "hits": 0, "throttled": 0, "inflight_peak": 0}
+    inflight = 0
+
+    def exists(path: str) -> bool:
+        segs = [s for s in path.split("/") if s]
+        if not segs or len(segs) > profile.depth:
+            return False
+        cut = int(profile.hit_rate * 10000)
+        return all(_h("/".join(segs[:i + 1])) % 10000 < cut for i in range(len(segs)))
+
+    async def handler(req: web.Request) -> web.StreamResponse:
+        nonlocal inflight
+        path = req.path
+        if path == STATS_PATH:
+            return web.json_response(stats)
+        stats["requests"] += 1
+        inflight += 1
+        stats["inflight_peak"] = max(stats["inflight_peak"], inflight)
+        try:
+            if profile.throttle and inflight > profile.throttle:
+                stats["throttled"] += 1
+                return web.Response(status=429, headers={"Retry-After": profile.retry_after})
+            await asyncio.sleep(rng.lognormvariate(mu, profile.jitter))
+            if exists(path):
+                stats["hits"] += 1
+                segs = [s for s in path.split("/") if s]
+                n = _h(path)
+                if len(segs) < profile.depth:  # a directory
+                    if not path.endswith("/"):
+                        raise web.HTTPMovedPermanently(path + "/")
+                    return web.Response(text=_page(path, n), content_type="text/html")
+                if n % 7 == 0:
+                    return web.Response(status=403, text="Forbidden")
+                if profile.big_every and n % profile.big_every == 0:
+                    return web.Response(body=BIG_BODY, content_type="application/octet-stream")
+                return web.Response(text=_page(path, n), content_type="text/html")
+            if profile.wildcard:
+                return web.Response(text=f"<html><body><h1>Not found</h1>The page {path} does not exist."
+                                         f" ref={rng.getrandbits(32):08x}</body></html>", content_type="text/html")
+            return web.Response(status=404, text="Not Found")
+        finally:
+            inflight -= 1
+
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", handler)
+    return app
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--profile", choices=sorted(PROFILES), default="baseline")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8766)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    async def serve():
+        runner = web.AppRunner(make_app(PROFILES[args.profile], args.seed), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, args.host, args.port, backlog=1024).start()
+        print("ready", flush=True)
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -14,20 +14,36 @@ document.querySelector('#closePanel').addEventListener('click', ()=> details.hid
 let cy, ws = null, running = false, jobId = null;
 let stats = { total: 0, done: 0, found: 0, ok200:0, forb403:0, auth401:0, redir30x:0 };
 let t0 = 0;
+let layoutTimer = null;
+let graphJob = null;  // survives finishRun so aggregates can still be expanded
+let lastSeq = -1, retries = 0;  // frames carry a seq; a dropped socket reconnects with ?offset=lastSeq+1
+const MAX_RETRIES = 8;
+const JOB_KEY = 'dirgraph.job';  // lets a reloaded tab re-attach to its running scan
+const LARGE_GRAPH = 800;  // above this many nodes: breadthfirst while streaming, server tree layout at the end
+const H_GAP = 60;         // must match graph.H_GAP
+
+function isLarge(){ return cy.nodes().length > LARGE_GRAPH || cy.nodes('[?aggregate]').length > 0; }
 
 function initCy(){
   const container = document.getElementById('cy');
   cy = cytoscape({
-    container, elements: [], minZoom: 0.2, maxZoom: 2.5,
+    container, elements: [], minZoom: 0.02, maxZoom: 2.5,
+    hideEdgesOnViewport: true,  // level of detail: edges are skipped while panning/zooming
     style: [
       { selector: 'node', style: {
         'background-color': '#94a3b8','label': 'data(label)','text-valign': 'center','color': '#1f2937',
         'text-background-color': '#ffffff','text-background-opacity': 1,'text-background-padding': 3,
-        'border-width': 2,'border-color': '#e5e7eb','font-size': 10
+        'border-width': 2,'border-color': '#e5e7eb','font-size': 10,
+        'min-zoomed-font-size': 8  // labels disappear when zoomed out far enough to be unreadable
       }},
       { selector: 'node[status >= 400]', style: {'background-color': '#ef4444','border-color':'#fecaca'} },
       { selector: 'node[status >= 300][status < 400]', style: {'background-color': '#f59e0b','border-color':'#fde68a'} },
       { selector: 'node[status >= 200][status < 300]', style: {'background-color': '#22c55e','border-color':'#bbf7d0'} },
+      { selector: 'node[?aggregate]', style: {
+        'shape': 'round-rectangle','background-color': '#6366f1','border-color': '#c7d2fe',
+        'width': 'mapData(count, 1, 5000, 30, 90)','height': 'mapData(count, 1, 5000, 30, 90)',
+        'label': (n)=> n.data('id').endsWith('#more') ? n.data('label') : `${n.data('label')} (${n.data('count')})`
+      }},
       { selector: 'edge', style: { 'width': 2,'line-color': '#cbd5e1','target-arrow-color':'#cbd5e1','target-arrow-shape':'triangle' } }
     ],
     layout: { name: (bilkent ? 'cose-bilkent' : 'breadthfirst'), animate: false }
@@ -35,17 +51,92 @@ function initCy(){
 
   cy.on('tap', 'node', (e)=>{
     const d = e.target.data();
+    if (d.aggregate && graphJob) { expandNode(e.target); }
+    const hist = d.hist ? Object.entries(d.hist).map(([s, n])=> `${s}: ${n}`).join(', ') : '';
     info.innerHTML = `
       <div><strong>Path:</strong> <code>${d.label ?? ''}</code></div>
       ${d.url ? `<div><strong>URL:</strong> <a href="${d.url}" target="_blank">${d.url}</a></div>`:''}
       ${d.status ? `<div><strong>Status:</strong> ${d.status}</div>`:''}
       ${d.issues ? `<div><strong>Issues:</strong> ${d.issues}</div>`:''}
+      ${d.aggregate ? `<div><strong>Findings below:</strong> ${d.count} (${hist})</div>`:''}
     `;
     details.hidden = false;
   });
 }
 initCy();
 
+function runLayout(){
+  if (isLarge()) {
+    // Force layouts are superlinear; a tree is all a directory graph needs anyway.
+    cy.layout({ name: 'breadthfirst', directed: true, roots: '#root', animate: false }).run();
+    return;
+  }
+  // randomize:false lets cose-bilkent refine the previous positions instead of starting over
+  cy.layout({ name: (bilkent ? 'cose-bilkent' : 'breadthfirst'), animate:false, randomize:false }).run();
+}
+
+function addPositioned(view, origin){
+  // Insert (or refresh) elements of a server view, shifting its relative positions to `origin`.
+  cy.batch(()=>{
+    for (const n of view.nodes){
+      const pos = n.position ? { x: n.position.x + origin.x, y: n.position.y + origin.y } : undefined;
+      const el = cy.getElementById(n.data.id);
+      if (el.nonempty()) { el.data(n.data); if (pos) el.position(pos); }
+      else cy.add({ group: 'nodes', data: n.data, position: pos });
+    }
+    for (const e of view.edges){ if (cy.getElementById(e.data.id).empty()) cy.add({ group: 'edges', data: e.data }); }
+  });
+}
+
+async function loadTreeLayout(){
+  // Replace the streamed graph with the server's collapsed view and its precomputed tree layout.
+  const resp = await fetch(`/api/jobs/${graphJob}/graph?layout=tree`);
+  if (!resp.ok) { runLayout(); return; }
+  const view = await resp.json();
+  cy.elements().remove();
+  addPositioned(view, { x: 0, y: 0 });
+  cy.fit(undefined, 30);
+}
+
+async function expandNode(node){
+  const d = node.data(), more = d.id.endsWith('#more');
+  const q = new URLSearchParams({ node: d.id, offset: String(d.offset || 0), layout: 'tree' });
+  const resp = await fetch(`/api/jobs/${graphJob}/subtree?${q}`);
+  if (!resp.ok) return;
+  const view = await resp.json();
+  const p = node.position();
+  if (more) {
+    // A further page of siblings: lay it out from the "+N more" node rightwards, then move the node past it.
+    const page = view.nodes.filter(n => n.data.id !== d.id && n.position);
+    const xs = page.map(n => n.position.x);
+    const minX = Math.min(...xs), maxX = Math.max(...xs);
+    const y0 = page.length ? Math.min(...page.map(n => n.position.y)) : 0;
+    addPositioned({ nodes: page, edges: view.edges }, { x: p.x - minX, y: p.y - y0 });
+    const rest = view.nodes.find(n => n.data.id === d.id);
+    if (rest) node.data(rest.data).position({ x: p.x + (maxX - minX) + H_GAP, y: p.y });
+    else node.remove();
+  } else {
+    addPositioned(view, p);
+    node.data({ aggregate: false, expanded: true });
+  }
+}
+
+function scheduleLayout(){
+  if (layoutTimer) return;
+  layoutTimer = setTimeout(()=>{ layoutTimer = null; runLayout(); }, 1000);
+}
+
+function applyGraphDelta(g){
+  if (!g) return;
+  cy.batch(()=>{
+    if (g.nodes?.length) cy.add(g.nodes);
+    if (g.edges?.length) cy.add(g.edges);
+    for (const u of (g.updates || [])) cy.getElementById(u.data.id).data(u.data);
+    for (const id of (g.removes || [])) cy.getElementById(id).remove();
+  });
+  if (g.nodes?.length) scheduleLayout();
+}
+
 function setProgress(p){ bar.style.width = `${Math.max(0, Math.min(100, Math.round(p*100)))}%`; }
 function showProgress(on){ document.getElementById('progressWrap').style.visibility = on ? 'visible' : 'hidden'; }
 
@@ -76,25 +167,41 @@ function renderMeta(wordlists){
     `rate: ${rate}/s`;
 }
 
+function resetRun(){
+  stats = { total: 0, done: 0, found: 0, ok200:0, forb403:0, auth401:0, redir30x:0 };
+  setProgress(0); showProgress(true); meta.textContent = ''; cy.elements().remove();
+  setRunning(true); t0 = Date.now(); lastSeq = -1; retries = 0;
+}
+
 async function enumerate(){
   const target = urlEl.value.trim();
   if (!target || running) return;
 
-  stats = { total: 0, done: 0, found: 0, ok200:0, forb403:0, auth401:0, redir30x:0 };
-  setProgress(0); showProgress(true); meta.textContent = ''; cy.elements().remove();
-  setRunning(true); t0 = Date.now();
+  resetRun();
 
   const resp = await fetch('/api/enumerate', {
     method: 'POST', headers:{'Content-Type':'application/json'},
     body: JSON.stringify({ url: target })
   });
   const { job_id } = await resp.json();
-  jobId = job_id;
+  attach(job_id);
+}
+
+function attach(job_id){
+  jobId = job_id; graphJob = job_id;
+  localStorage.setItem(JOB_KEY, job_id);
+  connect();
+}
 
-  ws = new WebSocket(`${location.protocol === 'https:' ? 'wss' : 'ws'}://${location.host}/ws/${job_id}`);
+function connect(){
+  ws = new WebSocket(`${location.protocol === 'https:' ? 'wss' : 'ws'}://${location.host}/ws/${jobId}?offset=${lastSeq + 1}`);
 
   ws.onmessage = (ev)=>{
     const msg = JSON.parse(ev.data);
+    if (msg.seq != null){
+      if (msg.seq <= lastSeq) return;  // already applied before a reconnect
+      lastSeq = msg.seq; retries = 0;
+    }
 
     if (msg.type === 'stage'){
       // Map stages to progress ranges so the bar visibly moves even before scan
@@ -138,6 +245,10 @@ async function enumerate(){
       } else if (s === 'soft_404_baseline') {
         meta.textContent = 'Computing soft-404 baseline…';
         setProgress(0.82);
+      } else if (s === 'revalidating') {
+        meta.textContent = `Re-checking ${msg.count} known findings…`;
+      } else if (s === 'revalidated') {
+        meta.textContent = `Re-checked: ${msg.unchanged} unchanged, ${msg.changed} changed, ${msg.removed} removed`;
       } else if (s === 'enumeration_started') {
         meta.textContent = 'Enumerating…';
         // progress now switches to true scan progress
@@ -149,26 +260,34 @@ async function enumerate(){
       renderMeta(msg.wordlists || []);
     }
 
-    else if (msg.type === 'progress'){
-      if (stats.total) stats.done = Math.min(stats.total, Math.round(msg.value * stats.total));
-      setProgress(0.82 + msg.value * 0.18); // final 18%
+    else if (msg.type === 'batch'){
+      // One frame per ~150ms: fold every found item in, then render once.
+      for (const item of (msg.found || [])){
+        stats.found++;
+        const s = item?.status;
+        if (s >= 200 && s < 300) stats.ok200++;
+        else if (s === 403) stats.forb403++;
+        else if (s === 401) stats.auth401++;
+        else if (String(s).startsWith('30')) stats.redir30x++;
+      }
+      applyGraphDelta(msg.graph);
+      if (msg.progress != null){
+        if (stats.total) stats.done = Math.min(stats.total, Math.round(msg.progress * stats.total));
+        setProgress(0.82 + msg.progress * 0.18); // final 18%
+      }
       renderMeta();
     }
 
-    else if (msg.type === 'found'){
-      stats.found++;
-      const s = msg.item?.status;
-      if (s >= 200 && s < 300) stats.ok200++;
-      else if (s === 403) stats.forb403++;
-      else if (s === 401) stats.auth401++;
-      else if (String(s).startsWith('30')) stats.redir30x++;
-      renderMeta();
+    else if (msg.type === 'diff'){
+      const c = msg.counts || {};
+      meta.textContent = `Since last scan: +${c.added||0} new, ${c.changed||0} changed, ` +
+        `-${c.removed||0} removed, ${c.unchanged||0} unchanged` + (c.unverified ? `, ${c.unverified} unverified` : '');
     }
 
     else if (msg.type === 'done'){
-      const g = msg.result;
-      cy.add(g.nodes); cy.add(g.edges);
-      cy.layout({ name: (bilkent ? 'cose-bilkent' : 'breadthfirst'), animate:false }).run();
+      // The graph was streamed already; done only carries the summary.
+      if (layoutTimer) { clearTimeout(layoutTimer); layoutTimer = null; }
+      if (isLarge()) loadTreeLayout(); else runLayout();
       setProgress(1);
       finishRun();
     }
@@ -177,23 +296,35 @@ async function enumerate(){
       meta.textContent = 'Canceled.'; finishRun();
     }
 
+    else if (msg.type === 'interrupted'){
+      meta.textContent = `Interrupted by a server restart; POST /api/jobs/${jobId}/resume continues it.`; finishRun();
+    }
+
     else if (msg.type === 'error'){
       meta.textContent = `Error: ${msg.message || 'unknown'}`; finishRun();
     }
   };
 
-  ws.onerror = ()=> { meta.textContent = 'WebSocket error.'; finishRun(); };
-  ws.onclose = ()=> { if (running) finishRun(); };
+  ws.onclose = ()=> {
+    if (!running) return;
+    // The scan keeps going server-side: pick the log up again where this socket dropped it.
+    if (retries++ < MAX_RETRIES) { setTimeout(()=> { if (running) connect(); }, Math.min(8000, 500 * 2 ** retries)); }
+    else { meta.textContent = 'Lost connection to the scan.'; finishRun(); }
+  };
 }
 
 function finishRun(){
   setRunning(false);
   setTimeout(()=> showProgress(false), 400);
-  if (ws) { try { ws.close(); } catch(_){} ws = null; }
+  if (ws) { const w = ws; ws = null; try { w.close(); } catch(_){} }
   jobId = null;
+  localStorage.removeItem(JOB_KEY);
 }
 
 goBtn.addEventListener('click', enumerate);
+
+const previousJob = localStorage.getItem(JOB_KEY);
+if (previousJob) { resetRun(); attach(previousJob); }
 urlEl.addEventListener('keydown', (e)=> { if (e.key === 'Enter') enumerate(); });
 
 cancelBtn.addEventListener('click', async ()=>{
@@ -0,0 +1,71 @@
+import itertools, re
+
+import pytest
+
+from backend.analyzer import RULES_FILE, LiteralSet, RuleSet
+
+# The checks analyze_item hard-coded before they moved to rules.json, kept verbatim as the reference.
+SUSPICIOUS_DIRS = [
+    "/.git", "/.svn", "/.hg", "/backup", "/backups", "/.env", "/config", "/configs",
+    "/admin", "/phpmyadmin", "/wp-admin", "/server-status", "/.idea", "/.vscode"
+]
+BACKUP_PAT = re.compile(r"\.(zip|tar|tar\.gz|tgz|bak|old|rar)$", re.I)
+
+def legacy_analyze_item(path, status, body_snippet):
+    issues = []
+    low = (body_snippet or "").lower()
+    if status == 200:
+        if "index of /" in low or ("parent directory" in low and "<title>index of" in low):
+            issues.append("Directory listing enabled")
+        if any(path.lower().startswith(d) for d in SUSPICIOUS_DIRS):
+            issues.append("Sensitive path potentially exposed")
+        if "phpinfo()" in low or "<h1>php info" in low:
+            issues.append("phpinfo exposed")
+    if status in (401, 403):
+        if any(x in path.lower() for x in ("/admin", "/wp-admin", "/phpmyadmin")):
+            issues.append("Restricted admin area (authorization required)")
+    if BACKUP_PAT.search(path):
+        issues.append("Backup/archive file exposed")
+    return issues
+
+PATHS = [
+    "/", "/index.html", "/.git", "/.git/config", "/.GIT/HEAD", "/.svn/entries", "/.hg", "/backup",
+    "/backups/db.sql", "/backup.zip", "/site.tar.gz", "/site.TGZ", "/old", "/index.php.bak",
+    "/index.php.old", "/archive.rar", "/data.tar", "/.env", "/.env.local", "/config", "/configs/app.yml",
+    "/configuration", "/admin", "/Admin/login", "/wp-admin/", "/phpmyadmin", "/x/admin/panel",
+    "/x/wp-admin", "/x/phpMyAdmin/index.php", "/server-status", "/.idea/workspace.xml", "/.vscode",
+    "/administrator.zip", "/api/v1/users", "/zip", "/tarball",
+]
+STATUSES = [200, 204, 301, 401, 403, 404, 500]
+BODIES = [
+    "", "<html><body>hello</body></html>", "<title>Index of /files</title>", "INDEX OF /",
+    "<title>Index of</title> Parent Directory", "parent directory only", "<title>index of</title>",
+    "<?php phpinfo(); ?> phpinfo()", "<h1>PHP Info</h1>", "phpinfo", None,
+]
+
+@pytest.fixture(scope="module")
+def bundled():
+    return RuleSet.from_file(RULES_FILE)
+
+def test_bundled_rules_match_legacy_analyzer(bundled):
+    for path, status, body in itertools.product(PATHS, STATUSES, BODIES):
+        expected = legacy_analyze_item(path, status, body)
+        assert bundled.evaluate(path, status, body or "") == expected, (path, status, body)
+
+def test_bundled_rules_read_bodies_of_200s_only(bundled):
+    assert bundled.needs_body(200)
+    assert not any(bundled.needs_body(s) for s in STATUSES if s != 200)
+
+@pytest.mark.parametrize("n", [3, 100])  # substring checks and the trie regex
+def test_literal_set_finds_overlapping_literals(n):
+    literals = ["/admin", "/administrator", "/adm", "/api"] + [f"/filler{i}" for i in range(n)]
+    ls = LiteralSet(literals)
+    assert ls.search("/x/administrator/y") == {"/admin", "/administrator", "/adm"}
+    assert ls.prefixes("/administrator/y") == {"/admin", "/administrator", "/adm"}
+    assert ls.prefixes("/x/admin") == set()
+    assert ls.search("/api/adm") == {"/api", "/adm"}
+
+def test_batch_evaluation_matches_one_by_one(bundled):
+    items = list(itertools.product(PATHS, STATUSES, BODIES))
+    assert bundled.evaluate_batch(items) == [bundled.evaluate(p, s, b or "") for p, s, b in items]
+    assert bundled.evaluate_batch([]) == []
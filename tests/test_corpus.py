@@ -0,0 +1,31 @@
+import struct, sys
+
+import pytest
+
+from backend import corpus as corpus_mod
+from backend.corpus import _HDR, Corpus, load_corpus
+
+WORDS = ["admin", "/backup/", "ünïcode", "admin", "", "# comment", "login.php"]
+
+@pytest.fixture
+def wordlist(tmp_path):
+    p = tmp_path / "words.txt"
+    p.write_text("\n".join(WORDS) + "\n", encoding="utf-8")
+    return p
+
+def test_offsets_are_stored_little_endian(wordlist, tmp_path):
+    c = load_corpus([wordlist], tmp_path / "cache")
+    raw = c.path.read_bytes()
+    _, count = _HDR.unpack_from(raw, 0)
+    offsets = struct.unpack_from(f"<{count + 1}I", raw, _HDR.size)
+    blob = raw[_HDR.size + 4 * (count + 1):]
+    assert [blob[a:b].decode() for a, b in zip(offsets, offsets[1:])] == list(c)
+    assert len(c) == count and offsets[-1] == len(blob)
+
+def test_big_endian_hosts_read_what_they_wrote(wordlist, tmp_path, monkeypatch):
+    little = list(load_corpus([wordlist], tmp_path / "le"))
+    monkeypatch.setattr(sys, "byteorder", "big")  # swaps on write and on read, as such a host would
+    dest = tmp_path / "be.dgc"
+    corpus_mod._build([wordlist], dest)
+    assert list(Corpus(dest)) == little
+    assert list(Corpus(dest)[1:3]) == little[1:3]
@@ -0,0 +1,82 @@
+import asyncio
+
+from backend import store as store_mod
+from backend.events import EventBatcher
+from backend.store import JobLog
+
+def test_a_frame_sent_while_the_ticker_is_sending_waits_for_it():
+    async def scenario():
+        frames = []
+
+        async def sink(ev):
+            # A slow socket: batch frames take a while to go out.
+            await asyncio.sleep(0.01 if ev["type"] == "batch" else 0)
+            frames.append(ev)
+
+        b = EventBatcher(sink, interval=0.001)
+        b.start()
+        for i in range(5):
+            await b.emit({"type": "found", "item": {"path": f"/p{i}"}})
+            await asyncio.sleep(0.003)  # the ticker has taken the finding and is sending it
+            await b.emit({"type": "stage", "stage": f"s{i}"})
+        await b.aclose()
+        return frames
+
+    order = []
+    for f in asyncio.run(scenario()):
+        order.extend([it["path"] for it in f["found"]] if f["type"] == "batch" else [f["stage"]])
+    assert order == [x for i in range(5) for x in (f"/p{i}", f"s{i}")]
+
+def test_progress_is_coalesced_into_one_frame():
+    async def scenario():
+        frames = []
+
+        async def sink(ev):
+            frames.append(ev)
+
+        b = EventBatcher(sink, interval=60)
+        for v in (0.1, 0.2, 0.3):
+            await b.emit({"type": "progress", "value": v})
+        await b.emit({"type": "done"})
+        return frames
+
+    assert asyncio.run(scenario()) == [{"type": "batch", "progress": 0.3, "found": []}, {"type": "done"}]
+
+def test_job_log_holds_the_producer_while_the_store_is_stalled(monkeypatch):
+    monkeypatch.setattr(store_mod, "BACKLOG_MAX", 8)
+
+    class StalledStore:
+        def __init__(self):
+            self.go = asyncio.Event()
+            self.written = 0
+
+        async def write(self, job_id, events, findings, cursor=None, tested=None):
+            await self.go.wait()  # the disk hangs until the test releases it
+            self.written += len(events)
+
+        async def update(self, job_id, **fields):
+            pass
+
+    async def scenario():
+        st = StalledStore()
+        jlog = JobLog(st, "j")
+        jlog.start()
+        sent = 0
+
+        async def producer():
+            nonlocal sent
+            for i in range(40):
+                await jlog.put({"type": "stage", "n": i})
+                sent += 1
+
+        task = asyncio.create_task(producer())
+        await asyncio.sleep(0.05)
+        stalled_at = sent  # the first batch is stuck in write(); put() waits for it
+        st.go.set()
+        await asyncio.wait_for(task, 5)
+        await jlog.aclose("done")
+        return stalled_at, sent, st.written
+
+    stalled_at, sent, written = asyncio.run(scenario())
+    assert 0 < stalled_at < 8  # held at the bound, not after all 40
+    assert sent == 40 and written == 40
@@ -0,0 +1,86 @@
+import asyncio
+
+from backend.frontier import Frontier
+
+WORDS = [f"/w{i}" for i in range(10)]
+
+def plain(paths):
+    return iter(paths)
+
+def frontier(**kw) -> Frontier:
+    return Frontier(WORDS, WORDS, plain, root_total=len(WORDS), **kw)
+
+async def take(f: Frontier, n: int):
+    return [await f.next() for _ in range(n)]
+
+def test_checkpoint_is_the_first_unfinished_root_path():
+    async def scenario():
+        f = frontier()
+        served = await take(f, 5)
+        assert served == WORDS[:5] and f.checkpoint == 0
+        for p in ("/w0", "/w1", "/w3"):
+            f.task_done(p)
+        assert f.checkpoint == 2  # /w2 still in flight, /w3 done past it
+        f.task_done("/w2")
+        assert f.checkpoint == 4
+        f.task_done("/w4", finished=False)  # cancelled: must be requested again after a resume
+        return f.checkpoint
+
+    assert asyncio.run(scenario()) == 4
+
+def test_resume_starts_at_the_checkpoint():
+    async def scenario():
+        f = frontier(skip=4)
+        out = []
+        while (p := await f.next()) is not None:
+            out.append(p)
+            f.task_done(p)
+        return out, f.checkpoint
+
+    out, cp = asyncio.run(scenario())
+    assert out == WORDS[4:]
+    assert cp == len(WORDS)
+
+def test_strided_shards_split_the_stream_and_keep_global_cursors():
+    async def scenario():
+        shards = [frontier(stride=(k, 3)) for k in range(3)]
+        served = []
+        for f in shards:
+            paths = await take(f, 2)
+            served.append(paths)
+            f.task_done(paths[0])
+        return served, [f.checkpoint for f in shards]
+
+    served, checkpoints = asyncio.run(scenario())
+    assert served == [["/w0", "/w3"], ["/w1", "/w4"], ["/w2", "/w5"]]
+    assert checkpoints == [3, 4, 5]  # global indices; the scan resumes from the smallest
+    assert min(checkpoints) == 3
+
+def test_skipped_paths_are_never_served_but_count_as_finished():
+    async def scenario():
+        f = frontier()
+        f.skip(["/w1", "/w2", "/elsewhere"])
+        out = []
+        while (p := await f.next()) is not None:
+            out.append(p)
+            f.task_done(p)
+        return out, f.checkpoint
+
+    out, cp = asyncio.run(scenario())
+    assert out == [w for w in WORDS if w not in ("/w1", "/w2")]
+    assert cp == len(WORDS)
+
+def test_discovered_directories_are_explored_once_after_the_root_stream():
+    async def scenario():
+        f = Frontier(WORDS[:2], ["/a", "/b"], plain, recursive=True, root_total=2)
+        first = await f.next()
+        assert f.discover("/w0", 200) == "/w0/"
+        assert f.discover("/w0/", 403) is None  # already queued
+        f.task_done(first)
+        out = [first]
+        while (p := await f.next()) is not None:
+            out.append(p)
+            f.task_done(p)
+        return out
+
+    assert asyncio.run(scenario()) == ["/w0", "/w1", "/w0/a", "/w0/b"]
@@ -0,0 +1,28 @@
+import pytest
+
+from backend.hitstats import RankedCandidates
+
+TAIL = [f"/w{i}" for i in range(50)]
+
+def reference(head, tail, cap):
+    head = head[:cap]
+    return (head + [w for w in tail if w not in set(head)])[:cap]
+
+@pytest.mark.parametrize("head,cap", [
+    ([], 50), (["/w3", "/w40", "/new"], 50), (["/w3", "/w40", "/new"], 20),
+    (["/w0", "/w1", "/w2"], 3), (["/w49", "/w0"], 60), (["/a", "/b"], 1), (["/w7"], 0),
+])
+def test_ranked_candidates_index_like_the_list(head, cap):
+    expected = reference(head, TAIL, cap)
+    ranked = RankedCandidates(head, TAIL, cap)
+    assert len(ranked) == len(expected)
+    assert list(ranked) == expected
+    assert [ranked[i] for i in range(len(ranked))] == expected
+    for start in range(len(expected) + 1):
+        assert ranked[start:] == expected[start:]
+        assert ranked[start:start + 5] == expected[start:start + 5]
+    assert ranked[::3] == expected[::3]
+    if expected:
+        assert ranked[-1] == expected[-1]
+    with pytest.raises(IndexError):
+        ranked[len(expected)]
@@ -0,0 +1,113 @@
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from backend.models import Hit
+from backend.rescan import Diff, compare, conditional_headers, neighbours, rotating_slice
+from backend.scanner import DirEnumerator
+
+BASE = "http://example.test/"
+
+@pytest.mark.parametrize("old,new,verdict", [
+    (Hit("/a", 200, 100, etag='"1"'), None, "removed"),
+    (Hit("/a", 200, 100, etag='"1"'), Hit("/a", 403, 100, etag='"1"'), "changed"),
+    (Hit("/a", 301, 0, "/b/"), Hit("/a", 301, 0, "/c/"), "changed"),
+    (Hit("/a", 200, 100, etag='"1"'), Hit("/a", 200, 500, etag='W/"1"'), "unchanged"),  # weak compare
+    (Hit("/a", 200, 100, etag='"1"'), Hit("/a", 200, 100, etag='"2"'), "changed"),
+    (Hit("/a", 200, 100, last_modified="Mon"), Hit("/a", 200, 900, last_modified="Mon"), "unchanged"),
+    (Hit("/a", 200, 100, last_modified="Mon"), Hit("/a", 200, 100, last_modified="Tue"), "changed"),
+    (Hit("/a", 200, 1000), Hit("/a", 200, 1010), "unchanged"),    # below MIN_SIZE_DELTA
+    (Hit("/a", 200, 10000), Hit("/a", 200, 10100), "unchanged"),  # within SIZE_TOLERANCE
+    (Hit("/a", 200, 1000), Hit("/a", 200, 1100), "changed"),
+    (Hit("/a", 200, 100, etag='"1"'), Hit("/a", 200, 100), "unchanged"),  # validator gone, same size
+    (Hit("/a", 200, None), Hit("/a", 200, 5000), "unchanged"),           # nothing to compare
+])
+def test_compare(old, new, verdict):
+    assert compare(old, new) == verdict
+
+def test_conditional_headers():
+    assert conditional_headers(Hit("/a", 200, etag='W/"1"', last_modified="Mon")) == \
+        {"If-None-Match": 'W/"1"', "If-Modified-Since": "Mon"}
+    assert conditional_headers(Hit("/a", 200)) == {}
+
+def test_diff_classification_and_event():
+    d = Diff()
+    kept, gone, lost = Hit("/kept", 200, 10), Hit("/gone", 200, 10), Hit("/lost", 200, 10)
+    before, after = Hit("/x", 200, 10, etag='"1"'), Hit("/x", 200, 99, etag='"2"')
+    d.unchanged.append(kept)
+    d.removed.append(gone)
+    d.unverified.append(lost)
+    d.changed.append((before, after))
+    d.added = [Hit("/new", 200, 1).to_item(BASE).model_dump()]
+
+    assert [h.path for h in d.current()] == ["/kept", "/lost", "/x"]
+    assert next(h for h in d.current() if h.path == "/x") is after
+    assert d.counts() == {"added": 1, "changed": 1, "removed": 1, "unchanged": 1, "unverified": 1}
+
+    ev = d.event(BASE, "prev")
+    assert ev["type"] == "diff" and ev["since"] == "prev" and ev["counts"] == d.counts()
+    assert [i["path"] for i in ev["added"]] == ["/new"]
+    assert [i["path"] for i in ev["removed"]] == ["/gone"]
+    (change,) = ev["changed"]
+    assert change["before"]["etag"] == '"1"' and change["after"]["size"] == 99
+
+def test_rotating_slices_cover_everything_once_per_turn():
+    seq = [f"/w{i}" for i in range(10)]
+    seen, start = [], 0
+    for _ in range(4):
+        s = rotating_slice(seq, start, 0.3)
+        assert len(s) == 3 and list(s) == [s[i] for i in range(3)]
+        seen.extend(s)
+        start = s.stop
+    assert seen[:10] == seq and seen[10:] == seq[:2]  # the fourth slice wraps around
+    assert list(rotating_slice(seq, 0, 0.01)) == ["/w0"]  # at least one
+    assert list(rotating_slice(seq, 25, 1)) == seq[5:] + seq[:5]
+
+def test_neighbours_are_own_or_parent_directories():
+    hits = [Hit("/admin", 200), Hit("/static/app.js", 200), Hit("/index.php", 200),
+            Hit("/old", 301, redirected_to="/old/"), Hit("/static/css/site.css", 200)]
+    assert neighbours(hits) == ["/admin/", "/old/", "/static/", "/static/css/"]
+
+def test_revalidate_keeps_findings_the_server_would_not_answer_for():
+    async def handler(req):
+        p = req.path
+        if p == "/admin":
+            return web.Response(status=429, headers={"Retry-After": "0"})
+        if p == "/down":
+            return web.Response(status=502)
+        if p == "/same":
+            if req.headers.get("If-None-Match") == '"s"':
+                return web.Response(status=304, headers={"ETag": '"s"'})
+            return web.Response(text="same", headers={"ETag": '"s"'})
+        if p == "/edited":
+            return web.Response(text="<title>Index of /edited</title>", headers={"ETag": '"e2"'})
+        return web.Response(status=404, text="nope")
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            enumerator = DirEnumerator(f"http://127.0.0.1:{port}/", max_concurrency=4, max_retries=1)
+            known = [Hit("/admin", 200, 10, etag='"a"'), Hit("/down", 200, 10), Hit("/same", 200, 4, etag='"s"'),
+                     Hit("/edited", 200, 4, etag='"e1"'), Hit("/gone", 200, 10)]
+            async with aiohttp.ClientSession() as session:
+                detector = enumerator.wildcard_detector(session)
+                await detector.calibrate("/")
+                return await enumerator.revalidate(session, known, detector)
+        finally:
+            await runner.cleanup()
+
+    diff = asyncio.run(scenario())
+    assert sorted(h.path for h in diff.unverified) == ["/admin", "/down"]
+    assert [h.path for h in diff.removed] == ["/gone"]
+    assert [h.path for h in diff.unchanged] == ["/same"]
+    assert [(a.etag, b.etag) for a, b in diff.changed] == [('"e1"', '"e2"')]
+    assert diff.changed[0][1].issues == ["Directory listing enabled"]  # analyzed in the closing batch
+    assert {h.path for h in diff.current()} == {"/admin", "/down", "/same", "/edited"}
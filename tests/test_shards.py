@@ -0,0 +1,28 @@
+import pytest
+
+from backend.models import Hit
+from backend.shards import _dir_owner, _owner
+
+HITS = [Hit(f"/d{i}", 200) for i in range(50)] + [Hit(f"/f{i}.php", 200) for i in range(50)] + \
+       [Hit(f"/r{i}", 301, redirected_to=f"/r{i}/") for i in range(20)] + [Hit("/", 200)]
+
+@pytest.mark.parametrize("n", [1, 2, 3, 8])
+def test_every_known_finding_has_exactly_one_shard(n):
+    shares = [[h for h in HITS if _owner(h, n) == k] for k in range(n)]
+    assert sorted(h.path for share in shares for h in share) == sorted(h.path for h in HITS)
+    if n > 1:
+        assert sum(1 for share in shares if share) > 1  # the work actually spreads
+
+@pytest.mark.parametrize("n", [2, 3, 8])
+def test_a_directory_has_one_owner_however_it_was_found(n):
+    for i in range(20):
+        d = f"/r{i}/"
+        owners = {_owner(Hit(f"/r{i}", 301, redirected_to=d), n), _owner(Hit(d, 200), n),
+                  _owner(Hit(f"/r{i}", 403), n), _dir_owner(d, n)}
+        assert len(owners) == 1, d
+
+def test_owner_is_stable_across_processes():
+    # Shards are separate processes: the split must not depend on per-process hash seeds.
+    hits = [Hit("/admin", 200), Hit("/admin/", 403), Hit("/index.php", 200),
+            Hit("/old", 301, redirected_to="/old/"), Hit("/", 200)]
+    assert [_owner(h, 4) for h in hits] == [3, 3, 1, 1, 3]
@@ -0,0 +1,106 @@
+import asyncio, json
+
+from backend import store as store_mod
+from backend.store import JobLog, JobStore, subscribe
+
+async def collect(it, n=None):
+    out = []
+    async for body in it:
+        out.append(json.loads(body)["seq"])
+        if n is not None and len(out) == n:
+            break
+    return out
+
+def test_finished_job_replays_from_any_offset(tmp_path, monkeypatch):
+    monkeypatch.setattr(store_mod, "REPLAY_CHUNK", 7)  # several chunks
+
+    async def scenario():
+        st = JobStore(tmp_path / "jobs.sqlite3")
+        await st.create("j", "{}")
+        jlog = JobLog(st, "j")
+        jlog.start()
+        for i in range(30):
+            jlog.publish({"type": "stage", "n": i})
+        jlog.record_finding({"path": "/a", "status": 200, "etag": '"x"'})
+        await jlog.aclose("done", summary="{}")
+        try:
+            return ([await collect(subscribe(st, "j", off)) for off in (0, 1, 12, 29, 30, 99)],
+                    await st.findings("j"), (await st.get("j"))["state"], await st.next_seq("j"))
+        finally:
+            await st.close()
+
+    replays, findings, state, next_seq = asyncio.run(scenario())
+    assert replays[0] == list(range(30))
+    assert replays[1] == list(range(1, 30))
+    assert replays[2] == list(range(12, 30))
+    assert replays[3] == [29]
+    assert replays[4] == [] and replays[5] == []
+    assert findings == [("/a", 200, None, None, "[]", '"x"', None)]
+    assert state == "done" and next_seq == 30
+
+def test_running_job_replays_the_store_then_goes_live(tmp_path):
+    async def scenario():
+        st = JobStore(tmp_path / "jobs.sqlite3")
+        await st.create("j", "{}")
+        jlog = JobLog(st, "j")
+        jlog.start()
+        for i in range(10):
+            jlog.publish({"type": "stage", "n": i})
+        await jlog.flush()
+        for i in range(10, 15):
+            jlog.publish({"type": "stage", "n": i})  # not written yet
+
+        reader = asyncio.create_task(collect(subscribe(st, "j", 5, jlog)))
+        await asyncio.sleep(0.05)
+        for i in range(15, 20):
+            jlog.publish({"type": "stage", "n": i})
+        await jlog.aclose("done")
+        try:
+            return await asyncio.wait_for(reader, 5)
+        finally:
+            await st.close()
+
+    assert asyncio.run(scenario()) == list(range(5, 20))
+
+def test_resumed_log_continues_the_sequence(tmp_path):
+    async def scenario():
+        st = JobStore(tmp_path / "jobs.sqlite3")
+        await st.create("j", "{}")
+        first = JobLog(st, "j")
+        for i in range(3):
+            first.publish({"type": "stage"})
+        await first.aclose("interrupted")
+        second = JobLog(st, "j", start_seq=await st.next_seq("j"))
+        second.publish({"type": "stage"})
+        await second.aclose("done")
+        try:
+            return await collect(subscribe(st, "j", 2))
+        finally:
+            await st.close()
+
+    assert asyncio.run(scenario()) == [2, 3]
+
+def test_lagging_observer_catches_up_from_the_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(store_mod, "SUBSCRIBER_QUEUE_MAX", 2)
+
+    async def scenario():
+        st = JobStore(tmp_path / "jobs.sqlite3")
+        await st.create("j", "{}")
+        jlog = JobLog(st, "j")
+        jlog.start()
+        frames = subscribe(st, "j", 0, jlog)
+        seen = []
+        jlog.publish({"type": "stage"})
+        seen.append(json.loads(await frames.__anext__())["seq"])  # replayed; attached live from here
+        for _ in range(20):
+            jlog.publish({"type": "stage"})  # far more than the observer's queue holds
+        reader = asyncio.create_task(collect(frames))
+        await asyncio.sleep(0.05)
+        jlog.publish({"type": "stage"})
+        await jlog.aclose("done")
+        try:
+            return seen + await asyncio.wait_for(reader, 5)
+        finally:
+            await st.close()
+
+    assert asyncio.run(scenario()) == list(range(22))